@@ -1,27 +1,79 @@
+import os
 import logging
 import json
 import random
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
 from models import Ticket, Solution, Conversation
 from app import db
-from ml_models import TicketClassifier, ResolutionPredictor, SentimentAnalyzer
+from model_registry import SharedComponent
+from keyword_matcher import keyword_matcher
+from llm_cache import cache_key
+from llm_health import CircuitBreaker, HealthMonitor, OPEN
+from llm_scheduler import request_priority
+from request_deadline import Deadline
+from llm_streaming import emit, is_streaming, iter_ndjson_tokens, StreamTimer, llm_stream_metrics
 
 logger = logging.getLogger(__name__)
 
+# Seconds allowed for loading the model on warm-up
+WARM_UP_TIMEOUT = float(os.environ.get("LLM_WARM_UP_TIMEOUT", 120))
+
+# Threads shared by the concurrent LLM enrichment steps of classify_ticket,
+# and the seconds each step may take before its rule-based value is used
+ENRICHMENT_WORKERS = int(os.environ.get("LLM_ENRICHMENT_WORKERS", 4))
+ENRICHMENT_STEP_TIMEOUT = float(os.environ.get("LLM_ENRICHMENT_STEP_TIMEOUT", 8))
+
+_enrichment_executor = None
+_enrichment_executor_lock = threading.Lock()
+
+
+def _get_enrichment_executor():
+    global _enrichment_executor
+    with _enrichment_executor_lock:
+        if _enrichment_executor is None:
+            _enrichment_executor = ThreadPoolExecutor(max_workers=ENRICHMENT_WORKERS,
+                                                      thread_name_prefix="ticket-enrichment")
+        return _enrichment_executor
+
+
 class OllamaClient:
     """Client for interacting with Ollama API for LLM capabilities"""
-    def __init__(self, base_url=None):
-        # If no base URL is provided, try different endpoints
+    embedding_store = SharedComponent("embedding_store")
+    response_cache = SharedComponent("llm_response_cache")
+    transport = SharedComponent("llm_transport")
+    scheduler = SharedComponent("llm_scheduler")
+
+    def __init__(self, base_url=None, embedding_store=None, response_cache=None, transport=None, scheduler=None):
+        self.embedding_store = embedding_store
+        self.response_cache = response_cache
+        # Pooled keep-alive connections shared with the other clients
+        self.transport = transport
+        self.scheduler = scheduler
+        # LLM calls skipped or abandoned because their request ran out of time
+        self.deadline_fallbacks = 0
+        # If no base URL is provided or configured (e.g. a fake_ollama.py server), try different endpoints
+        base_url = base_url or os.environ.get("OLLAMA_BASE_URL")
+        self._fixed_base_url = base_url is not None
         self.base_url = base_url or self._get_available_endpoint()
-        self.model = "llama3.2"  # Default model, can be changed
-        self.is_available = self._check_availability()
-        if not self.is_available:
+        self.model = os.environ.get("OLLAMA_MODEL", "llama3.2")  # Default model, can be changed
+        
+        # Calls fail fast to the fallback responses while the circuit is open;
+        # the health monitor, once the application starts it, re-probes the
+        # server and warms the model up on recovery
+        self.circuit = CircuitBreaker(name="ollama")
+        if not self._check_availability():
+            self.circuit.trip()
             logger.warning("Ollama server not available - using fallback mode")
+        self.health_monitor = HealthMonitor(self._probe, self._warm_up, self.circuit, name="ollama-health")
+    
+    @property
+    def is_available(self):
+        """Whether calls to the Ollama server are currently allowed by the circuit breaker"""
+        return self.circuit.state != OPEN
     
     def _get_available_endpoint(self):
         """Try different endpoints to find an available Ollama server"""
@@ -33,7 +85,7 @@ class OllamaClient:
         
         for endpoint in endpoints:
             try:
-                response = requests.get(f"{endpoint}/api/version", timeout=1)
+                response = self.transport.get(f"{endpoint}/api/version", connect_timeout=1, read_timeout=1)
                 if response.status_code == 200:
                     logger.info(f"Found Ollama server at {endpoint}")
                     return endpoint
@@ -46,92 +98,271 @@ class OllamaClient:
     def _check_availability(self):
         """Check if Ollama API is available"""
         try:
-            response = requests.get(f"{self.base_url}/api/version", timeout=2)
+            response = self.transport.get(f"{self.base_url}/api/version", read_timeout=2)
             return response.status_code == 200
         except:
             return False
     
-    def generate(self, prompt, system_prompt=None):
-        """Generate a response using the Ollama API or fallback to rule-based responses"""
+    def _probe(self):
+        """Health probe; looks for the server at the other endpoints when it was not configured"""
+        if self._check_availability():
+            return True
+        if not self._fixed_base_url:
+            self.base_url = self._get_available_endpoint()
+            return self._check_availability()
+        return False
+    
+    def _warm_up(self):
+        """Load the model with an empty prompt, so the first real request does not wait for it"""
+        response = self.transport.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "prompt": "", "stream": False},
+            read_timeout=WARM_UP_TIMEOUT
+        )
+        if response.status_code != 200:
+            logger.warning(f"Ollama warm-up failed: {response.status_code} - {response.text}")
+            return False
+        logger.info(f"Ollama model {self.model} loaded")
+        return True
+    
+    def generate(self, prompt, system_prompt=None, options=None, fallback=True, stream=False,
+                 caller="unknown", ticket_priority=None, deadline=None):
+        """Generate a response using the Ollama API or fallback to rule-based responses
+
+        With fallback=False, None is returned instead of a rule-based response
+        when the LLM cannot answer. With stream=True and a token sink set (see
+        llm_streaming.streaming_to), the completion is read from Ollama's NDJSON
+        stream and forwarded to the sink token by token; cached and fallback
+        responses are forwarded whole. The caller type and ticket priority
+        decide the call's place in the LLM scheduler's queue; a call the
+        scheduler sheds gets the fallback too. With a request deadline, the
+        queue wait and the HTTP timeouts are capped by the budget left, and
+        the fallback is used when too little of it remains.
+        """
+        stream = stream and is_streaming()
+        deadline = deadline or Deadline.unbounded()
+
+        # Identical requests are answered from the response cache, even while Ollama is down
+        key = cache_key(self.model, system_prompt, prompt, options)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return self._forward(cached, stream)
+        
         # If Ollama is not available, use rule-based fallback responses
-        if not self.is_available:
-            return self._generate_fallback_response(prompt, system_prompt)
-            
+        text = None
+        if self.is_available and self._within_budget(deadline):
+            # Calls beyond the concurrency limit wait by priority, or are shed under overload
+            with self.scheduler.slot(request_priority(caller, ticket_priority), caller,
+                                     timeout=deadline.remaining()) as admitted:
+                if admitted and self._within_budget(deadline) and self.circuit.allow_request():
+                    text = self._complete(key, prompt, system_prompt, options, stream, deadline)
+        if text is not None:
+            return text
+        return self._forward(self._generate_fallback_response(prompt, system_prompt) if fallback else None, stream)
+    
+    def _within_budget(self, deadline):
+        if deadline.allows():
+            return True
+        self.deadline_fallbacks += 1
+        logger.warning(f"Skipping LLM call after {deadline.elapsed:.2f}s: request budget exhausted")
+        return False
+    
+    def _complete(self, key, prompt, system_prompt, options, stream, deadline):
+        """Request a completion from the Ollama API; returns None on failure"""
         try:
             payload = {
                 "model": self.model,
                 "prompt": prompt,
-                "stream": False
+                "stream": stream
             }
             
             if system_prompt:
                 payload["system"] = system_prompt
+            if options:
+                payload["options"] = options
                 
-            response = requests.post(f"{self.base_url}/api/generate", json=payload, timeout=10)
+            response = self.transport.post(f"{self.base_url}/api/generate", json=payload, stream=stream,
+                                           connect_timeout=deadline.cap(),
+                                           read_timeout=deadline.cap(self.transport.read_timeout))
             
             if response.status_code == 200:
-                return response.json().get("response", "")
+                text = self._read_stream(response, deadline) if stream else response.json().get("response", "")
+                self.circuit.record_success()
+                # Fallback responses are never cached, so a recovered server is used right away
+                if text:
+                    self.response_cache.put(key, text)
+                return text
             else:
                 logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-                return self._generate_fallback_response(prompt, system_prompt)
         except Exception as e:
+            if deadline.expired:
+                # Running out of the request's budget says nothing about the server
+                logger.warning(f"LLM call abandoned: request budget exhausted ({str(e)})")
+                self.deadline_fallbacks += 1
+                self.circuit.abandon()
+                return None
             logger.error(f"Error calling Ollama API: {str(e)}")
-            return self._generate_fallback_response(prompt, system_prompt)
+        self.circuit.record_failure()
+        return None
+    
+    @staticmethod
+    def _forward(text, stream):
+        if stream:
+            emit(text)
+        return text
+    
+    def _read_stream(self, response, deadline):
+        """Forward the tokens of a streamed completion and return its full text"""
+        timer = StreamTimer()
+        tokens = []
+        try:
+            with response:
+                for token in iter_ndjson_tokens(response):
+                    if deadline.expired:
+                        raise TimeoutError("request budget exhausted while streaming")
+                    timer.mark()
+                    tokens.append(token)
+                    emit(token)
+        except Exception:
+            llm_stream_metrics.record_failure()
+            raise
+        llm_stream_metrics.record(timer.first_token_seconds, timer.elapsed_seconds)
+        return "".join(tokens)
     
     def _generate_fallback_response(self, prompt, system_prompt=None):
         """Generate a rule-based fallback response when Ollama is not available"""
         # Simple keyword matching for common queries
-        prompt_lower = prompt.lower()
+        hits = keyword_matcher.scan(prompt)
         
         # Check if this is a greeting
-        if any(greeting in prompt_lower for greeting in ["hello", "hi", "hey", "greetings"]):
+        if hits.has_any("fallback.greeting"):
             return "Hello! I'm your support assistant. How can I help you today?"
             
         # Check if asking about capabilities
-        if "what can you" in prompt_lower or "help me with" in prompt_lower:
+        if hits.has_any("fallback.capabilities"):
             return "I can help with technical support issues, create tickets for you, and provide solutions for common problems."
             
         # Check for common issue types
-        if "network" in prompt_lower or "connection" in prompt_lower or "wifi" in prompt_lower:
+        if hits.has_any("fallback.network"):
             return "It sounds like you're having network connectivity issues. I'd recommend checking your network settings, restarting your router, and ensuring your device is within range of your WiFi signal."
             
-        if "install" in prompt_lower or "download" in prompt_lower:
+        if hits.has_any("fallback.install"):
             return "For installation issues, please try the following steps: 1) Make sure your system meets the minimum requirements, 2) Close any conflicting applications, 3) Try running the installer as administrator."
             
-        if "account" in prompt_lower or "login" in prompt_lower or "password" in prompt_lower:
+        if hits.has_any("fallback.account"):
             return "For account issues, you can try to: 1) Reset your password, 2) Clear your browser cookies, 3) Ensure you're using the correct username or email address."
             
         # Default fallback response for other queries
         return "I understand you need assistance. To help you better, could you provide more details about your issue? In the meantime, I've created a support ticket for you, and one of our agents will follow up soon."
 
-    def get_embeddings(self, text):
-        """Get embeddings for a given text"""
+    def get_embeddings(self, text, deadline=None, persist=True):
+        """Get embeddings for a given text, served from the embedding store when already computed
+        
+        Embeddings of corpus texts are added to the store; one-off queries,
+        such as chat questions, pass persist=False so the store only grows
+        with the corpus and the request skips the store's locked write.
+        """
+        cached = self.embedding_store.get(self.model, text)
+        if cached is not None:
+            return cached.tolist()
+        
+        deadline = deadline or Deadline.unbounded()
+        if not self._within_budget(deadline):
+            return []
         try:
-            response = requests.post(
-                f"{self.base_url}/api/embeddings",
-                json={"model": self.model, "prompt": text}
-            )
-            
-            if response.status_code == 200:
-                return response.json().get("embedding", [])
-            else:
-                logger.error(f"Ollama embedding API error: {response.status_code} - {response.text}")
-                return []
+            embedding = self.request_embedding(text, deadline=deadline)
+            if persist:
+                self.embedding_store.put(self.model, text, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Error getting embeddings: {str(e)}")
             return []
+    
+    def request_embedding(self, text, timeout=None, deadline=None):
+        """Request the embedding of a text from the Ollama API, bypassing the store"""
+        deadline = deadline or Deadline.unbounded()
+        if not self.circuit.allow_request():
+            raise RuntimeError("Ollama circuit is open")
+        try:
+            response = self.transport.post(
+                f"{self.base_url}/api/embeddings",
+                json={"model": self.model, "prompt": text},
+                connect_timeout=deadline.cap(),
+                read_timeout=deadline.cap(timeout if timeout is not None else self.transport.read_timeout)
+            )
+        except Exception:
+            if deadline.expired:
+                self.circuit.abandon()
+            else:
+                self.circuit.record_failure()
+            raise
+        if response.status_code != 200:
+            self.circuit.record_failure()
+            raise RuntimeError(f"Ollama embedding API error: {response.status_code} - {response.text}")
+        self.circuit.record_success()
+        embedding = response.json().get("embedding", [])
+        if not embedding:
+            raise RuntimeError("Ollama embedding API returned an empty embedding")
+        return embedding
 
 class ClassifierAgent:
     """Agent responsible for classifying tickets into categories"""
-    def __init__(self):
-        self.classifier = TicketClassifier()
-        self.sentiment_analyzer = SentimentAnalyzer()
-        self.ollama_client = OllamaClient()
+    classifier = SharedComponent("ticket_classifier")
+    sentiment_analyzer = SharedComponent("sentiment_analyzer")
+    ollama_client = SharedComponent("ollama_client")
+    
+    def __init__(self, classifier=None, sentiment_analyzer=None, ollama_client=None):
+        # Models and clients come from the shared registry unless injected
+        self.classifier = classifier
+        self.sentiment_analyzer = sentiment_analyzer
+        self.ollama_client = ollama_client
     
-    def classify_ticket(self, description):
-        """Classify a ticket based on its description"""
+    def classify_ticket(self, description, deadline=None):
+        """Classify a ticket based on its description, within the request's deadline if given"""
         category = self.classifier.predict_category(description)
-        sentiment_analysis = self.sentiment_analyzer.analyze_sentiment(description)
+        return self._build_classification(description, category, deadline=deadline)
+    
+    def classify_batch(self, descriptions, use_llm=False):
+        """Classify a batch of tickets with a single classifier call
+
+        The rule-based sentiment, priority, time and team heuristics run for
+        each ticket in the batch. LLM summaries and actions are skipped by
+        default, since one model call per ticket would dominate bulk imports.
+        """
+        categories = self.classifier.predict_categories(descriptions)
+        return [
+            self._build_classification(description, category, use_llm)
+            for description, category in zip(descriptions, categories)
+        ]
+    
+    def triage_ticket(self, description, category=None):
+        """Classify a ticket with the cheap ML and rule-based fields only
+        
+        Returns the category, sentiment, priority, team and the rule-based
+        resolution time estimate; the summary and actions come from
+        enrich_ticket. A known category is used instead of the predicted one.
+        """
+        category = category or self.classifier.predict_category(description)
+        return self._triage(description, category, keyword_matcher.scan(description))
+    
+    def enrich_ticket(self, description, category, priority, use_llm=True, deadline=None,
+                      require_llm=False, step_timeout=None):
+        """Compute the summary, actions and resolution time estimate of a classified ticket
+        
+        With require_llm=True, a step the LLM cannot answer raises instead of
+        getting its rule-based value, so the caller can retry it later.
+        step_timeout replaces ENRICHMENT_STEP_TIMEOUT for each step.
+        """
+        enrichment = self._enrich(description, category, use_llm, priority, deadline, require_llm, step_timeout)
+        return {
+            "summary": enrichment["summary"],
+            "extracted_actions": enrichment["extracted_actions"],
+            "estimated_resolution_time": self._estimate_resolution_time(category, description, priority)
+        }
+    
+    def _triage(self, description, category, hits):
+        """Sentiment, priority, team and resolution time estimate of a ticket with a predicted category"""
+        sentiment_analysis = self.sentiment_analyzer.analyze_sentiment(description, hits)
         
         # Extract the sentiment value from the sentiment analysis result
         sentiment_value = None
@@ -140,32 +371,64 @@ class ClassifierAgent:
         else:
             sentiment_value = "Neutral"  # Default if we can't determine sentiment
         
-        priority = self._determine_priority(sentiment_analysis, description)
+        priority = self._determine_priority(sentiment_analysis, description, hits)
+        return {
+            "issue_category": category,
+            "sentiment": sentiment_value,  # Store just the sentiment value string
+            "priority": priority,
+            "estimated_resolution_time": self._estimate_resolution_time(category, description, priority, hits),
+            "team_id": self._assign_team(category, description, hits)
+        }
+    
+    def _build_classification(self, description, category, use_llm=True, deadline=None):
+        """Build the classification result for a ticket with a predicted category"""
+        # Scan the description for all rule keywords once and share the hits
+        hits = keyword_matcher.scan(description)
+        triage = self._triage(description, category, hits)
+        priority = triage["priority"]
         
         # Generate summary and extract actions (new features)
-        summary = self._generate_summary(description)
-        actions = self._extract_actions(description, category)
-        estimated_time = self._estimate_resolution_time(category, description, priority)
-        team_assignment = self._assign_team(category, description)
+        enrichment = self._enrich(description, category, use_llm, priority, deadline)
+        summary = enrichment["summary"]
+        actions = enrichment["extracted_actions"]
         
         return {
             "issue_category": category,
-            "sentiment": sentiment_value,  # Store just the sentiment value string
+            "sentiment": triage["sentiment"],
             "priority": priority,
             "summary": summary,
             "extracted_actions": actions,
-            "estimated_resolution_time": estimated_time,
-            "team_id": team_assignment
+            "estimated_resolution_time": triage["estimated_resolution_time"],
+            "team_id": triage["team_id"]
         }
     
-    def _determine_priority(self, sentiment, description):
+    def learn_from_ticket(self, description, category, previous_category=None):
+        """Update an online classifier with a newly classified or re-labelled ticket
+
+        Returns False if the classifier could not absorb the update and needs a
+        full retrain; batch classifiers only learn through retraining.
+        """
+        if not self.classifier.supports_online_learning:
+            return True
+        return self.classifier.learn(description, category, previous_category)
+    
+    def is_known_category(self, category):
+        """Check whether tickets may be labelled with a category: a standard one or one already in use"""
+        # Imported here so that the ML libraries load with the models, not with this module
+        from ml_models import TICKET_CATEGORIES
+        
+        if not isinstance(category, str) or not category.strip():
+            return False
+        if category in TICKET_CATEGORIES:
+            return True
+        return db.session.query(Ticket.id).filter(Ticket.issue_category == category).first() is not None
+    
+    def _determine_priority(self, sentiment, description, hits=None):
         """Determine ticket priority based on sentiment and description"""
-        # Check for urgent keywords
-        urgent_keywords = ["urgent", "critical", "emergency", "immediately", "asap", "broken", "error", "not working"]
+        hits = hits or keyword_matcher.scan(description)
         
         # Check if any urgent keyword exists in the description
-        description_lower = description.lower()
-        if any(keyword in description_lower for keyword in urgent_keywords):
+        if hits.has_any("priority.urgent"):
             return "Critical"
             
         # Get sentiment value - could be a string or a dictionary from SentimentAnalyzer
@@ -182,36 +445,79 @@ class ClassifierAgent:
             # Apply additional heuristics to avoid everything defaulting to Low
             
             # Network-related words suggest Medium priority
-            network_keywords = ["network", "connection", "internet", "wifi", "connect", "slow"]
-            if any(keyword in description_lower for keyword in network_keywords):
+            if hits.has_any("priority.network"):
                 return "Medium"
                 
             # Account issues are often High priority
-            account_keywords = ["account", "password", "login", "locked", "security"]
-            if any(keyword in description_lower for keyword in account_keywords):
+            if hits.has_any("priority.account"):
                 return "High"
                 
             # Payment issues are Critical or High
-            payment_keywords = ["payment", "charge", "refund", "billing", "invoice", "money"]
-            if any(keyword in description_lower for keyword in payment_keywords):
-                if "not" in description_lower or "failed" in description_lower:
+            if hits.has_any("priority.payment"):
+                if hits.has_any("priority.payment_failure"):
                     return "Critical"
                 return "High"
                 
             # Application-specific issues
-            app_keywords = ["crash", "bug", "glitch", "freeze", "stuck"]
-            if any(keyword in description_lower for keyword in app_keywords):
+            if hits.has_any("priority.app"):
                 return "Medium"
                 
             # For general questions, feedback, or unclear issues
             return "Low"
     
-    def _generate_summary(self, description):
+    def _enrich(self, description, category, use_llm=True, priority=None, deadline=None,
+                require_llm=False, step_timeout=None):
+        """Compute the LLM-derived fields of a ticket
+        
+        When the LLM is used, the steps are independent and run concurrently
+        on the shared enrichment executor, so the latency is that of the
+        slowest step. A step that fails or misses ENRICHMENT_STEP_TIMEOUT, or
+        the end of the request's deadline if sooner, gets its rule-based value
+        instead, unless require_llm is set, in which case a RuntimeError is
+        raised.
+        """
+        # The steps' own LLM calls end with the step timeout as well
+        step_timeout = step_timeout or ENRICHMENT_STEP_TIMEOUT
+        step_deadline = Deadline((deadline or Deadline.unbounded()).cap(step_timeout))
+        
+        # Field name -> step taking use_llm; add future LLM-derived fields here
+        steps = {
+            "summary": lambda llm: self._generate_summary(description, llm, priority, step_deadline,
+                                                          require_llm),
+            "extracted_actions": lambda llm: self._extract_actions(description, category, llm, priority,
+                                                                   step_deadline, require_llm)
+        }
+        if not (use_llm and self.ollama_client.is_available and step_deadline.allows()):
+            if use_llm and require_llm:
+                raise RuntimeError("LLM unavailable for ticket enrichment")
+            return {name: step(False) for name, step in steps.items()}
+        
+        executor = _get_enrichment_executor()
+        futures = {name: executor.submit(step, True) for name, step in steps.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=step_deadline.remaining())
+            except FutureTimeoutError:
+                if require_llm:
+                    raise RuntimeError(f"Ticket enrichment step {name} timed out after {step_deadline.budget:.1f}s")
+                logger.warning(f"Ticket enrichment step {name} timed out after {step_deadline.budget:.1f}s")
+                results[name] = steps[name](False)
+            except Exception as e:
+                if require_llm:
+                    raise
+                logger.error(f"Error in ticket enrichment step {name}: {str(e)}")
+                results[name] = steps[name](False)
+        return results
+    
+    def _generate_summary(self, description, use_llm=True, priority=None, deadline=None, require_llm=False):
         """Generate a concise summary of the ticket description"""
         if not description:
             return ""
             
-        if self.ollama_client.is_available:
+        if use_llm and require_llm and not self.ollama_client.is_available:
+            raise RuntimeError("LLM unavailable for the summary")
+        if use_llm and self.ollama_client.is_available:
             system_prompt = """
             You are an AI assistant that summarizes customer support tickets.
             Create a concise 1-2 sentence summary that captures the main issue.
@@ -219,7 +525,11 @@ class ClassifierAgent:
             """
             
             prompt = f"Summarize this customer support ticket:\n\n{description}"
-            summary = self.ollama_client.generate(prompt, system_prompt)
+            summary = self.ollama_client.generate(prompt, system_prompt, fallback=not require_llm,
+                                                  caller="enrichment", ticket_priority=priority,
+                                                  deadline=deadline)
+            if summary is None:
+                raise RuntimeError("LLM did not answer the summary request")
             
             # Ensure the summary is not too long
             if len(summary) > 200:
@@ -234,9 +544,12 @@ class ClassifierAgent:
             else:
                 return description[:150] + "..." if len(description) > 150 else description
     
-    def _extract_actions(self, description, category):
+    def _extract_actions(self, description, category, use_llm=True, priority=None, deadline=None,
+                         require_llm=False):
         """Extract required actions from ticket description"""
-        if self.ollama_client.is_available:
+        if use_llm and require_llm and not self.ollama_client.is_available:
+            raise RuntimeError("LLM unavailable for action extraction")
+        if use_llm and self.ollama_client.is_available:
             system_prompt = """
             You are an AI assistant that extracts actionable steps from customer support tickets.
             List 1-3 specific actions that support agents need to take to resolve this issue.
@@ -250,7 +563,11 @@ class ClassifierAgent:
             Extract the necessary actions to resolve this support ticket:
             """
             
-            actions = self.ollama_client.generate(prompt, system_prompt)
+            actions = self.ollama_client.generate(prompt, system_prompt, fallback=not require_llm,
+                                                  caller="enrichment", ticket_priority=priority,
+                                                  deadline=deadline)
+            if actions is None:
+                raise RuntimeError("LLM did not answer the action extraction request")
             return actions
         else:
             # Fallback action extraction based on category
@@ -263,7 +580,7 @@ class ClassifierAgent:
             else:
                 return "1. Gather more information\n2. Identify specific issue\n3. Provide solution steps"
     
-    def _estimate_resolution_time(self, category, description, priority):
+    def _estimate_resolution_time(self, category, description, priority, hits=None):
         """Estimate the resolution time for a ticket in hours"""
         # Base resolution times by category (in hours)
         base_times = {
@@ -293,13 +610,13 @@ class ClassifierAgent:
         estimated_time = base_time * multiplier
         
         # Check for complexity indicators in the description to adjust time
-        complexity_indicators = ["complex", "multiple", "several", "failed repeatedly", "tried everything"]
-        if any(indicator in description.lower() for indicator in complexity_indicators):
+        hits = hits or keyword_matcher.scan(description)
+        if hits.has_any("complexity"):
             estimated_time *= 1.5
             
         return round(estimated_time, 1)  # Round to 1 decimal place
     
-    def _assign_team(self, category, description):
+    def _assign_team(self, category, description, hits=None):
         """Assign the ticket to the appropriate team based on category and description"""
         # Default team mapping by category
         category_team_mapping = {
@@ -311,33 +628,30 @@ class ClassifierAgent:
         }
         
         # Check for specific keywords that might override the default category assignment
-        if "payment" in description.lower() or "transaction" in description.lower() or "credit card" in description.lower():
-            return "PAYMENT"
-            
-        if "network" in description.lower() or "internet" in description.lower() or "connection" in description.lower():
-            return "NETWORK"
-            
-        if "account" in description.lower() or "login" in description.lower() or "password" in description.lower():
-            return "ACCOUNT"
-            
-        if "install" in description.lower() or "software" in description.lower() or "app" in description.lower():
-            return "SOFTWARE"
+        hits = hits or keyword_matcher.scan(description)
+        for team in ["PAYMENT", "NETWORK", "ACCOUNT", "SOFTWARE"]:
+            if hits.has_any(f"team.{team}"):
+                return team
         
         # Return the default team for the category, or general support if not found
         return category_team_mapping.get(category, "TECH_SUPPORT")
 
 class ResolutionAgent:
     """Agent responsible for predicting and suggesting solutions"""
-    def __init__(self):
-        self.predictor = ResolutionPredictor()
-        self.ollama_client = OllamaClient()
-        self.vectorizer = TfidfVectorizer()
-        
-        # Don't load solutions in the constructor - will initialize in first use
-        self.is_vectorizer_initialized = False
+    predictor = SharedComponent("resolution_predictor")
+    solution_index = SharedComponent("solution_index")
+    ollama_client = SharedComponent("ollama_client")
+    semantic_cache = SharedComponent("semantic_cache")
+    
+    def __init__(self, predictor=None, solution_index=None, ollama_client=None, semantic_cache=None):
+        # Models and clients come from the shared registry unless injected
+        self.predictor = predictor
+        self.solution_index = solution_index
+        self.ollama_client = ollama_client
+        self.semantic_cache = semantic_cache
     
-    def suggest_solutions(self, ticket):
-        """Suggest solutions for a given ticket"""
+    def suggest_solutions(self, ticket, deadline=None):
+        """Suggest solutions for a given ticket, within the request's deadline if given"""
         # First, check for similar solutions in our database
         similar_solutions = self._find_similar_solutions(ticket)
         
@@ -346,52 +660,28 @@ class ResolutionAgent:
             return similar_solutions
         else:
             # Generate a new solution using the LLM
-            generated_solution = self._generate_solution(ticket)
+            generated_solution = self._generate_solution(ticket, deadline)
             return [generated_solution]
     
     def _find_similar_solutions(self, ticket):
         """Find similar solutions from the database"""
-        solutions = Solution.query.filter_by(issue_category=ticket.issue_category).all()
-        
-        if not solutions:
-            return []
-        
-        # Calculate similarity between ticket description and solutions
-        solution_texts = [s.solution_text for s in solutions]
-        
         try:
-            # Initialize vectorizer if not already done
-            if not self.is_vectorizer_initialized:
-                all_solutions = Solution.query.all()
-                if all_solutions:
-                    all_texts = [s.solution_text for s in all_solutions]
-                    self.vectorizer.fit(all_texts)
-                    self.is_vectorizer_initialized = True
-                else:
-                    # If no solutions in DB, just fit on current solutions
-                    self.vectorizer.fit(solution_texts)
-                    self.is_vectorizer_initialized = True
-            
-            # Now do the transformation
-            solution_vectors = self.vectorizer.transform(solution_texts)
-            ticket_vector = self.vectorizer.transform([ticket.description])
-            
-            similarities = cosine_similarity(ticket_vector, solution_vectors)[0]
-            
-            # Get top 3 most similar solutions
-            top_indices = similarities.argsort()[-3:][::-1]
+            # The index keeps pre-transformed solution vectors per category
+            matches = self.solution_index.search(ticket.issue_category, ticket.description,
+                                                 top_k=3, min_similarity=0.3)
+            if not matches:
+                return []
             
-            result = []
-            for idx in top_indices:
-                if similarities[idx] > 0.3:  # Threshold for similarity
-                    result.append(solutions[idx].to_dict())
+            solutions = Solution.query.filter(Solution.id.in_([solution_id for solution_id, _ in matches])).all()
+            solutions_by_id = {solution.id: solution for solution in solutions}
             
-            return result
+            # Keep the similarity order of the index
+            return [solutions_by_id[solution_id].to_dict() for solution_id, _ in matches if solution_id in solutions_by_id]
         except Exception as e:
             logger.error(f"Error finding similar solutions: {str(e)}")
             return []
     
-    def _generate_solution(self, ticket):
+    def _generate_solution(self, ticket, deadline=None):
         """Generate a solution using the LLM"""
         system_prompt = """
         You are an expert customer support agent. Your task is to provide a clear, 
@@ -405,7 +695,13 @@ class ResolutionAgent:
         Please provide a step-by-step solution to resolve this issue.
         """
         
-        solution_text = self.ollama_client.generate(prompt, system_prompt)
+        # Near-duplicate tickets of the category share one generated answer
+        solution_text = self.semantic_cache.generate("solution", ticket.issue_category, ticket.description,
+                                                     prompt, system_prompt, caller="resolution",
+                                                     ticket_priority=ticket.priority, deadline=deadline)
+        if solution_text is None:
+            # The LLM is unavailable or failed; use the client's rule-based answer
+            solution_text = self.ollama_client._generate_fallback_response(prompt, system_prompt)
         
         # Create a new solution in the database
         new_solution = Solution(
@@ -446,9 +742,9 @@ class EscalationAgent:
             return True, "Multiple attempts to resolve without success"
         
         # Escalate based on specific keywords in the description
-        escalation_keywords = ["manager", "supervisor", "lawsuit", "legal", "compensation", "refund"]
-        if any(keyword in ticket.description.lower() for keyword in escalation_keywords):
-            return True, f"Customer mentioned {[k for k in escalation_keywords if k in ticket.description.lower()][0]}"
+        keyword = keyword_matcher.scan(ticket.description).first("escalation")
+        if keyword:
+            return True, f"Customer mentioned {keyword}"
         
         return False, "Automated handling is sufficient"
 
@@ -491,9 +787,16 @@ class FeedbackAgent:
 
 class ChatbotAgent:
     """Agent responsible for handling direct user queries with structured conversation flow"""
-    def __init__(self):
-        self.ollama_client = OllamaClient()
-        self.classifier_agent = ClassifierAgent()
+    ollama_client = SharedComponent("ollama_client")
+    semantic_cache = SharedComponent("semantic_cache")
+    
+    def __init__(self, classifier_agent=None, ollama_client=None, semantic_cache=None, enrichment_service=None):
+        self.ollama_client = ollama_client
+        self.semantic_cache = semantic_cache
+        # Reuse the application's classifier agent rather than building another one
+        self.classifier_agent = classifier_agent or ClassifierAgent()
+        # Background enrichment of new tickets; without it tickets are enriched inline
+        self.enrichment_service = enrichment_service
         # Define available issue categories
         self.issue_categories = [
             "Network Connectivity Issue",
@@ -506,8 +809,12 @@ class ChatbotAgent:
         # Track conversation state
         self.conversation_states = {}  # Will store conversation state by session_id
     
-    def respond_to_query(self, user_message, conversation_history=None, session_id=None):
-        """Generate a response based on conversation state and user query"""
+    def respond_to_query(self, user_message, conversation_history=None, session_id=None, deadline=None):
+        """Generate a response based on conversation state and user query
+        
+        Every LLM call made for the reply shares ``deadline``, the request's
+        time budget; once it is spent the rule-based answers are used.
+        """
         if not session_id:
             session_id = "default"
             
@@ -527,8 +834,8 @@ class ChatbotAgent:
         state = self.conversation_states[session_id]
         
         # Check for thank you messages that should end the conversation
-        thank_you_phrases = ["thank you", "thanks", "thank", "thx", "appreciate it"]
-        if any(phrase in user_message.lower() for phrase in thank_you_phrases) and not state["state"] == "greeting":
+        hits = keyword_matcher.scan(user_message)
+        if hits.has_any("chat.thanks") and not state["state"] == "greeting":
             # Mark conversation as ending and return closing message
             state["conversation_ending"] = True
             return {
@@ -542,7 +849,6 @@ class ChatbotAgent:
         if state["conversation_ending"]:
             # If user says no (or similar) to "anything else" question
             no_phrases = ["no", "nope", "that's all", "nothing else", "all set", "i'm good", "im good"]
-            yes_phrases = ["yes", "yeah", "yep", "sure", "please", "i do", "i have", "another question"]
             
             if any(no_match == user_message.lower() or user_message.lower().startswith(no_match) for no_match in no_phrases):
                 # User doesn't need anything else
@@ -552,7 +858,7 @@ class ChatbotAgent:
                     "ticket_id": state.get("ticket_id"),
                     "current_state": "closed"
                 }
-            elif any(yes_match in user_message.lower() for yes_match in yes_phrases):
+            elif hits.has_any("chat.yes"):
                 # User has another question, reset the state but stay in conversation
                 state["conversation_ending"] = False
                 state["state"] = "greeting"
@@ -574,12 +880,12 @@ class ChatbotAgent:
             issue_detected = self._detect_technical_issue(user_message)
             if issue_detected:
                 # User is describing a problem directly, classify and move to issue description
-                classification = self.classifier_agent.classify_ticket(user_message)
+                classification = self.classifier_agent.triage_ticket(user_message)
                 state["selected_category"] = classification["issue_category"]
                 state["issue_description"] = user_message
                 state["state"] = "solution_provided"
                 state["conversation_ending"] = False
-                response = self._handle_issue_description(user_message, session_id)
+                response = self._handle_issue_description(user_message, session_id, deadline)
                 create_ticket = False
                 return {
                     "response": response,
@@ -598,11 +904,11 @@ class ChatbotAgent:
                 issue_detected = self._detect_technical_issue(user_message)
                 if issue_detected:
                     # User is describing a problem directly, classify and move to issue description
-                    classification = self.classifier_agent.classify_ticket(user_message)
+                    classification = self.classifier_agent.triage_ticket(user_message)
                     state["selected_category"] = classification["issue_category"]
                     state["issue_description"] = user_message
                     state["state"] = "solution_provided"
-                    response = self._handle_issue_description(user_message, session_id)
+                    response = self._handle_issue_description(user_message, session_id, deadline)
                     create_ticket = False
                     return {
                         "response": response,
@@ -622,7 +928,7 @@ class ChatbotAgent:
             
         elif state["state"] == "issue_description":
             # Save issue description and provide solutions
-            response = self._handle_issue_description(user_message, session_id)
+            response = self._handle_issue_description(user_message, session_id, deadline)
             create_ticket = False
             
         elif state["state"] == "solution_provided":
@@ -632,7 +938,7 @@ class ChatbotAgent:
             
         elif state["state"] == "feedback_received":
             # Process feedback and create ticket if needed
-            response, create_ticket = self._handle_feedback(user_message, session_id)
+            response, create_ticket = self._handle_feedback(user_message, session_id, deadline)
             
         else:
             # Default fallback for any other state
@@ -653,7 +959,8 @@ class ChatbotAgent:
                 You are a helpful AI assistant for a technical support team. Be polite, professional and concise.
                 If you don't know something, say so clearly. Ask clarifying questions when needed.
                 """
-                response = self.ollama_client.generate(user_message, system_prompt)
+                response = self.ollama_client.generate(user_message, system_prompt, stream=True, caller="chat",
+                                                       deadline=deadline)
                 create_ticket = False
         
         return {
@@ -705,7 +1012,7 @@ class ChatbotAgent:
                    f"{categories_text}\n\n"
                    f"Just type the number or name of the category.")
     
-    def _handle_issue_description(self, user_message, session_id):
+    def _handle_issue_description(self, user_message, session_id, deadline=None):
         """Process the user's issue description and provide solutions"""
         state = self.conversation_states[session_id]
         
@@ -716,19 +1023,23 @@ class ChatbotAgent:
         # Determine issue category if not already set
         selected_category = state["selected_category"]
         if not selected_category:
-            classification = self.classifier_agent.classify_ticket(user_message)
+            classification = self.classifier_agent.triage_ticket(user_message)
             selected_category = classification["issue_category"]
             state["selected_category"] = selected_category
         
+        # Compose response with apology and steps; each part is streamed as soon as it is known
+        opening = (f"I'm sorry to hear you're experiencing this issue with {selected_category.lower()}. "
+                   f"Let me help you troubleshoot:\n\n")
+        emit(opening)
+        
         # Get troubleshooting steps based on category
-        troubleshooting_steps = self._get_troubleshooting_steps(selected_category, user_message)
+        troubleshooting_steps = self._get_troubleshooting_steps(selected_category, user_message, stream=True,
+                                                               deadline=deadline)
         
-        # Compose response with apology and steps
-        response = (f"I'm sorry to hear you're experiencing this issue with {selected_category.lower()}. "
-                   f"Let me help you troubleshoot:\n\n{troubleshooting_steps}\n\n"
-                   f"Did these steps resolve your issue? (Yes/No)")
+        closing = "\n\nDid these steps resolve your issue? (Yes/No)"
+        emit(closing)
         
-        return response
+        return opening + troubleshooting_steps + closing
     
     def _handle_solution_feedback(self, user_message, session_id):
         """Handle the user's feedback on provided solutions"""
@@ -766,7 +1077,7 @@ class ChatbotAgent:
                 return ("I'm not sure if your issue was resolved. Could you please let me know if the troubleshooting steps "
                        "resolved your issue? Please click 'Yes, resolved' if fixed or 'No, still having issues' if you need more help.")
     
-    def _handle_feedback(self, user_message, session_id):
+    def _handle_feedback(self, user_message, session_id, deadline=None):
         """Process feedback and create ticket if needed"""
         state = self.conversation_states[session_id]
         
@@ -800,7 +1111,7 @@ class ChatbotAgent:
                 full_description += f"\n\nAdditional information: {additional_info}"
             
             # Create the actual ticket
-            ticket_data = self.create_ticket_from_chat(full_description, state["selected_category"])
+            ticket_data = self.create_ticket_from_chat(full_description, state["selected_category"], deadline)
             
             if ticket_data:
                 state["ticket_id"] = ticket_data["ticket_id"]
@@ -821,8 +1132,11 @@ class ChatbotAgent:
             
             return response, True
     
-    def _get_troubleshooting_steps(self, category, description):
-        """Get troubleshooting steps based on category and description"""
+    def _get_troubleshooting_steps(self, category, description, stream=False, deadline=None):
+        """Get troubleshooting steps based on category and description
+        
+        With stream=True the steps are also forwarded to the current token sink.
+        """
         # Use LLM to generate specific steps if available
         if self.ollama_client.is_available:
             system_prompt = """
@@ -837,10 +1151,19 @@ class ChatbotAgent:
             Provide troubleshooting steps:
             """
             
-            steps = self.ollama_client.generate(prompt, system_prompt)
-            return steps
+            # Near-duplicate descriptions of the category share one answer
+            steps = self.semantic_cache.generate("troubleshooting", category, description, prompt, system_prompt,
+                                                 stream=stream, caller="chat", deadline=deadline)
+            if steps:
+                return steps
         
-        # Fallback troubleshooting steps by category
+        steps = self._fallback_troubleshooting_steps(category)
+        if stream:
+            emit(steps)
+        return steps
+    
+    def _fallback_troubleshooting_steps(self, category):
+        """Rule-based troubleshooting steps by category"""
         if "network" in category.lower():
             return ("1. Restart your router and modem by unplugging them for 30 seconds, then plugging back in\n"
                    "2. Check if other devices can connect to the same network\n"
@@ -885,23 +1208,29 @@ class ChatbotAgent:
     
     def _detect_technical_issue(self, message):
         """Detect if a message describes a technical issue"""
-        issue_keywords = ["error", "problem", "issue", "not working", "broken", "fails", "bug", "can't", "cannot", "doesn't", "does not"]
-        
-        if any(keyword in message.lower() for keyword in issue_keywords):
+        if keyword_matcher.scan(message).has_any("chat.technical_issue"):
             return True
         
         # For more complex issues, we could use the classifier
         if len(message.split()) > 10:  # Only try to classify longer messages
-            classification = self.classifier_agent.classify_ticket(message)
+            classification = self.classifier_agent.triage_ticket(message)
             if classification["issue_category"] != "General Inquiry":
                 return True
         
         return False
     
-    def create_ticket_from_chat(self, user_message, category=None):
-        """Create a ticket from a chat conversation"""
-        # Use the classifier agent to categorize the issue
-        classification = self.classifier_agent.classify_ticket(user_message)
+    def create_ticket_from_chat(self, user_message, category=None, deadline=None):
+        """Create a ticket from a chat conversation
+        
+        With an enrichment service, only the cheap fields, including the
+        rule-based resolution time estimate, are computed here and the summary
+        and actions are queued for the enrichment workers, as for tickets
+        created through the API.
+        """
+        if self.enrichment_service is not None:
+            classification = self.classifier_agent.triage_ticket(user_message, category)
+        else:
+            classification = self.classifier_agent.classify_ticket(user_message, deadline)
         
         # Override category if provided
         if category:
@@ -920,15 +1249,16 @@ class ChatbotAgent:
             description=user_message,
             status="Open",
             resolution_status="Pending",
-            summary=classification.get("summary", ""),
-            extracted_actions=classification.get("extracted_actions", ""),
-            estimated_resolution_time=classification.get("estimated_resolution_time", 2.0),
+            summary=classification.get("summary"),
+            extracted_actions=classification.get("extracted_actions"),
+            estimated_resolution_time=classification.get("estimated_resolution_time"),
             team_id=classification.get("team_id", "TECH_SUPPORT")
         )
         
         try:
             db.session.add(new_ticket)
-            db.session.commit()
+            if self.enrichment_service is not None:
+                self.enrichment_service.enqueue(new_ticket)
             
             # Add the initial conversation
             conversation = Conversation(
@@ -937,8 +1267,15 @@ class ChatbotAgent:
                 sender="user"
             )
             
+            # The ticket, its enrichment job and the first message are stored together
             db.session.add(conversation)
             db.session.commit()
+            if self.enrichment_service is not None:
+                self.enrichment_service.notify()
+            
+            # Let an online classifier learn from the new ticket; unknown
+            # categories are picked up by the next scheduled compaction
+            self.classifier_agent.learn_from_ticket(user_message, classification["issue_category"])
             
             return new_ticket.to_dict()
         except Exception as e:
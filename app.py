@@ -56,3 +56,7 @@ with app.app_context():
     logger.info("Creating database tables...")
     db.create_all()
     logger.info("Database tables created successfully")
+    from knowledge_base_search import setup_full_text_search
+    setup_full_text_search(db.engine)
+    from ticket_enrichment import setup_enrichment_status
+    setup_enrichment_status(db.engine)
@@ -0,0 +1,174 @@
+"""Offline backfill of embeddings for tickets, solutions and knowledge base entries
+
+Walks each table in primary-key order, in chunks, embeds every text that is
+not in the embedding store yet with a bounded number of concurrent requests
+to the Ollama embedding endpoint, and stores the vectors chunk by chunk. The
+last id stored per table is checkpointed after every chunk, so an
+interrupted run continues where it stopped. Throughput is logged per chunk.
+
+    python backfill_embeddings.py [--sources tickets solutions knowledge_base]
+                                  [--chunk-size 256] [--concurrency 4] [--reset]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, db
+from models import Ticket, Solution, KnowledgeBaseEntry
+from model_registry import registry
+from embedding_store import knowledge_base_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_CONCURRENCY = 4
+
+
+# Source name -> (id column, text columns, function building the embedded text)
+EMBEDDING_SOURCES = {
+    "tickets": (Ticket.id, [Ticket.description], lambda description: description),
+    "solutions": (Solution.id, [Solution.solution_text], lambda solution_text: solution_text),
+    "knowledge_base": (KnowledgeBaseEntry.id, [KnowledgeBaseEntry.title, KnowledgeBaseEntry.content],
+                       knowledge_base_text)
+}
+
+
+class Checkpoint:
+    """Last id stored per model and source, saved atomically as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+
+    def last_id(self, model, source):
+        return self.state.get(model, {}).get(source, 0)
+
+    def save(self, model, source, last_id):
+        self.state.setdefault(model, {})[source] = last_id
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, model, sources):
+        for source in sources:
+            self.state.get(model, {}).pop(source, None)
+
+
+def _iter_chunks_after(id_column, columns, last_id, chunk_size):
+    """Yield chunks of (id, *columns) rows in id order, starting after last_id"""
+    while True:
+        rows = db.session.execute(
+            db.select(id_column, *columns).where(id_column > last_id).order_by(id_column).limit(chunk_size)
+        ).all()
+        db.session.rollback()  # Release the read transaction between chunks
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def backfill_source(source, client, store, checkpoint, executor, chunk_size):
+    """Embed and store every text of one source; return (stored, skipped, failed)"""
+    id_column, columns, to_text = EMBEDDING_SOURCES[source]
+    model = client.model
+    last_id = checkpoint.last_id(model, source)
+    stored = skipped = 0
+    started = time.time()
+    logger.info(f"Backfilling {source} after id {last_id}")
+
+    for rows in _iter_chunks_after(id_column, columns, last_id, chunk_size):
+        chunk_started = time.time()
+        texts = [to_text(*row[1:]) for row in rows]
+
+        # Texts embedded earlier, by this job or on the request path, are skipped
+        existing = store.get_many(model, texts)
+        missing = [i for i, vector in enumerate(existing) if vector is None and texts[i] and texts[i].strip()]
+        skipped += len(rows) - len(missing)
+
+        results = list(executor.map(lambda i: _embed(client, texts[i]), missing))
+        embedded = [(i, vector) for i, vector in zip(missing, results) if vector is not None]
+        if embedded:
+            store.put_many(model, [texts[i] for i, _ in embedded], [vector for _, vector in embedded])
+        stored += len(embedded)
+
+        failed = [i for i, vector in zip(missing, results) if vector is None]
+        if failed:
+            # Resume just before the first failure; the rows stored after it are
+            # skipped on the next run
+            resume_after = rows[failed[0] - 1][0] if failed[0] > 0 else last_id
+            checkpoint.save(model, source, resume_after)
+            logger.error(f"{len(failed)} embeddings failed for {source}; stopped after id {resume_after}")
+            return stored, skipped, len(failed)
+
+        last_id = rows[-1][0]
+        checkpoint.save(model, source, last_id)
+        elapsed = time.time() - chunk_started
+        logger.info(f"{source}: up to id {last_id}, {len(embedded)} embedded, "
+                    f"{len(rows) - len(missing)} skipped, {len(embedded) / elapsed if elapsed else 0:.1f} texts/s")
+
+    elapsed = time.time() - started
+    logger.info(f"{source}: done, {stored} embedded and {skipped} skipped in {elapsed:.1f}s "
+                f"({stored / elapsed if elapsed else 0:.1f} texts/s)")
+    return stored, skipped, 0
+
+
+def _embed(client, text):
+    try:
+        return client.request_embedding(text)
+    except Exception as e:
+        logger.warning(f"Error embedding text: {str(e)}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill embeddings for tickets, solutions and knowledge base entries")
+    parser.add_argument("--sources", nargs="+", choices=list(EMBEDDING_SOURCES), default=list(EMBEDDING_SOURCES))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of embedding requests in flight")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (default: backfill_checkpoint.json in the embedding store)")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        client = registry.get("ollama_client")
+        if not client.is_available:
+            logger.error(f"Ollama server not available at {client.base_url}")
+            return 1
+
+        store = registry.get("embedding_store")
+        checkpoint = Checkpoint(args.checkpoint or os.path.join(store.base_dir, "backfill_checkpoint.json"))
+        if args.reset:
+            checkpoint.reset(client.model, args.sources)
+
+        started = time.time()
+        totals = [0, 0, 0]
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+            for source in args.sources:
+                counts = backfill_source(source, client, store, checkpoint, executor, args.chunk_size)
+                totals = [total + count for total, count in zip(totals, counts)]
+                if counts[2]:
+                    break
+
+        elapsed = time.time() - started
+        logger.info(f"Backfill finished: {totals[0]} embedded, {totals[1]} skipped, {totals[2]} failed "
+                    f"in {elapsed:.1f}s ({totals[0] / elapsed if elapsed else 0:.1f} texts/s)")
+        return 1 if totals[2] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import re
+import math
+import heapq
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Words of at least three letters, or short technical tokens with a digit such as "5g" or "2fa"
+WORD_PATTERN = re.compile(r'\b(?:[a-z]{3,}|(?=[a-z]*[0-9])[a-z0-9]{2,})\b')
+
+
+def tokenize(text):
+    """Split text into lower-cased words of at least three letters and tokens containing a digit"""
+    return WORD_PATTERN.findall(text.lower()) if text else []
+
+
+class BM25FIndex:
+    """Incremental BM25F index over documents with weighted text fields
+
+    Postings keep the term frequency of every field, and the index keeps each
+    document's field lengths together with running totals. Document
+    frequencies, average field lengths and therefore IDF and length
+    normalization stay exact as documents are added, replaced or removed,
+    without rescanning the collection. Field term frequencies are normalized
+    by length, weighted and summed before BM25 saturation (BM25F), so a long
+    article does not win on size alone and a title hit counts for more than a
+    content hit.
+    """
+
+    def __init__(self, field_weights, field_b=None, k1=1.2):
+        self.fields = tuple(field_weights)
+        self.weights = tuple(float(field_weights[field]) for field in self.fields)
+        self.b = tuple(float((field_b or {}).get(field, 0.75)) for field in self.fields)
+        self.k1 = k1
+        self.postings = {}
+        self.lengths = {}
+        self.attributes = {}
+        self.doc_terms = {}
+        self.length_totals = [0] * len(self.fields)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.lengths
+
+    def add(self, doc_id, fields, attributes=None):
+        """Index a document, replacing any previous version of it"""
+        self.remove(doc_id)
+
+        counts = [Counter(tokenize(fields.get(field))) for field in self.fields]
+        lengths = tuple(sum(count.values()) for count in counts)
+        terms = set().union(*counts)
+        for term in terms:
+            self.postings.setdefault(term, {})[doc_id] = tuple(count.get(term, 0) for count in counts)
+
+        self.lengths[doc_id] = lengths
+        self.doc_terms[doc_id] = tuple(terms)
+        self.attributes[doc_id] = attributes or {}
+        for i, length in enumerate(lengths):
+            self.length_totals[i] += length
+
+    def remove(self, doc_id):
+        """Remove a document from the index if present"""
+        lengths = self.lengths.pop(doc_id, None)
+        if lengths is None:
+            return
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.attributes.pop(doc_id, None)
+        for i, length in enumerate(lengths):
+            self.length_totals[i] -= length
+
+    def idf(self, term):
+        """Inverse document frequency of a term, always positive"""
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, query, **filters):
+        """Score every document sharing a term with the query
+
+        Keyword arguments restrict the candidates to documents whose
+        attributes equal the given values.
+        """
+        count = len(self.lengths)
+        if not count:
+            return {}
+        average_lengths = [(total / count) or 1.0 for total in self.length_totals]
+        k1 = self.k1
+
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequencies in postings.items():
+                if filters:
+                    attributes = self.attributes[doc_id]
+                    if any(attributes.get(key) != value for key, value in filters.items()):
+                        continue
+                lengths = self.lengths[doc_id]
+                weighted_tf = 0.0
+                for i, tf in enumerate(frequencies):
+                    if tf:
+                        b = self.b[i]
+                        weighted_tf += self.weights[i] * tf / (1 - b + b * lengths[i] / average_lengths[i])
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * weighted_tf * (k1 + 1) / (weighted_tf + k1)
+        return scores
+
+    def search(self, query, top_k=10, **filters):
+        """Return the top_k (doc_id, score) pairs for a query, best first"""
+        scores = self.score(query, **filters)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def get_stats(self):
+        """Return collection statistics"""
+        count = len(self.lengths)
+        return {
+            "documents": count,
+            "terms": len(self.postings),
+            "average_field_lengths": {
+                field: round(total / count, 2) if count else 0.0
+                for field, total in zip(self.fields, self.length_totals)
+            }
+        }
@@ -0,0 +1,56 @@
+import logging
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+logger = logging.getLogger(__name__)
+
+# Registry component name -> (model class, fields whose edits are reported)
+_tracked = {}
+
+
+def track_committed_changes(model_class, component_name, fields):
+    """Report committed writes of a model to a search index in the registry
+
+    Inserts, deletes and updates touching one of the given fields are
+    collected on the session during flush and passed to the component's
+    ``mark_changed`` only once the transaction commits, so rolled-back
+    writes never reach the index. Components that have not been built yet
+    are skipped; they read the current rows when they are built.
+    """
+    key = f"changed:{component_name}"
+
+    def record(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(key, set()).add(target.id)
+
+    def record_update(mapper, connection, target):
+        attrs = inspect(target).attrs
+        if any(getattr(attrs, field).history.has_changes() for field in fields):
+            record(mapper, connection, target)
+
+    event.listen(model_class, "after_insert", record)
+    event.listen(model_class, "after_update", record_update)
+    event.listen(model_class, "after_delete", record)
+    _tracked[component_name] = (model_class, tuple(fields))
+
+
+def _session_committed(session):
+    from model_registry import registry
+    for component_name in _tracked:
+        changed = session.info.pop(f"changed:{component_name}", None)
+        if changed and registry.is_built(component_name):
+            try:
+                registry.get(component_name).mark_changed(changed)
+            except Exception as e:
+                logger.error(f"Error updating {component_name}: {str(e)}")
+
+
+def _session_rolled_back(session):
+    for component_name in _tracked:
+        session.info.pop(f"changed:{component_name}", None)
+
+
+event.listen(Session, "after_commit", _session_committed)
+event.listen(Session, "after_rollback", _session_rolled_back)
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default location for embedding vectors, next to the SQLite database
+DEFAULT_EMBEDDING_DIR = os.path.join(os.path.dirname(__file__), 'instance', 'embeddings')
+
+# Bump when the on-disk layout of the vector files changes
+STORE_FORMAT_VERSION = 1
+
+KEY_BYTES = 32  # sha256 digest
+
+
+def content_key(text):
+    """Hash a text into the key its embedding is stored under"""
+    return hashlib.sha256((text or "").strip().encode('utf-8')).digest()
+
+
+def knowledge_base_text(title, content):
+    """Text a knowledge base entry is embedded from"""
+    return f"{title}\n\n{content}"
+
+
+class _ModelVectors:
+    """Append-only vectors of one embedding model, memory-mapped from disk
+
+    Row i of ``vectors.bin`` is the embedding of the text whose content hash
+    is row i of ``keys.bin``. ``meta.json`` records the dimension, dtype and
+    the number of committed rows; it is replaced atomically only after the
+    rows are written, so readers never map a partial row. Rows are appended
+    under an exclusive file lock, so several workers can share one store.
+    """
+
+    def __init__(self, directory, dtype):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.count = 0
+        self.rows = {}
+        self.vectors = None
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json"), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Pick up rows committed since the last refresh, possibly by another process"""
+        try:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                return
+            if meta.get("format_version") != STORE_FORMAT_VERSION:
+                logger.warning(f"Embedding store {self.directory} has an outdated format, ignoring it")
+                return
+            self.dtype = np.dtype(meta["dtype"])
+            self.dim = meta["dim"]
+            count = meta["count"]
+
+            if count > self.count:
+                with open(self._path("keys.bin"), 'rb') as f:
+                    f.seek(self.count * KEY_BYTES)
+                    keys = f.read((count - self.count) * KEY_BYTES)
+                # Map the grown array before publishing rows that point into it
+                self.vectors = np.memmap(self._path("vectors.bin"), dtype=self.dtype, mode='r', shape=(count, self.dim))
+                for offset in range(0, len(keys), KEY_BYTES):
+                    self.rows.setdefault(keys[offset:offset + KEY_BYTES], self.count + offset // KEY_BYTES)
+                self.count = count
+            self._meta_mtime = mtime
+
+    def get(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return np.asarray(self.vectors[row], dtype=np.float32)
+
+    def append(self, keys, vectors):
+        """Append vectors for keys not stored yet and return the number added"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lock_file = open(self._path("store.lock"), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another process may have appended since our last look
+            self._meta_mtime = None
+            self.refresh()
+
+            with self._lock:
+                dim = self.dim if self.dim is not None else vectors.shape[1]
+                if vectors.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dim}")
+
+                new_rows = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self.rows and key not in new_rows:
+                        new_rows[key] = vector
+                if not new_rows:
+                    return 0
+
+                # Drop any partial rows left behind by an interrupted writer
+                for name, row_bytes in (("keys.bin", KEY_BYTES), ("vectors.bin", dim * self.dtype.itemsize)):
+                    with open(self._path(name), 'ab') as f:
+                        f.truncate(self.count * row_bytes)
+                        if name == "keys.bin":
+                            f.write(b"".join(new_rows))
+                        else:
+                            f.write(np.asarray(list(new_rows.values()), dtype=self.dtype).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                meta = {
+                    "format_version": STORE_FORMAT_VERSION,
+                    "dim": int(dim),
+                    "dtype": self.dtype.name,
+                    "count": self.count + len(new_rows)
+                }
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(meta, f)
+                os.replace(tmp_path, self._path("meta.json"))
+
+            self.refresh()
+            return len(new_rows)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+class EmbeddingStore:
+    """Persistent embeddings keyed by content hash and model name
+
+    Vectors of each model are kept in one compact float16 (or float32)
+    array on disk that is memory-mapped, so workers share its pages through
+    the OS page cache and start without loading it. A text already embedded
+    by a model is served from the store without calling the model again.
+    """
+
+    def __init__(self, base_dir=None, dtype=None):
+        self.base_dir = base_dir or os.environ.get("EMBEDDING_STORE_DIR", DEFAULT_EMBEDDING_DIR)
+        self.dtype = np.dtype(dtype or os.environ.get("EMBEDDING_STORE_DTYPE", "float16"))
+        self._models = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _vectors(self, model):
+        vectors = self._models.get(model)
+        if vectors is None:
+            with self._lock:
+                vectors = self._models.get(model)
+                if vectors is None:
+                    directory = os.path.join(self.base_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model))
+                    vectors = _ModelVectors(directory, self.dtype)
+                    self._models[model] = vectors
+        return vectors
+
+    def get(self, model, text):
+        """Return the stored embedding of a text as a float32 array, or None"""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model, texts):
+        """Return the stored embeddings of several texts, None where missing"""
+        vectors = self._vectors(model)
+        keys = [content_key(text) for text in texts]
+        if any(key not in vectors.rows for key in keys):
+            vectors.refresh()
+        found = [vectors.get(key) for key in keys]
+        hits = sum(vector is not None for vector in found)
+        self.hits += hits
+        self.misses += len(found) - hits
+        return found
+
+    def put(self, model, text, vector):
+        """Store the embedding of a text"""
+        return self.put_many(model, [text], [vector])
+
+    def put_many(self, model, texts, vectors):
+        """Store the embeddings of several texts, skipping texts already stored"""
+        if not texts:
+            return 0
+        try:
+            return self._vectors(model).append([content_key(text) for text in texts], vectors)
+        except Exception as e:
+            logger.error(f"Error storing embeddings for model {model}: {str(e)}")
+            return 0
+
+    def get_stats(self):
+        """Return the size of the store and its hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "models": {
+                model: {"vectors": vectors.count, "dim": vectors.dim, "dtype": vectors.dtype.name}
+                for model, vectors in self._models.items()
+            },
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
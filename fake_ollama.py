@@ -0,0 +1,360 @@
+"""Stand-in Ollama server for load and latency testing without a GPU
+
+Implements /api/version, /api/generate (streaming NDJSON and non-streaming)
+and /api/embeddings with configurable latency distributions, token rates,
+error and stall rates, and a limit on concurrently generating requests, so
+queueing, timeouts, the circuit breaker and the caches can be measured under
+realistic LLM latency on any machine. Outputs are deterministic: the same
+model, system prompt and prompt always produce the same completion, and the
+same text always has the same embedding. With a fixed --seed the sampled
+latencies and errors are reproducible as well.
+
+    python fake_ollama.py [--port 11435] [--first-token-latency lognormal:300,0.4]
+                          [--tokens-per-second 30] [--error-rate 0.01] [--parallel 2]
+
+Point the application at it with OLLAMA_BASE_URL=http://localhost:11435.
+Latency distributions, in milliseconds, are "fixed:MS", "uniform:LOW,HIGH",
+"normal:MEAN,STDDEV" or "lognormal:MEDIAN,SIGMA".
+"""
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FAKE_VERSION = "0.0.0-fake"
+DEFAULT_PORT = 11435
+DEFAULT_EMBEDDING_DIM = 384
+
+# Words the deterministic completions are made of
+VOCABULARY = (
+    "check restart the router network settings device driver update account password reset "
+    "cache browser clear install software version system requirements verify payment card "
+    "connection signal firewall administrator permissions sync server error log support ticket "
+    "issue steps please try again confirm configuration latest reboot"
+).split()
+
+
+class LatencyDistribution:
+    """Samples latencies in seconds from a distribution given in milliseconds"""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        try:
+            self.params = [float(value) for value in params.split(",")] if params else []
+        except ValueError:
+            raise ValueError(f"Invalid latency parameters in {spec!r}")
+        expected = 1 if kind == "fixed" else 2
+        if len(self.params) != expected:
+            raise ValueError(f"Latency distribution {kind} takes {expected} parameter(s), got {spec!r}")
+        self.kind = kind
+        self.spec = spec
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(ms, 0.0) / 1000.0
+
+    def __repr__(self):
+        return self.spec
+
+
+def _digest(*parts):
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).digest()
+
+
+def completion_tokens(model, system_prompt, prompt, min_tokens, max_tokens):
+    """Deterministic completion of a prompt, as a list of tokens"""
+    rng = random.Random(_digest(model, system_prompt or "", prompt))
+    count = rng.randint(min_tokens, max_tokens)
+    words = [rng.choice(VOCABULARY) for _ in range(count)]
+    # Group the words into a numbered list, which is what the agents ask for
+    tokens = []
+    step = 1
+    for index, word in enumerate(words):
+        if index % 8 == 0:
+            tokens.append(("\n" if index else "") + f"{step}.")
+            step += 1
+        tokens.append(f" {word}")
+    return tokens
+
+
+def embedding(model, text, dim):
+    """Deterministic unit-length embedding of a text"""
+    rng = random.Random(_digest(model, text))
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class FakeOllamaConfig:
+    """Behaviour of the fake server"""
+
+    def __init__(self, first_token_latency="lognormal:300,0.4", embedding_latency="lognormal:20,0.3",
+                 tokens_per_second=30.0, min_tokens=24, max_tokens=96, error_rate=0.0, stall_rate=0.0,
+                 stall_seconds=30.0, load_seconds=2.0, parallel=2, embedding_dim=DEFAULT_EMBEDDING_DIM, seed=None):
+        self.first_token_latency = LatencyDistribution(first_token_latency)
+        self.embedding_latency = LatencyDistribution(embedding_latency)
+        self.tokens_per_second = tokens_per_second
+        self.min_tokens = min_tokens
+        self.max_tokens = max(max_tokens, min_tokens)
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.load_seconds = load_seconds
+        self.parallel = parallel
+        self.embedding_dim = embedding_dim
+        self.seed = seed
+
+
+class FakeOllamaServer:
+    """Threaded HTTP server speaking the subset of the Ollama API the client uses
+
+    At most ``parallel`` generate requests run at once, like Ollama's
+    parallel slots; the others wait for a slot, so queueing shows up in
+    latency. The first generate request of each model also pays
+    ``load_seconds`` to load it, which a warm-up request absorbs.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=DEFAULT_PORT):
+        self.config = config or FakeOllamaConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, self.config.parallel))
+        self._loaded_models = set()
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"generate": 0, "embeddings": 0, "errors": 0, "stalls": 0, "tokens": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread, e.g. from a benchmark script"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _sample(self, distribution):
+        with self._rng_lock:
+            return distribution.sample(self._rng)
+
+    def _outcome(self):
+        """Decide whether a request fails, stalls or succeeds"""
+        with self._rng_lock:
+            roll = self._rng.random()
+        if roll < self.config.error_rate:
+            return "error"
+        if roll < self.config.error_rate + self.config.stall_rate:
+            return "stall"
+        return "ok"
+
+    def _load(self, model):
+        """Simulate loading a model on its first use"""
+        with self._load_lock:
+            if model in self._loaded_models:
+                return 0.0
+            time.sleep(self.config.load_seconds)
+            self._loaded_models.add(model)
+            return self.config.load_seconds
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    return json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return None
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json(200, {"version": FAKE_VERSION})
+                elif self.path == "/api/fake/stats":
+                    with server._stats_lock:
+                        stats = dict(server.stats)
+                    self._send_json(200, stats)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                payload = self._read_json()
+                if payload is None:
+                    self._send_json(400, {"error": "invalid JSON body"})
+                elif self.path == "/api/generate":
+                    self._generate(payload)
+                elif self.path in ("/api/embeddings", "/api/embed"):
+                    self._embeddings(payload)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def _fail_or_stall(self):
+                outcome = server._outcome()
+                if outcome == "error":
+                    server._count("errors")
+                    self._send_json(500, {"error": "simulated server error"})
+                    return True
+                if outcome == "stall":
+                    # Longer than the client's read timeout, to exercise it
+                    server._count("stalls")
+                    time.sleep(server.config.stall_seconds)
+                    self._send_json(500, {"error": "simulated stall"})
+                    return True
+                return False
+
+            def _generate(self, payload):
+                server._count("generate")
+                model = payload.get("model", "")
+                prompt = payload.get("prompt", "")
+                started = time.perf_counter()
+                with server._slots:
+                    load_seconds = server._load(model)
+                    # An empty prompt only loads the model, as in Ollama
+                    if not prompt:
+                        self._send_json(200, {"model": model, "created_at": _now(), "response": "",
+                                              "done": True, "load_duration": int(load_seconds * 1e9)})
+                        return
+                    if self._fail_or_stall():
+                        return
+
+                    tokens = completion_tokens(model, payload.get("system"), prompt,
+                                               server.config.min_tokens, server.config.max_tokens)
+                    server._count("tokens", len(tokens))
+                    time.sleep(server._sample(server.config.first_token_latency))
+                    token_seconds = 1.0 / server.config.tokens_per_second if server.config.tokens_per_second > 0 else 0
+                    if payload.get("stream", True):
+                        self._stream(model, tokens, token_seconds, started)
+                    else:
+                        time.sleep(token_seconds * (len(tokens) - 1))
+                        self._send_json(200, self._final_chunk(model, "".join(tokens), len(tokens), started))
+
+            def _stream(self, model, tokens, token_seconds, started):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, token in enumerate(tokens):
+                    if index:
+                        time.sleep(token_seconds)
+                    self._write_chunk({"model": model, "created_at": _now(), "response": token, "done": False})
+                self._write_chunk(self._final_chunk(model, "", len(tokens), started))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, payload):
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            @staticmethod
+            def _final_chunk(model, response, token_count, started):
+                return {"model": model, "created_at": _now(), "response": response, "done": True,
+                        "total_duration": int((time.perf_counter() - started) * 1e9), "eval_count": token_count}
+
+            def _embeddings(self, payload):
+                server._count("embeddings")
+                if self._fail_or_stall():
+                    return
+                model = payload.get("model", "")
+                text = payload.get("prompt", payload.get("input", ""))
+                time.sleep(server._sample(server.config.embedding_latency))
+                self._send_json(200, {"embedding": embedding(model, text, server.config.embedding_dim)})
+
+        return Handler
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server with configurable latency and errors")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--first-token-latency", default="lognormal:300,0.4",
+                        help="Time to first token of a generate request, in ms")
+    parser.add_argument("--embedding-latency", default="lognormal:20,0.3", help="Embedding latency, in ms")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--min-tokens", type=int, default=24)
+    parser.add_argument("--max-tokens", type=int, default=96)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="Fraction of requests that hang for --stall-seconds before failing")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--load-seconds", type=float, default=2.0, help="Time to load a model on its first use")
+    parser.add_argument("--parallel", type=int, default=2, help="Generate requests served at once")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latencies and errors")
+    args = parser.parse_args(argv)
+
+    try:
+        config = FakeOllamaConfig(
+            first_token_latency=args.first_token_latency, embedding_latency=args.embedding_latency,
+            tokens_per_second=args.tokens_per_second, min_tokens=args.min_tokens, max_tokens=args.max_tokens,
+            error_rate=args.error_rate, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+            load_seconds=args.load_seconds, parallel=args.parallel, embedding_dim=args.embedding_dim, seed=args.seed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = FakeOllamaServer(config, host=args.host, port=args.port)
+    logger.info(f"Fake Ollama server listening on {server.url} (first token {config.first_token_latency}, "
+                f"{config.tokens_per_second} tokens/s, error rate {config.error_rate}, parallel {config.parallel})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
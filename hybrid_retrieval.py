@@ -0,0 +1,211 @@
+import time
+import logging
+
+from models import Solution, KnowledgeBaseEntry, Ticket
+from model_registry import SharedComponent
+from embedding_store import knowledge_base_text
+from vector_index import normalize
+
+logger = logging.getLogger(__name__)
+
+# Lexical candidates taken from each source before reranking
+CANDIDATES_PER_SOURCE = 20
+
+# Reciprocal rank fusion constant; larger values flatten the rank curve
+RRF_K = 60
+
+# Minimum cosine similarity of a resolved ticket suggested for another ticket
+RESOLVED_TICKET_MIN_SIMILARITY = 0.6
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked lists of keys into one {key: score} map"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class HybridRetriever:
+    """Lexical candidate generation with semantic reranking
+
+    Knowledge base entries, stored solutions and similar resolved tickets
+    are retrieved in one pipeline. A cheap lexical stage takes a bounded
+    number of BM25 candidates from each source's inverted index; the
+    semantic stage ranks only those candidates by cosine similarity between
+    the query embedding and their stored embeddings. Resolved tickets come
+    from the vector index over all resolved ticket embeddings, ranked by
+    similarity. The rankings are then fused by reciprocal rank. Candidates
+    without a stored embedding, or all of them when no embedding model is
+    available, keep their lexical rank only, so the pipeline degrades to
+    BM25. The query is embedded once, within the request's deadline, and
+    each stage is timed.
+    """
+
+    knowledge_base_index = SharedComponent("knowledge_base_index")
+    solution_index = SharedComponent("solution_index")
+    resolved_ticket_index = SharedComponent("resolved_ticket_index")
+    embedding_store = SharedComponent("embedding_store")
+    ollama_client = SharedComponent("ollama_client")
+
+    def __init__(self, knowledge_base_index=None, solution_index=None, resolved_ticket_index=None,
+                 embedding_store=None, ollama_client=None, candidates_per_source=CANDIDATES_PER_SOURCE):
+        self.knowledge_base_index = knowledge_base_index
+        self.solution_index = solution_index
+        self.resolved_ticket_index = resolved_ticket_index
+        self.embedding_store = embedding_store
+        self.ollama_client = ollama_client
+        self.candidates_per_source = candidates_per_source
+
+    def retrieve(self, description, category=None, limit=5, exclude_ticket_id=None, deadline=None):
+        """Return fused results and per-stage timings for an issue description
+
+        Results are dicts with the source ("knowledge_base", "solution" or
+        "resolved_ticket"), the matched ORM object, the fused score, and the
+        lexical and semantic ranks and similarity behind it, best first. The
+        ticket being answered can be left out of the resolved tickets with
+        exclude_ticket_id (its primary key). The query embedding is only
+        requested from the model while ``deadline`` allows.
+        """
+        timings = {}
+        started = time.perf_counter()
+
+        # Stage 1: lexical candidates from both inverted indexes
+        stage_started = time.perf_counter()
+        kb_matches = self.knowledge_base_index.search(description, category=category,
+                                                      limit=self.candidates_per_source)
+        solution_matches = self.solution_index.lexical_search(category, description,
+                                                              top_k=self.candidates_per_source)
+        kb_ranking = [("knowledge_base", entry_id) for entry_id, _ in kb_matches]
+        solution_ranking = [("solution", solution_id) for solution_id, _ in solution_matches]
+        timings["lexical_ms"] = self._elapsed_ms(stage_started)
+
+        # The query embedding shared by the resolved ticket and semantic stages
+        stage_started = time.perf_counter()
+        query = self._query_embedding(description, deadline)
+        timings["embedding_ms"] = self._elapsed_ms(stage_started)
+
+        # Similar resolved tickets from the vector index over all of them
+        stage_started = time.perf_counter()
+        ticket_matches = self._similar_resolved_tickets(query, category, exclude_ticket_id)
+        ticket_ranking = [("resolved_ticket", ticket_id) for ticket_id, _ in ticket_matches]
+        candidates = self._load_candidates(kb_ranking, solution_ranking, ticket_ranking)
+        timings["resolved_tickets_ms"] = self._elapsed_ms(stage_started)
+
+        # Stage 2: rerank the candidates by embedding similarity
+        stage_started = time.perf_counter()
+        # Resolved tickets were already found by embedding similarity
+        similarities = self._semantic_similarities(query, {
+            key: item for key, item in candidates.items() if key[0] != "resolved_ticket"})
+        semantic_ranking = sorted(similarities, key=similarities.get, reverse=True)
+        timings["semantic_ms"] = self._elapsed_ms(stage_started)
+
+        # Stage 3: reciprocal rank fusion of the lexical, semantic and resolved ticket rankings
+        stage_started = time.perf_counter()
+        ticket_ranking = [key for key in ticket_ranking if key in candidates]
+        similarities.update((("resolved_ticket", ticket_id), round(score, 4)) for ticket_id, score in ticket_matches)
+        rankings = [
+            [key for key in kb_ranking if key in candidates],
+            [key for key in solution_ranking if key in candidates],
+            semantic_ranking,
+            ticket_ranking
+        ]
+        scores = reciprocal_rank_fusion(rankings)
+        lexical_ranks = {key: rank for ranking in rankings[:2] for rank, key in enumerate(ranking, 1)}
+        semantic_ranks = {key: rank for ranking in rankings[2:] for rank, key in enumerate(ranking, 1)}
+        ranked = sorted(scores, key=lambda key: (-scores[key], key))[:limit]
+        results = [
+            {
+                "source": key[0],
+                "item": candidates[key],
+                "score": round(scores[key], 6),
+                "lexical_rank": lexical_ranks.get(key),
+                "semantic_rank": semantic_ranks.get(key),
+                "similarity": similarities.get(key)
+            }
+            for key in ranked
+        ]
+        timings["fusion_ms"] = self._elapsed_ms(stage_started)
+        timings["total_ms"] = self._elapsed_ms(started)
+        timings["candidates"] = len(candidates)
+        return results, timings
+
+    @staticmethod
+    def _elapsed_ms(started):
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    def _query_embedding(self, description, deadline=None):
+        """Embedding of the query, or None when neither the store nor the model has one"""
+        try:
+            client = self.ollama_client
+            # Served from the embedding store when the text was embedded before; the
+            # query itself is not stored, only the corpus is
+            if client.is_available:
+                query = client.get_embeddings(description, deadline=deadline, persist=False)
+            else:
+                query = self.embedding_store.get(client.model, description)
+        except Exception as e:
+            logger.error(f"Error embedding retrieval query: {str(e)}")
+            return None
+        if query is None or len(query) == 0:
+            return None
+        return query
+
+    def _similar_resolved_tickets(self, query, category, exclude_ticket_id=None):
+        """(ticket id, similarity) pairs of the resolved tickets closest to the query embedding"""
+        if query is None:
+            return []
+        try:
+            matches = self.resolved_ticket_index.search(query, category=category,
+                                                        top_k=self.candidates_per_source + 1,
+                                                        min_similarity=RESOLVED_TICKET_MIN_SIMILARITY)
+        except Exception as e:
+            logger.error(f"Error searching similar resolved tickets: {str(e)}")
+            return []
+        return [(ticket_id, score) for ticket_id, score in matches
+                if ticket_id != exclude_ticket_id][:self.candidates_per_source]
+
+    @staticmethod
+    def _load_candidates(kb_ranking, solution_ranking, ticket_ranking=()):
+        """Fetch the candidate rows, keyed by (source, id)"""
+        candidates = {}
+        if kb_ranking:
+            for entry in KnowledgeBaseEntry.query.filter(
+                    KnowledgeBaseEntry.id.in_([entry_id for _, entry_id in kb_ranking])).all():
+                candidates[("knowledge_base", entry.id)] = entry
+        if solution_ranking:
+            for solution in Solution.query.filter(
+                    Solution.id.in_([solution_id for _, solution_id in solution_ranking])).all():
+                candidates[("solution", solution.id)] = solution
+        if ticket_ranking:
+            for ticket in Ticket.query.filter(
+                    Ticket.id.in_([ticket_id for _, ticket_id in ticket_ranking]), Ticket.resolution.isnot(None)).all():
+                candidates[("resolved_ticket", ticket.id)] = ticket
+        return candidates
+
+    def _semantic_similarities(self, query, candidates):
+        """Cosine similarity of each candidate with a stored embedding to the query embedding"""
+        if query is None or not candidates:
+            return {}
+        try:
+            model = self.ollama_client.model
+            keys = list(candidates)
+            texts = [
+                knowledge_base_text(candidates[key].title, candidates[key].content) if key[0] == "knowledge_base"
+                else candidates[key].solution_text
+                for key in keys
+            ]
+            # Candidate embeddings only come from the store, so the stage never
+            # waits on the model for more than the query
+            embeddings = self.embedding_store.get_many(model, texts)
+            found = [(key, embedding) for key, embedding in zip(keys, embeddings)
+                     if embedding is not None and len(embedding) == len(query)]
+            if not found:
+                return {}
+
+            scores = normalize([embedding for _, embedding in found]) @ normalize(query)[0]
+            return {key: round(float(score), 4) for (key, _), score in zip(found, scores)}
+        except Exception as e:
+            logger.error(f"Error reranking candidates by embedding similarity: {str(e)}")
+            return {}
@@ -0,0 +1,206 @@
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Distinct words whose keyword hits are remembered between scans
+WORD_CACHE_SIZE = 50000
+
+# Keyword lists used by the rule-based text heuristics, grouped by the rule
+# that uses them. Keywords match anywhere in the lower-cased text, like a
+# substring check, and the order within a group is the order rules report them.
+KEYWORD_GROUPS = {
+    # SentimentAnalyzer.analyze_sentiment
+    "sentiment.Frustrated": ["frustrated", "annoying", "disappointing", "terrible", "awful", "useless"],
+    "sentiment.Confused": ["confused", "confusing", "unsure", "don't understand", "unclear", "lost"],
+    "sentiment.Anxious": ["anxious", "worried", "concerned", "nervous", "urgent", "critical"],
+    "sentiment.Annoyed": ["annoyed", "irritated", "bothered", "fed up", "tired of", "annoying"],
+    "sentiment.Urgent": ["urgent", "emergency", "immediately", "asap", "critical", "serious"],
+    "sentiment.Satisfied": ["satisfied", "happy", "pleased", "good", "great", "excellent"],
+
+    # ClassifierAgent._determine_priority
+    "priority.urgent": ["urgent", "critical", "emergency", "immediately", "asap", "broken", "error", "not working"],
+    "priority.network": ["network", "connection", "internet", "wifi", "connect", "slow"],
+    "priority.account": ["account", "password", "login", "locked", "security"],
+    "priority.payment": ["payment", "charge", "refund", "billing", "invoice", "money"],
+    "priority.payment_failure": ["not", "failed"],
+    "priority.app": ["crash", "bug", "glitch", "freeze", "stuck"],
+
+    # ClassifierAgent._estimate_resolution_time
+    "complexity": ["complex", "multiple", "several", "failed repeatedly", "tried everything"],
+
+    # ClassifierAgent._assign_team, checked in this order
+    "team.PAYMENT": ["payment", "transaction", "credit card"],
+    "team.NETWORK": ["network", "internet", "connection"],
+    "team.ACCOUNT": ["account", "login", "password"],
+    "team.SOFTWARE": ["install", "software", "app"],
+
+    # EscalationAgent.should_escalate
+    "escalation": ["manager", "supervisor", "lawsuit", "legal", "compensation", "refund"],
+
+    # ChatbotAgent
+    "chat.technical_issue": ["error", "problem", "issue", "not working", "broken", "fails", "bug",
+                             "can't", "cannot", "doesn't", "does not"],
+    "chat.thanks": ["thank you", "thanks", "thank", "thx", "appreciate it"],
+    "chat.yes": ["yes", "yeah", "yep", "sure", "please", "i do", "i have", "another question"],
+
+    # OllamaClient._generate_fallback_response
+    "fallback.greeting": ["hello", "hi", "hey", "greetings"],
+    "fallback.capabilities": ["what can you", "help me with"],
+    "fallback.network": ["network", "connection", "wifi"],
+    "fallback.install": ["install", "download"],
+    "fallback.account": ["account", "login", "password"],
+}
+
+
+class KeywordHits:
+    """Keywords found in a text, queried by group"""
+
+    def __init__(self, matcher, keywords):
+        self.matcher = matcher
+        self.keywords = keywords
+
+    def __contains__(self, keyword):
+        return keyword in self.keywords
+
+    def matches(self, group):
+        """Return the keywords of a group found in the text, in group order"""
+        return [keyword for keyword in self.matcher.groups[group] if keyword in self.keywords]
+
+    def has_any(self, group):
+        """Check whether any keyword of a group was found"""
+        return not self.keywords.isdisjoint(self.matcher.groups[group])
+
+    def count(self, group):
+        """Count the distinct keywords of a group that were found"""
+        return len(self.matcher.group_sets[group] & self.keywords)
+
+    def first(self, group):
+        """Return the first keyword of a group that was found, or None"""
+        for keyword in self.matcher.groups[group]:
+            if keyword in self.keywords:
+                return keyword
+        return None
+
+
+class KeywordMatcher:
+    """Finds the keywords of many groups in a single pass over a text
+
+    The text is split into its distinct words in one pass, and the
+    keywords inside each word are looked up in a cache filled the first
+    time the word is seen, so a scan costs a lookup per distinct word
+    rather than a search of the whole text per keyword. A keyword without
+    spaces occurs in the text exactly when it occurs inside one of its
+    words; a keyword spanning several words is checked against the text
+    itself only when all of its words were found. The result is the same
+    as a substring check for every keyword.
+    """
+
+    def __init__(self, groups, cache_size=None):
+        self.groups = {name: tuple(keywords) for name, keywords in groups.items()}
+        self.group_sets = {name: frozenset(keywords) for name, keywords in self.groups.items()}
+
+        keywords = {keyword for group in self.groups.values() for keyword in group}
+        self._phrases = tuple((keyword, tuple(keyword.split(" "))) for keyword in sorted(keywords) if " " in keyword)
+        # Keywords and the words of multi-word keywords, searched for inside each word of a text
+        self._parts = tuple(sorted({keyword for keyword in keywords if " " not in keyword} |
+                                   {word for _, words in self._phrases for word in words}))
+        self._keywords = frozenset(keywords)
+        self._parts_in_word = lru_cache(maxsize=cache_size or WORD_CACHE_SIZE)(self._find_parts)
+
+    def _find_parts(self, word):
+        return frozenset(part for part in self._parts if part in word)
+
+    def scan(self, text):
+        """Find every keyword occurring in the text"""
+        if not text:
+            return KeywordHits(self, set())
+        text = text.lower()
+        parts = set()
+        for word in set(text.split()):
+            parts.update(self._parts_in_word(word))
+
+        found = parts & self._keywords
+        found.update(phrase for phrase, words in self._phrases
+                     if parts.issuperset(words) and phrase in text)
+        return KeywordHits(self, found)
+
+
+# Shared matcher built once for the whole process
+keyword_matcher = KeywordMatcher(KEYWORD_GROUPS)
+
+
+def _reference_scan(text):
+    """Reference result: one substring check per keyword"""
+    text = text.lower()
+    return {keyword for keywords in KEYWORD_GROUPS.values() for keyword in keywords if keyword in text}
+
+
+def _legacy_classify_checks(description):
+    """The keyword checks classify_ticket ran before the shared matcher, one rule at a time"""
+    # SentimentAnalyzer.analyze_sentiment
+    text = description.lower()
+    for group in ("Frustrated", "Confused", "Anxious", "Annoyed", "Urgent", "Satisfied"):
+        for keyword in KEYWORD_GROUPS[f"sentiment.{group}"]:
+            if keyword in text:
+                pass
+
+    # ClassifierAgent._determine_priority, on the Neutral sentiment path
+    description_lower = description.lower()
+    if not any(keyword in description_lower for keyword in KEYWORD_GROUPS["priority.urgent"]):
+        for group in ("network", "account", "payment", "app"):
+            if any(keyword in description_lower for keyword in KEYWORD_GROUPS[f"priority.{group}"]):
+                break
+
+    # ClassifierAgent._estimate_resolution_time
+    any(indicator in description.lower() for indicator in KEYWORD_GROUPS["complexity"])
+
+    # ClassifierAgent._assign_team
+    for team in ("PAYMENT", "NETWORK", "ACCOUNT", "SOFTWARE"):
+        if any(keyword in description.lower() for keyword in KEYWORD_GROUPS[f"team.{team}"]):
+            break
+
+
+def _classify_checks(description):
+    """The same checks with the shared matcher: one scan, then set lookups"""
+    hits = keyword_matcher.scan(description)
+    for group in ("Frustrated", "Confused", "Anxious", "Annoyed", "Urgent", "Satisfied"):
+        hits.count(f"sentiment.{group}")
+    if not hits.has_any("priority.urgent"):
+        for group in ("network", "account", "payment", "app"):
+            if hits.has_any(f"priority.{group}"):
+                break
+    hits.has_any("complexity")
+    for team in ("PAYMENT", "NETWORK", "ACCOUNT", "SOFTWARE"):
+        if hits.has_any(f"team.{team}"):
+            break
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python keyword_matcher.py
+    import random
+    import timeit
+
+    sentences = [
+        "My wifi keeps dropping every few minutes and the laptop shows no internet access.",
+        "I restarted the router twice but the connection is still slow in the evening.",
+        "The installer stops halfway and then the screen stays blank for a while.",
+        "My card was charged twice for the same order last week.",
+        "I have tried everything in the help article and nothing changed.",
+        "After the latest update the settings page takes ages to open.",
+    ]
+    for length in (50, 500, 5000):
+        words = []
+        while len(words) < length:
+            words.extend(random.choice(sentences).split())
+        text = " ".join(words[:length])
+        assert keyword_matcher.scan(text).keywords == _reference_scan(text)
+
+        # Best of five rounds, each long enough to smooth out timer noise
+        runs = max(20, 100000 // length)
+        timings = [min(timeit.repeat(lambda: checks(text), number=runs, repeat=5)) / runs * 1000
+                   for checks in (_legacy_classify_checks, _classify_checks)]
+
+        legacy_ms, matcher_ms = timings
+        print(f"{length:>5} words: per-rule keyword checks {legacy_ms:.3f} ms, "
+              f"shared matcher {matcher_ms:.3f} ms ({legacy_ms / matcher_ms:.1f}x)")
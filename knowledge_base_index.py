@@ -0,0 +1,213 @@
+import json
+import time
+import pickle
+import heapq
+import logging
+import threading
+
+from app import db
+from models import KnowledgeBaseEntry
+from model_store import artifact_store as default_artifact_store, compute_fingerprint
+from change_tracking import track_committed_changes
+from bm25 import BM25FIndex
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the persisted index changes
+INDEX_FORMAT_VERSION = 2
+
+# BM25F weight and length normalization of each field
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "content": 1.0}
+FIELD_B = {"title": 0.5, "tags": 0.3, "content": 0.75}
+
+# Each helpful vote raises the score by 5%, up to 5 votes
+HELPFUL_BOOST_PER_VOTE = 0.05
+MAX_HELPFUL_VOTES = 5
+
+
+def parse_tags(tags):
+    """Parse the JSON tag list of a knowledge base entry"""
+    try:
+        parsed = json.loads(tags) if tags else []
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(parsed, list):
+        return []
+    return [str(tag).lower() for tag in parsed if tag]
+
+
+class KnowledgeBaseIndex:
+    """Inverted BM25F index over knowledge base entries
+
+    Postings map each word to the entries containing it, with term frequencies
+    for the title, tags and content, so a lookup only touches entries sharing
+    a word with the query and ranks them with BM25F. The index is saved
+    through the model artifact store and reloaded at startup while the
+    knowledge base is unchanged. Created, edited and deleted entries are
+    applied incrementally once their transaction commits, and the index is
+    rebuilt and saved again on every background retraining run.
+    """
+
+    artifact_name = "knowledge_base_index"
+
+    def __init__(self, artifact_store=None):
+        self.artifact_store = artifact_store or default_artifact_store
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._pending = set()
+        self.bm25 = self._new_bm25()
+        self.built_at = None
+        self.artifact_metadata = None
+
+    @staticmethod
+    def _new_bm25():
+        return BM25FIndex(FIELD_WEIGHTS, FIELD_B)
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def current_fingerprint(self):
+        """Fingerprint the knowledge base from cheap aggregates"""
+        stats = db.session.query(
+            db.func.count(KnowledgeBaseEntry.id),
+            db.func.max(KnowledgeBaseEntry.id),
+            db.func.max(KnowledgeBaseEntry.updated_at)
+        ).one()
+        return compute_fingerprint(self.artifact_name, INDEX_FORMAT_VERSION, *stats)
+
+    @staticmethod
+    def _add_entry(bm25, entry_id, title, content, category, tags):
+        fields = {"title": title, "tags": " ".join(parse_tags(tags)), "content": content}
+        bm25.add(entry_id, fields, {"category": category})
+
+    def build(self, save=True):
+        """Index every knowledge base entry, streaming them from the database"""
+        from training_data import iter_chunks
+
+        started = time.time()
+        with self._lock:
+            # Changes made while building are applied on the next sync
+            self._pending.clear()
+        fingerprint = self.current_fingerprint()
+
+        # Build into a separate index so searches keep using the current one
+        bm25 = self._new_bm25()
+        columns = [KnowledgeBaseEntry.id, KnowledgeBaseEntry.title, KnowledgeBaseEntry.content,
+                   KnowledgeBaseEntry.category, KnowledgeBaseEntry.tags]
+        for rows in iter_chunks(columns):
+            for row in rows:
+                self._add_entry(bm25, *row)
+
+        with self._lock:
+            self.bm25 = bm25
+            self.built_at = time.time()
+
+        logger.info(f"Knowledge base index built for {len(bm25)} entries "
+                    f"in {time.time() - started:.2f}s")
+        if save:
+            self.save(fingerprint)
+
+    def save(self, fingerprint=None):
+        """Persist the index as a new artifact version"""
+        with self._lock:
+            # Pre-pickled with the C pickler; joblib's pure-Python pickler is
+            # very slow on millions of small postings
+            state = pickle.dumps(self.bm25, protocol=pickle.HIGHEST_PROTOCOL)
+            metadata = self.artifact_store.save(self.artifact_name, state, fingerprint or self.current_fingerprint(),
+                                                extra={"entries": len(self.bm25)})
+        if metadata:
+            self.artifact_metadata = metadata
+
+    def load_or_build(self):
+        """Load the saved index if the knowledge base is unchanged, otherwise build it"""
+        with self._build_lock:
+            if self.is_built:
+                return
+            state, metadata = self.artifact_store.load(self.artifact_name, self.current_fingerprint())
+            if state is not None:
+                with self._lock:
+                    self.bm25 = pickle.loads(state)
+                    self.artifact_metadata = metadata
+                    self.built_at = time.time()
+                logger.info(f"Knowledge base index loaded from artifact version {metadata['version']}")
+                return
+            self.build()
+
+    def refit(self):
+        """Rebuild the index from scratch and save it"""
+        self.build()
+        return {"status": "rebuilt", "entries": len(self.bm25)}
+
+    def mark_changed(self, entry_ids):
+        """Record entries that were created, edited or deleted since the last sync"""
+        with self._lock:
+            self._pending.update(entry_ids)
+
+    def _sync(self):
+        """Apply pending entry changes to the postings"""
+        with self._lock:
+            if not self._pending:
+                return
+            changed = set(self._pending)
+            self._pending.clear()
+
+        rows = db.session.query(
+            KnowledgeBaseEntry.id, KnowledgeBaseEntry.title, KnowledgeBaseEntry.content,
+            KnowledgeBaseEntry.category, KnowledgeBaseEntry.tags
+        ).filter(KnowledgeBaseEntry.id.in_(changed)).all()
+
+        with self._lock:
+            for entry_id in changed:
+                self.bm25.remove(entry_id)
+            for row in rows:
+                self._add_entry(self.bm25, *row)
+
+    def search(self, description, category=None, limit=3):
+        """Return (entry_id, score) pairs for the entries best matching a description"""
+        if not self.is_built:
+            self.load_or_build()
+        self._sync()
+
+        with self._lock:
+            if category:
+                scores = self.bm25.score(description, category=category)
+            else:
+                scores = self.bm25.score(description)
+
+        if not scores:
+            return []
+
+        # The helpful boost is capped, so only entries within that cap of the
+        # k-th best text score can still make the top k
+        max_boost = 1 + HELPFUL_BOOST_PER_VOTE * MAX_HELPFUL_VOTES
+        threshold = heapq.nlargest(limit, scores.values())[-1]
+        contenders = [entry_id for entry_id, score in scores.items() if score * max_boost >= threshold]
+        helpful_counts = {}
+        for start in range(0, len(contenders), 500):
+            chunk = contenders[start:start + 500]
+            helpful_counts.update(
+                db.session.query(KnowledgeBaseEntry.id, KnowledgeBaseEntry.helpful_count)
+                .filter(KnowledgeBaseEntry.id.in_(chunk)).all()
+            )
+
+        ranked = (
+            (entry_id, scores[entry_id] * (1 + HELPFUL_BOOST_PER_VOTE *
+                                           min(MAX_HELPFUL_VOTES, helpful_counts.get(entry_id) or 0)))
+            for entry_id in contenders if entry_id in helpful_counts
+        )
+        return heapq.nlargest(limit, ranked, key=lambda item: (item[1], -item[0]))
+
+    def get_stats(self):
+        """Return the size and age of the index"""
+        return {
+            "is_built": self.is_built,
+            "built_at": self.built_at,
+            **self.bm25.get_stats(),
+            "pending_changes": len(self._pending),
+            "artifact": self.artifact_metadata
+        }
+
+
+# Keep the index in sync with knowledge base writes made through the ORM
+track_committed_changes(KnowledgeBaseEntry, "knowledge_base_index", ["title", "content", "category", "tags"])
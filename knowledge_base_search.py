@@ -0,0 +1,179 @@
+import re
+import html
+import logging
+
+from sqlalchemy import text
+
+from app import db
+from models import KnowledgeBaseEntry
+from knowledge_base_index import FIELD_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "knowledge_base_fts"
+FTS_COLUMNS = ("title", "content", "tags")
+
+# Words of at least one letter or digit; everything else is dropped from the
+# FTS5 query, so user input can never be parsed as query syntax
+QUERY_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Control characters mark snippet matches so the text can be escaped first
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+SNIPPET_TOKENS = 24
+
+# Whether the FTS5 table is set up on the current database; None until checked
+_fts_available = None
+
+
+def _trigger_statements(entry_table):
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    delete_old = (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return {
+        f"{FTS_TABLE}_ai": f"AFTER INSERT ON {entry_table} BEGIN {insert_new} END",
+        f"{FTS_TABLE}_ad": f"AFTER DELETE ON {entry_table} BEGIN {delete_old} END",
+        # Only text edits touch the index, not view or helpful counters
+        f"{FTS_TABLE}_au": f"AFTER UPDATE OF {columns} ON {entry_table} BEGIN {delete_old} {insert_new} END"
+    }
+
+
+def setup_full_text_search(engine=None):
+    """Create the FTS5 table over knowledge base entries and its sync triggers
+
+    The table is an external-content FTS5 index on the entry table, kept in
+    sync by triggers on every insert, delete and text edit, so writes made
+    through the ORM, raw SQL or other processes all reach it. It is rebuilt
+    from the entry table whenever the table or a trigger had to be created,
+    e.g. on first start or after the database was reset. Databases other than
+    SQLite, and SQLite builds without FTS5, fall back to pattern matching.
+    """
+    global _fts_available
+    engine = engine or db.engine
+    if engine.dialect.name != "sqlite":
+        _fts_available = False
+        return False
+
+    entry_table = KnowledgeBaseEntry.__tablename__
+    triggers = _trigger_statements(entry_table)
+    try:
+        with engine.begin() as connection:
+            existing = {name for (name,) in connection.execute(
+                text("SELECT name FROM sqlite_master WHERE name = :table OR (type = 'trigger' AND tbl_name = :entries)"),
+                {"table": FTS_TABLE, "entries": entry_table}
+            )}
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{', '.join(FTS_COLUMNS)}, content='{entry_table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            ))
+            for name, body in triggers.items():
+                connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+
+            missing = ({FTS_TABLE} | triggers.keys()) - existing
+            if missing:
+                connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                logger.info(f"Full-text index {FTS_TABLE} rebuilt")
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable, falling back to pattern matching: {str(e)}")
+        _fts_available = False
+        return False
+
+    _fts_available = True
+    return True
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query matching every word
+
+    Each word is quoted so it is matched literally, and the last word is
+    matched as a prefix so results follow the search box while typing.
+    """
+    tokens = QUERY_TOKEN_PATTERN.findall(query or "")
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _format_snippet(snippet):
+    """Escape a snippet and wrap its matches in <mark> tags"""
+    if not snippet:
+        return None
+    return html.escape(snippet).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+def _search_fts(query, category, limit):
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    weights = ", ".join(str(FIELD_WEIGHTS[column]) for column in FTS_COLUMNS)
+    content_column = FTS_COLUMNS.index("content")
+    entry_table = KnowledgeBaseEntry.__tablename__
+    sql = (
+        f"SELECT {FTS_TABLE}.rowid, bm25({FTS_TABLE}, {weights}) AS rank, "
+        f"snippet({FTS_TABLE}, {content_column}, :start, :end, '…', {SNIPPET_TOKENS}) "
+        f"FROM {FTS_TABLE} JOIN {entry_table} ON {entry_table}.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match"
+    )
+    params = {"match": match, "start": SNIPPET_START, "end": SNIPPET_END}
+    if category:
+        sql += f" AND {entry_table}.category = :category"
+        params["category"] = category
+    sql += " ORDER BY rank"
+    if limit:
+        sql += " LIMIT :limit"
+        params["limit"] = int(limit)
+
+    rows = db.session.execute(text(sql), params).all()
+    if not rows:
+        return []
+
+    entries = KnowledgeBaseEntry.query.filter(KnowledgeBaseEntry.id.in_([row[0] for row in rows])).all()
+    entries_by_id = {entry.id: entry for entry in entries}
+    # bm25() is lower for better matches; flip it so higher scores rank first
+    return [
+        (entries_by_id[entry_id], -rank, _format_snippet(snippet))
+        for entry_id, rank, snippet in rows if entry_id in entries_by_id
+    ]
+
+
+def _search_like(query, category, limit):
+    search_pattern = f"%{query}%"
+    entries = KnowledgeBaseEntry.query
+    if category:
+        entries = entries.filter_by(category=category)
+    entries = entries.filter(
+        db.or_(
+            KnowledgeBaseEntry.title.ilike(search_pattern),
+            KnowledgeBaseEntry.content.ilike(search_pattern),
+            KnowledgeBaseEntry.tags.ilike(search_pattern)
+        )
+    ).order_by(KnowledgeBaseEntry.created_at.desc())
+    if limit:
+        entries = entries.limit(limit)
+    return [(entry, None, None) for entry in entries.all()]
+
+
+def search_knowledge_base(query, category=None, limit=None):
+    """Search knowledge base entries by free text
+
+    Returns the search mode used ("fts" or "like") and a list of
+    (entry, score, snippet) tuples. Full-text results are ranked best first
+    by BM25 with the title weighted over tags and content, and carry an
+    HTML snippet of the content with the matches marked. The fallback
+    returns matching entries newest first, without score or snippet.
+    """
+    if _fts_available is None:
+        setup_full_text_search()
+    if _fts_available:
+        try:
+            return "fts", _search_fts(query, category, limit)
+        except Exception as e:
+            logger.error(f"Full-text search failed, falling back to pattern matching: {str(e)}")
+            db.session.rollback()
+    return "like", _search_like(query, category, limit)
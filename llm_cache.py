@@ -0,0 +1,183 @@
+import os
+import json
+import atexit
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Default location of the persisted cache, next to the SQLite database
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'llm_cache.pickle')
+
+# Bump when the layout of the persisted cache changes
+CACHE_FORMAT_VERSION = 1
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def cache_key(model, system_prompt, prompt, options=None):
+    """Hash the inputs that determine an LLM response"""
+    payload = json.dumps([model, system_prompt or "", prompt, options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache of LLM responses with a time-to-live and size limits
+
+    Entries are keyed on the model, system prompt, prompt and generation
+    options, expire after ``ttl_seconds`` and are evicted least recently used
+    first once either the entry count or the total size of the cached
+    responses exceeds its limit. The cache can be persisted to disk, so a
+    restarted worker starts warm: it is loaded on creation and written in
+    the background at most every ``persist_interval`` seconds after a change,
+    and once more at shutdown.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl_seconds=None, path=None, persist=None,
+                 persist_interval=60):
+        self.max_entries = max_entries or int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000))
+        self.max_bytes = max_bytes or int(os.environ.get("LLM_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else \
+            float(os.environ.get("LLM_CACHE_TTL_SECONDS", 24 * 3600))
+        self.path = path or os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.persist = persist if persist is not None else _env_flag("LLM_CACHE_PERSIST", True)
+        self.persist_interval = persist_interval
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (response, expires_at)
+        self._bytes = 0
+        self._dirty = False
+        self._last_saved = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.persist:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def _size(response):
+        return len(response.encode('utf-8'))
+
+    def _drop(self, key):
+        response, _ = self._entries.pop(key)
+        self._bytes -= self._size(response)
+
+    def get(self, key):
+        """Return the cached response for a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            response, expires_at = entry
+            if expires_at <= time.time():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        """Cache a response, evicting least recently used entries beyond the limits"""
+        size = self._size(response)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (response, time.time() + self.ttl_seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            self._dirty = True
+        self._maybe_save()
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._dirty = True
+
+    def _maybe_save(self):
+        if not self.persist or time.time() - self._last_saved < self.persist_interval:
+            return
+        self._last_saved = time.time()
+        threading.Thread(target=self.save, name="llm-cache-save", daemon=True).start()
+
+    def save(self):
+        """Write the unexpired entries to disk atomically"""
+        if not self.persist:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                now = time.time()
+                entries = [(key, entry) for key, entry in self._entries.items() if entry[1] > now]
+                self._dirty = False
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump({"format_version": CACHE_FORMAT_VERSION, "entries": entries}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+                self._last_saved = time.time()
+            except Exception as e:
+                logger.error(f"Error saving LLM response cache: {str(e)}")
+
+    def load(self):
+        """Load the persisted entries that have not expired yet"""
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Error loading LLM response cache: {str(e)}")
+            return
+        if state.get("format_version") != CACHE_FORMAT_VERSION:
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, (response, expires_at) in state["entries"]:
+                if expires_at > now and key not in self._entries:
+                    self._entries[key] = (response, expires_at)
+                    self._bytes += self._size(response)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        logger.info(f"Loaded {len(self._entries)} cached LLM responses")
+
+    def get_stats(self):
+        """Return the size, limits and hit rate of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persisted": self.persist
+        }
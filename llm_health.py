@@ -0,0 +1,202 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open the circuit, and seconds before a trial call
+DEFAULT_FAILURE_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", 3))
+DEFAULT_RESET_TIMEOUT = float(os.environ.get("LLM_CIRCUIT_RESET_TIMEOUT", 30))
+
+# Seconds between health probes of the LLM backend; 0 disables the monitor
+DEFAULT_PROBE_INTERVAL = float(os.environ.get("LLM_HEALTH_PROBE_INTERVAL", 15))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for calls to the LLM backend
+
+    The circuit opens after ``failure_threshold`` consecutive failures, and
+    calls are then refused immediately so callers fall back without waiting
+    for a timeout. After ``reset_timeout`` seconds, or as soon as a health
+    probe succeeds, it turns half-open and lets a single trial call through:
+    its success closes the circuit again and its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None, name="llm"):
+        self.failure_threshold = failure_threshold or DEFAULT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else DEFAULT_RESET_TIMEOUT
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        # Thread making the half-open trial call, None while no trial is in flight
+        self._trial_owner = None
+        self.opened_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.time() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state):
+        if state == self._state:
+            return
+        logger.info(f"Circuit {self.name} {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.time()
+            self.opened_count += 1
+        if state != HALF_OPEN:
+            self._trial_owner = None
+
+    def allow_request(self):
+        """Whether a call may go to the backend now; counts it as the trial call when half-open"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trial_owner is None:
+                self._trial_owner = threading.get_ident()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def abandon(self):
+        """A call ended without telling whether the backend is healthy, e.g. its caller ran out of time
+
+        Only releases the trial call if the calling thread is the one that
+        made it; other calls abandoned meanwhile leave it in flight.
+        """
+        with self._lock:
+            if self._trial_owner == threading.get_ident():
+                self._trial_owner = None
+
+    def trip(self):
+        """Open the circuit immediately, e.g. when the backend is known to be down"""
+        with self._lock:
+            self._transition(OPEN)
+
+    def probe_succeeded(self):
+        """A health probe reached the backend; allow a trial call without waiting for the timeout"""
+        with self._lock:
+            if self._state == OPEN:
+                self._transition(HALF_OPEN)
+
+    def get_stats(self):
+        """Return the state of the circuit and how often it refused calls"""
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected
+            }
+
+
+class HealthMonitor:
+    """Background thread probing the LLM backend and driving its circuit breaker
+
+    ``probe`` returns True when the backend answered; ``warm_up`` is called
+    whenever the backend becomes reachable (including at start), so the
+    model is loaded before real traffic needs it. Failed probes count
+    towards the breaker's failure threshold like failed calls. The
+    application starts the monitor; clients built by scripts do not probe.
+    """
+
+    def __init__(self, probe, warm_up, breaker, interval=None, name="llm-health"):
+        self.probe = probe
+        self.warm_up = warm_up
+        self.breaker = breaker
+        self.interval = interval if interval is not None else DEFAULT_PROBE_INTERVAL
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+        self.healthy = None
+        self.last_probe_at = None
+        self.last_probe_ms = None
+        self.warm_ups = 0
+
+    def start(self):
+        """Start probing in a daemon thread, unless disabled or already running"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def check(self):
+        """Probe the backend once, updating the circuit and warming up on recovery"""
+        started = time.perf_counter()
+        try:
+            healthy = bool(self.probe())
+        except Exception as e:
+            logger.debug(f"LLM health probe failed: {str(e)}")
+            healthy = False
+        self.last_probe_at = time.time()
+        self.last_probe_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        recovered = healthy and not self.healthy
+        if healthy != self.healthy:
+            logger.info(f"LLM backend is {'reachable' if healthy else 'unreachable'}")
+        self.healthy = healthy
+
+        if not healthy:
+            # Counted like a failed call, so a single lost probe does not open the circuit
+            self.breaker.record_failure()
+            return
+        self.breaker.probe_succeeded()
+        if recovered:
+            self._warm_up()
+
+    def _warm_up(self):
+        try:
+            if self.warm_up():
+                self.warm_ups += 1
+                self.breaker.record_success()
+        except Exception as e:
+            logger.warning(f"LLM warm-up failed: {str(e)}")
+
+    def get_stats(self):
+        """Return the outcome of the latest probe"""
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "healthy": self.healthy,
+            "last_probe_at": self.last_probe_at,
+            "last_probe_ms": self.last_probe_ms,
+            "warm_ups": self.warm_ups
+        }
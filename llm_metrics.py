@@ -0,0 +1,9 @@
+def latency_percentiles(values, quantiles=(0.5, 0.95)):
+    """Return {"p50_ms": ..., "p95_ms": ...} for durations in seconds, None when there are none"""
+    if not values:
+        return {f"p{int(q * 100)}_ms": None for q in quantiles}
+    ordered = sorted(values)
+    return {
+        f"p{int(q * 100)}_ms": round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+        for q in quantiles
+    }
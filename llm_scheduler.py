@@ -0,0 +1,176 @@
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from llm_metrics import latency_percentiles
+
+logger = logging.getLogger(__name__)
+
+# LLM generations running at once, callers allowed to wait, and seconds they wait
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+DEFAULT_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", 32))
+DEFAULT_MAX_WAIT = float(os.environ.get("LLM_MAX_QUEUE_WAIT", 5))
+
+# Lower values are served first. Interactive callers have a user waiting on
+# the reply; ticket enrichment runs in the background but is raised above
+# them for Critical and High tickets.
+CALLER_PRIORITIES = {
+    "chat": 1,
+    "resolution": 1,
+    "enrichment": 2,
+    "background": 3
+}
+TICKET_PRIORITY_OFFSETS = {
+    "Critical": -2,
+    "High": -1,
+    "Medium": 0,
+    "Low": 1
+}
+DEFAULT_PRIORITY = 2
+
+# Number of recent queue waits kept per caller for the percentiles
+METRICS_WINDOW = 1000
+
+
+def request_priority(caller, ticket_priority=None):
+    """Scheduling priority of an LLM call from its caller type and ticket priority"""
+    return CALLER_PRIORITIES.get(caller, DEFAULT_PRIORITY) + TICKET_PRIORITY_OFFSETS.get(ticket_priority, 0)
+
+
+class _Waiter:
+    __slots__ = ("priority", "caller", "event", "granted", "shed")
+
+    def __init__(self, priority, caller):
+        self.priority = priority
+        self.caller = caller
+        self.event = threading.Event()
+        self.granted = False
+        self.shed = False
+
+
+class _CallerMetrics:
+    def __init__(self):
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.waits = deque(maxlen=METRICS_WINDOW)
+
+
+class LLMScheduler:
+    """Admits LLM calls by priority under a global concurrency limit
+
+    At most ``max_concurrency`` calls run at once. Further callers wait in a
+    priority queue, most urgent first and first come first served within a
+    priority, and a freed slot is handed straight to the head of the queue.
+    Overload is shed rather than queued: when ``max_queue`` callers are
+    already waiting, the least urgent of them (or the newcomer, if it is not
+    more urgent) is refused, and a caller still waiting after ``max_wait``
+    seconds gives up. Refused callers use their fallback responses. Queue
+    waits are recorded per caller type.
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, max_wait=None):
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.max_queue = max_queue if max_queue is not None else DEFAULT_MAX_QUEUE
+        self.max_wait = max_wait if max_wait is not None else DEFAULT_MAX_WAIT
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._metrics = {}
+
+    def _caller_metrics(self, caller):
+        metrics = self._metrics.get(caller)
+        if metrics is None:
+            metrics = self._metrics[caller] = _CallerMetrics()
+        return metrics
+
+    @contextmanager
+    def slot(self, priority=DEFAULT_PRIORITY, caller="unknown", timeout=None):
+        """Hold a slot for the duration of the block; yields False when the call was shed"""
+        granted = self.acquire(priority, caller, timeout)
+        try:
+            yield granted
+        finally:
+            if granted:
+                self.release()
+
+    def acquire(self, priority=DEFAULT_PRIORITY, caller="unknown", timeout=None):
+        """Wait for a slot; returns False when the call is shed or waits too long"""
+        started = time.perf_counter()
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        with self._lock:
+            metrics = self._caller_metrics(caller)
+            if self._in_flight < self.max_concurrency and not self._queue:
+                self._in_flight += 1
+                metrics.admitted += 1
+                metrics.waits.append(0.0)
+                return True
+
+            if timeout <= 0 or self.max_queue <= 0:
+                metrics.shed += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                # Shed the least urgent caller, the newest among equals
+                worst = max(self._queue)
+                if worst[0] <= priority:
+                    metrics.shed += 1
+                    return False
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].shed = True
+                worst[2].event.set()
+
+            waiter = _Waiter(priority, caller)
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            # A slot may have been handed over just as the wait timed out
+            if waiter.granted:
+                metrics.admitted += 1
+                metrics.waits.append(time.perf_counter() - started)
+                return True
+            if waiter.shed:
+                metrics.shed += 1
+            else:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+                metrics.timed_out += 1
+            return False
+
+    def release(self):
+        """Free a slot, handing it to the most urgent waiting caller"""
+        with self._lock:
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._in_flight -= 1
+
+    def get_stats(self):
+        """Return the slot usage, queue depth and per-caller admissions and queue waits"""
+        with self._lock:
+            callers = {
+                caller: {
+                    "admitted": metrics.admitted,
+                    "shed": metrics.shed,
+                    "timed_out": metrics.timed_out,
+                    "queue_wait": latency_percentiles(list(metrics.waits))
+                }
+                for caller, metrics in self._metrics.items()
+            }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "in_flight": self._in_flight,
+                "queued": len(self._queue),
+                "callers": callers
+            }
@@ -0,0 +1,120 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from llm_metrics import latency_percentiles
+
+logger = logging.getLogger(__name__)
+
+# Number of recent streamed replies kept for the latency percentiles
+METRICS_WINDOW = 1000
+
+# Callable receiving the text of the reply being streamed, or None
+_token_sink = contextvars.ContextVar("token_sink", default=None)
+
+
+@contextmanager
+def streaming_to(sink):
+    """Forward the text emitted in this context to ``sink`` as it is produced"""
+    token = _token_sink.set(sink)
+    try:
+        yield
+    finally:
+        _token_sink.reset(token)
+
+
+def is_streaming():
+    """Whether the current context forwards its reply to a sink"""
+    return _token_sink.get() is not None
+
+
+def emit(text):
+    """Forward a piece of the reply to the current sink, if any"""
+    sink = _token_sink.get()
+    if sink is not None and text:
+        sink(text)
+
+
+def iter_ndjson_tokens(response):
+    """Yield the text tokens of a streamed Ollama /api/generate response
+
+    Ollama streams one JSON object per line, each carrying the next piece of
+    the completion in "response", until an object with "done" set.
+    """
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+        if chunk.get("response"):
+            yield chunk["response"]
+        if chunk.get("done"):
+            return
+
+
+def sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamMetrics:
+    """Time to first token and total time of recent streamed replies"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._first_token = deque(maxlen=window)
+        self._total = deque(maxlen=window)
+        self.streams = 0
+        self.failures = 0
+
+    def record(self, first_token_seconds, total_seconds):
+        with self._lock:
+            self.streams += 1
+            if first_token_seconds is not None:
+                self._first_token.append(first_token_seconds)
+            self._total.append(total_seconds)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def get_stats(self):
+        """Return the stream counts and latency percentiles"""
+        with self._lock:
+            first_token, total = list(self._first_token), list(self._total)
+        return {
+            "streams": self.streams,
+            "failures": self.failures,
+            "time_to_first_token": latency_percentiles(first_token),
+            "total_time": latency_percentiles(total)
+        }
+
+
+class StreamTimer:
+    """Measures the time to the first emitted token of one reply"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+
+    def mark(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    @property
+    def first_token_seconds(self):
+        return self.first_token_at - self.started if self.first_token_at is not None else None
+
+    @property
+    def elapsed_seconds(self):
+        return time.perf_counter() - self.started
+
+
+# Shared metrics for the replies streamed by the chat endpoint and the LLM client
+chat_stream_metrics = StreamMetrics()
+llm_stream_metrics = StreamMetrics()
@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Connection pools kept, one per host, and connections kept alive per pool
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get("LLM_HTTP_POOL_CONNECTIONS", 4))
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("LLM_HTTP_POOL_MAXSIZE", 16))
+
+# Seconds to establish a connection and to wait between bytes of a response
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("LLM_HTTP_CONNECT_TIMEOUT", 2))
+DEFAULT_READ_TIMEOUT = float(os.environ.get("LLM_HTTP_READ_TIMEOUT", 10))
+
+
+class HttpTransport:
+    """Pooled keep-alive HTTP transport shared by the LLM clients
+
+    Requests go through one ``requests.Session`` whose adapter keeps up to
+    ``pool_maxsize`` idle connections per host, so calls reuse an open TCP
+    connection instead of paying for a new one each time. Every request has
+    a (connect, read) timeout; the defaults can be overridden per call, e.g.
+    for short health probes. Requests beyond the pool size still proceed on
+    extra connections, which are closed rather than kept.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, connect_timeout=None, read_timeout=None):
+        self.pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or DEFAULT_POOL_MAXSIZE
+        self.connect_timeout = connect_timeout if connect_timeout is not None else DEFAULT_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout if read_timeout is not None else DEFAULT_READ_TIMEOUT
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+        self.session = requests.Session()
+        # Retries are left to the callers, which have their own fallbacks
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._adapter = adapter
+
+    def timeout(self, read=None, connect=None):
+        """Return the (connect, read) timeout of a request"""
+        connect = self.connect_timeout if connect is None else min(connect, self.connect_timeout)
+        return connect, self.read_timeout if read is None else read
+
+    def request(self, method, url, read_timeout=None, connect_timeout=None, **kwargs):
+        """Send a request over the pooled session"""
+        with self._lock:
+            self.requests += 1
+        try:
+            return self.session.request(method, url, timeout=self.timeout(read_timeout, connect_timeout), **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+    def get_stats(self):
+        """Return the pool limits, timeouts and connection reuse"""
+        connections = 0
+        pool_requests = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": connections,
+            "connection_reuse": round(1 - connections / pool_requests, 4) if pool_requests else 0.0
+        }
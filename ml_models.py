@@ -1,52 +1,227 @@
 import logging
 import re
 import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.pipeline import Pipeline
+from scipy import sparse
+
+from model_store import artifact_store as default_artifact_store, compute_fingerprint
+from keyword_matcher import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
-class TicketClassifier:
+# Standard ticket categories, valid even before any ticket uses them
+TICKET_CATEGORIES = [
+    "Software Installation Failure",
+    "Network Connectivity Issue",
+    "Device Compatibility Error",
+    "Account Synchronization Bug",
+    "Payment Gateway Integration Failure",
+    "General Technical Support"
+]
+
+
+class PersistentModel(ABC):
+    """Base class for models whose trained pipeline is persisted as a versioned artifact
+
+    Subclasses define the pipeline, the training query and source, and how
+    the model is initialized; a subclass missing any of them cannot be
+    instantiated.
+    """
+    
+    artifact_name = None
+    
+    # Minimum hold-out accuracy a retrained candidate must reach to be swapped in
+    min_validation_accuracy = 0.0
+    
+    def __init__(self, artifact_store=None):
+        self.artifact_store = artifact_store or default_artifact_store
+        self.artifact_metadata = None
+    
+    @abstractmethod
+    def _build_pipeline(self):
+        """Build a new, untrained pipeline"""
+    
+    @abstractmethod
+    def _training_query(self):
+        """Query selecting the tickets the model is trained on"""
+    
+    @abstractmethod
+    def training_source(self, chunk_size=None):
+        """Streaming source of training features and labels from the database"""
+    
+    @abstractmethod
+    def _initialize_model(self, force_retrain=False):
+        """Load a matching artifact or train the model from the database"""
+    
+    def load_training_data(self):
+        """Load all training features and labels into memory; only for small data sets"""
+        return self.training_source().materialize()
+    
+    def current_fingerprint(self):
+        """Fingerprint of the training data currently in the database"""
+        return self._training_fingerprint(self._training_query())
+    
+    def _training_fingerprint(self, query):
+        """Fingerprint the training data from cheap aggregates over the training query"""
+        from models import Ticket
+        from app import db
+        
+        stats = query.with_entities(
+            db.func.count(Ticket.id),
+            db.func.max(Ticket.id),
+            db.func.max(Ticket.updated_at)
+        ).one()
+        
+        # The pipeline definition is part of the fingerprint so that changing
+        # hyperparameters invalidates previously saved artifacts
+        return compute_fingerprint(self.artifact_name, repr(self._build_pipeline()), *stats)
+    
+    def _load_artifact(self, fingerprint):
+        """Load a previously trained pipeline matching the fingerprint, if any"""
+        model, metadata = self.artifact_store.load(self.artifact_name, fingerprint)
+        if model is None:
+            return False
+        
+        self.model = model
+        self.is_trained = True
+        self.artifact_metadata = metadata
+        logger.info(f"{self.__class__.__name__} loaded artifact version {metadata['version']}")
+        return True
+    
+    def _save_artifact(self, fingerprint, training_source, extra=None):
+        """Persist the trained pipeline as a new artifact version"""
+        if not self.is_trained:
+            return
+        
+        extra = dict(extra or {}, training_source=training_source)
+        metadata = self.artifact_store.save(self.artifact_name, self.model, fingerprint, extra=extra)
+        if metadata:
+            self.artifact_metadata = metadata
+    
+    def fit_pipeline(self, features, labels):
+        """Fit a fresh pipeline without touching the one serving predictions"""
+        model = self._build_pipeline()
+        model.fit(features, labels)
+        return model
+    
+    def fit_source(self, source):
+        """Fit a fresh pipeline on a streaming training source
+
+        Models that can learn incrementally override this to avoid loading the
+        whole source into memory.
+        """
+        features, labels = source.materialize()
+        return self.fit_pipeline(features, labels)
+    
+    def train_from_database(self):
+        """Train on the database, streaming it in chunks, and swap in the result"""
+        self.model = self.fit_source(self.training_source())
+        self.is_trained = True
+    
+    def swap_model(self, model, fingerprint=None, training_source="retraining", extra=None, metadata=None):
+        """Atomically replace the pipeline serving predictions
+
+        Requests already holding a reference to the old pipeline finish with it;
+        new requests pick up the new one. A freshly trained model is saved as a
+        new artifact version, while one loaded from the store keeps its metadata.
+        """
+        self.model = model
+        self.is_trained = True
+        if metadata is not None:
+            self.artifact_metadata = metadata
+        elif fingerprint is not None:
+            self._save_artifact(fingerprint, training_source, extra)
+    
+    def retrain(self):
+        """Retrain from the database regardless of any saved artifact"""
+        self._initialize_model(force_retrain=True)
+        return self.artifact_metadata
+    
+    def get_artifact_info(self):
+        """Return metadata about the artifact currently in use"""
+        return {
+            "name": self.artifact_name,
+            "is_trained": self.is_trained,
+            "artifact": self.artifact_metadata
+        }
+
+
+class TicketClassifier(PersistentModel):
     """ML model for classifying support tickets into categories"""
     
-    def __init__(self):
-        self.model = Pipeline([
+    artifact_name = "ticket_classifier"
+    min_validation_accuracy = 0.5
+    supports_online_learning = False
+    
+    def __init__(self, artifact_store=None):
+        super().__init__(artifact_store)
+        self.model = self._build_pipeline()
+        self.is_trained = False
+        self._initialize_model()
+    
+    def _build_pipeline(self):
+        return Pipeline([
             ('vectorizer', TfidfVectorizer(max_features=1000)),
             ('classifier', MultinomialNB())
         ])
-        self.is_trained = False
-        self._initialize_model()
     
-    def _initialize_model(self):
-        """Initialize the model with historical ticket data"""
+    def _training_query(self):
+        # Import here to avoid circular imports
+        from models import Ticket
+        from app import db
+        return db.session.query(Ticket)
+    
+    def training_source(self, chunk_size=None):
+        """Stream ticket descriptions and their categories"""
+        from models import Ticket
+        from training_data import TrainingDataSource
+        return TrainingDataSource([Ticket.id, Ticket.description, Ticket.issue_category], chunk_size=chunk_size)
+    
+    def fit_source(self, source):
+        """Fit the TF-IDF vocabulary in one pass, then the classifier chunk by chunk"""
+        from training_data import fit_tfidf_vectorizer
+        
+        model = self._build_pipeline()
+        vectorizer = fit_tfidf_vectorizer(model.named_steps['vectorizer'], source.documents())
+        classifier = model.named_steps['classifier']
+        classes = source.distinct_labels()
+        for descriptions, categories in source:
+            classifier.partial_fit(vectorizer.transform(descriptions), categories, classes=classes)
+        return model
+    
+    def _initialize_model(self, force_retrain=False):
+        """Initialize the model from a saved artifact or historical ticket data"""
         try:
-            # Import here to avoid circular imports
-            from models import Ticket
-            from app import db
+            # Reuse the saved pipeline if the training data has not changed
+            fingerprint = self.current_fingerprint()
+            if not force_retrain and self._load_artifact(fingerprint):
+                return
             
             # Check if we have enough tickets in the database
-            ticket_count = db.session.query(Ticket).count()
+            ticket_count = self._training_query().count()
             
             if ticket_count >= 10:  # Arbitrary threshold for minimum training data
-                # Get tickets from database
-                tickets = db.session.query(Ticket).all()
-                descriptions = [ticket.description for ticket in tickets]
-                categories = [ticket.issue_category for ticket in tickets]
-                
-                # Train the model
-                self.train(descriptions, categories)
+                # Train the model on tickets streamed from the database
+                self.train_from_database()
                 logger.info("TicketClassifier trained with database data")
+                self._save_artifact(fingerprint, "database")
             else:
                 # Use preset categories for initial classification
                 self._initialize_with_preset_data()
                 logger.info("TicketClassifier initialized with preset data")
+                self._save_artifact(fingerprint, "preset")
         except Exception as e:
             logger.error(f"Error initializing TicketClassifier: {str(e)}")
             self._initialize_with_preset_data()
@@ -96,7 +271,9 @@ class TicketClassifier:
     def train(self, descriptions, categories):
         """Train the classifier model"""
         try:
-            self.model.fit(descriptions, categories)
+            # Fit a new pipeline and swap it in, so that concurrent predictions
+            # keep using the previous model until training has finished
+            self.model = self.fit_pipeline(descriptions, categories)
             self.is_trained = True
             logger.info("TicketClassifier training successful")
         except Exception as e:
@@ -116,43 +293,215 @@ class TicketClassifier:
         except Exception as e:
             logger.error(f"Error predicting category: {str(e)}")
             return "General Technical Issue"
+    
+    def predict_categories(self, descriptions):
+        """Predict the categories of a batch of tickets in a single model call"""
+        if not self.is_trained:
+            return ["General Technical Issue"] * len(descriptions)
+        
+        try:
+            # Vectorizing and predicting the whole batch at once avoids the
+            # per-call overhead of the pipeline for every ticket
+            return list(self.model.predict(list(descriptions)))
+        except Exception as e:
+            logger.error(f"Error predicting categories: {str(e)}")
+            return ["General Technical Issue"] * len(descriptions)
+
+
+class OnlineTicketClassifier(TicketClassifier):
+    """Ticket classifier that learns incrementally from each labelled ticket
+
+    A stateless hashing vectorizer lets every newly classified or re-labelled
+    ticket be folded into the MultinomialNB counts with partial_fit, at a cost
+    that does not depend on the size of the ticket history. Full retraining
+    through the RetrainingService becomes an occasional compaction step, which
+    is also needed to pick up categories the model has never seen. Updates are
+    local to the worker process that received them until the next compaction.
+    """
+    
+    artifact_name = "ticket_classifier_online"
+    supports_online_learning = True
+    
+    # Number of hashed features; bounds the model size regardless of vocabulary
+    n_features = 2 ** 16
+    
+    # Categories the model can learn even before they appear in training data
+    known_categories = TICKET_CATEGORIES
+    
+    def __init__(self, artifact_store=None):
+        self._update_lock = threading.Lock()
+        # Recent updates, replayed onto a compacted model trained from an older snapshot
+        self._recent_updates = deque(maxlen=10000)
+        self._snapshot_time = None
+        self.needs_compaction = False
+        super().__init__(artifact_store)
+    
+    def _build_pipeline(self):
+        return Pipeline([
+            ('vectorizer', HashingVectorizer(n_features=self.n_features, alternate_sign=False)),
+            ('classifier', MultinomialNB())
+        ])
+    
+    def fit_pipeline(self, features, labels):
+        """Fit a fresh pipeline that can keep learning every known category"""
+        model = self._build_pipeline()
+        classes = sorted(set(labels) | set(self.known_categories))
+        vectors = model.named_steps['vectorizer'].transform(features)
+        model.named_steps['classifier'].partial_fit(vectors, labels, classes=classes)
+        return model
+    
+    def fit_source(self, source):
+        """Fit a fresh pipeline in a single streaming pass over the source"""
+        model = self._build_pipeline()
+        vectorizer = model.named_steps['vectorizer']
+        classifier = model.named_steps['classifier']
+        classes = sorted(set(source.distinct_labels()) | set(self.known_categories))
+        for descriptions, categories in source:
+            classifier.partial_fit(vectorizer.transform(descriptions), categories, classes=classes)
+        return model
+    
+    def training_source(self, chunk_size=None):
+        # Updates made after this point are not in the snapshot and get replayed
+        self._snapshot_time = time.time()
+        return super().training_source(chunk_size)
+    
+    def _apply_update(self, model, description, category, previous_category=None):
+        """Move a ticket's contribution from its previous label to its new one"""
+        classifier = model.named_steps['classifier']
+        classes = list(classifier.classes_)
+        if category not in classes or (previous_category and previous_category not in classes):
+            return False
+        
+        vector = model.named_steps['vectorizer'].transform([description])
+        if previous_category:
+            # Subtract the counts the ticket added under its old label; the
+            # partial_fit below recomputes the log probabilities from the counts
+            old_index = classes.index(previous_category)
+            counts = classifier.feature_count_[old_index]
+            counts[vector.indices] = np.maximum(counts[vector.indices] - vector.data, 0)
+            classifier.class_count_[old_index] = max(classifier.class_count_[old_index] - 1, 0)
+        
+        classifier.partial_fit(vector, [category])
+        return True
+    
+    def learn(self, description, category, previous_category=None):
+        """Fold a newly classified or re-labelled ticket into the model
+
+        Returns False when the update needs a category the model does not know,
+        in which case a compaction (full retrain) is required. An untrained
+        model has nothing to update; its first training reads the ticket from
+        the database.
+        """
+        if not self.is_trained:
+            return True
+        if previous_category == category:
+            return True
+        
+        try:
+            with self._update_lock:
+                if not self._apply_update(self.model, description, category, previous_category):
+                    self.needs_compaction = True
+                    logger.info(f"OnlineTicketClassifier needs compaction to learn category '{category}'")
+                    return False
+                self._recent_updates.append((time.time(), description, category, previous_category))
+            return True
+        except Exception as e:
+            logger.error(f"Error updating OnlineTicketClassifier: {str(e)}")
+            return False
+    
+    def swap_model(self, model, fingerprint=None, training_source="retraining", extra=None, metadata=None):
+        with self._update_lock:
+            # Replay updates that arrived while the new model was being trained
+            if metadata is None and self._snapshot_time is not None:
+                for timestamp, description, category, previous_category in self._recent_updates:
+                    if timestamp >= self._snapshot_time:
+                        self._apply_update(model, description, category, previous_category)
+            self.needs_compaction = False
+            super().swap_model(model, fingerprint, training_source, extra, metadata)
 
 
-class ResolutionPredictor:
+class ResolutionPredictor(PersistentModel):
     """ML model for predicting resolutions for tickets"""
     
-    def __init__(self):
-        self.model = Pipeline([
+    artifact_name = "resolution_predictor"
+    
+    def __init__(self, artifact_store=None):
+        super().__init__(artifact_store)
+        self.model = self._build_pipeline()
+        self.is_trained = False
+        self._initialize_model()
+    
+    def _build_pipeline(self):
+        return Pipeline([
             ('vectorizer', TfidfVectorizer(max_features=1000)),
             ('classifier', RandomForestClassifier(n_estimators=100))
         ])
-        self.is_trained = False
-        self._initialize_model()
     
-    def _initialize_model(self):
-        """Initialize the model with historical resolution data"""
+    def _training_query(self):
+        # Import here to avoid circular imports
+        from models import Ticket
+        from app import db
+        return db.session.query(Ticket).filter(Ticket.resolution.isnot(None))
+    
+    @staticmethod
+    def _make_feature(description, category):
+        """Create a feature by combining description and category"""
+        return f"{description} [Category: {category}]"
+    
+    def _make_features(self, descriptions, categories):
+        """Create features by combining description and category"""
+        return [self._make_feature(d, c) for d, c in zip(descriptions, categories)]
+    
+    def training_source(self, chunk_size=None):
+        """Stream resolution features and resolutions for tickets that have one"""
+        from models import Ticket
+        from training_data import TrainingDataSource
+        return TrainingDataSource(
+            [Ticket.id, Ticket.description, Ticket.issue_category, Ticket.resolution],
+            criteria=[Ticket.resolution.isnot(None)],
+            to_features=self._make_feature,
+            chunk_size=chunk_size
+        )
+    
+    def fit_source(self, source):
+        """Fit the TF-IDF vocabulary in one pass, then the forest on sparse features
+
+        The random forest cannot learn incrementally, so the sparse feature
+        matrix is built chunk by chunk; the raw texts are never held at once.
+        """
+        from training_data import fit_tfidf_vectorizer
+        
+        model = self._build_pipeline()
+        vectorizer = fit_tfidf_vectorizer(model.named_steps['vectorizer'], source.documents())
+        matrices = []
+        resolutions = []
+        for features, chunk_resolutions in source:
+            matrices.append(vectorizer.transform(features))
+            resolutions.extend(chunk_resolutions)
+        model.named_steps['classifier'].fit(sparse.vstack(matrices).tocsr(), resolutions)
+        return model
+    
+    def _initialize_model(self, force_retrain=False):
+        """Initialize the model from a saved artifact or historical resolution data"""
         try:
-            # Import here to avoid circular imports
-            from models import Ticket
-            from app import db
+            # Reuse the saved pipeline if the training data has not changed
+            fingerprint = self.current_fingerprint()
+            if not force_retrain and self._load_artifact(fingerprint):
+                return
             
             # Check if we have enough tickets with resolutions
-            ticket_count = db.session.query(Ticket).filter(Ticket.resolution.isnot(None)).count()
+            ticket_count = self._training_query().count()
             
             if ticket_count >= 10:  # Arbitrary threshold for minimum training data
-                # Get tickets from database
-                tickets = db.session.query(Ticket).filter(Ticket.resolution.isnot(None)).all()
-                descriptions = [ticket.description for ticket in tickets]
-                categories = [ticket.issue_category for ticket in tickets]
-                resolutions = [ticket.resolution for ticket in tickets]
-                
-                # Train the model
-                self.train(descriptions, categories, resolutions)
+                # Train the model on tickets streamed from the database
+                self.train_from_database()
                 logger.info("ResolutionPredictor trained with database data")
+                self._save_artifact(fingerprint, "database")
             else:
                 # Use preset data for initial predictions
                 self._initialize_with_preset_data()
                 logger.info("ResolutionPredictor initialized with preset data")
+                self._save_artifact(fingerprint, "preset")
         except Exception as e:
             logger.error(f"Error initializing ResolutionPredictor: {str(e)}")
             self._initialize_with_preset_data()
@@ -230,10 +579,9 @@ class ResolutionPredictor:
     def train(self, descriptions, categories, resolutions):
         """Train the resolution prediction model"""
         try:
-            # Create features by combining description and category
-            features = [f"{d} [Category: {c}]" for d, c in zip(descriptions, categories)]
-            
-            self.model.fit(features, resolutions)
+            # Fit a new pipeline and swap it in once training has finished
+            features = self._make_features(descriptions, categories)
+            self.model = self.fit_pipeline(features, resolutions)
             self.is_trained = True
             logger.info("ResolutionPredictor training successful")
         except Exception as e:
@@ -265,13 +613,11 @@ class SentimentAnalyzer:
             "Annoyed", "Urgent", "Satisfied"
         ]
         
+        # Keyword lists live in keyword_matcher so that one scan serves all rules
         self.sentiment_keywords = {
-            "Frustrated": ["frustrated", "annoying", "disappointing", "terrible", "awful", "useless"],
-            "Confused": ["confused", "confusing", "unsure", "don't understand", "unclear", "lost"],
-            "Anxious": ["anxious", "worried", "concerned", "nervous", "urgent", "critical"],
-            "Annoyed": ["annoyed", "irritated", "bothered", "fed up", "tired of", "annoying"],
-            "Urgent": ["urgent", "emergency", "immediately", "asap", "critical", "serious"],
-            "Satisfied": ["satisfied", "happy", "pleased", "good", "great", "excellent"]
+            category: list(keyword_matcher.groups[f"sentiment.{category}"])
+            for category in self.sentiment_categories
+            if f"sentiment.{category}" in keyword_matcher.groups
         }
         
         # Emoji suggestions based on sentiment
@@ -296,18 +642,17 @@ class SentimentAnalyzer:
             "Satisfied": "celebration-confetti"
         }
     
-    def analyze_sentiment(self, text):
+    def analyze_sentiment(self, text, hits=None):
         """Analyze the sentiment of a text with enhanced features"""
-        text = text.lower()
+        # Keyword hits may be shared with other rules that scanned the same text
+        hits = hits or keyword_matcher.scan(text)
         
         # Count occurrences of sentiment keywords
         sentiment_scores = {category: 0 for category in self.sentiment_categories}
         sentiment_scores["Neutral"] = 1  # Default score
         
-        for category, keywords in self.sentiment_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    sentiment_scores[category] += 1
+        for category in self.sentiment_keywords:
+            sentiment_scores[category] += hits.count(f"sentiment.{category}")
         
         # Find the sentiment with the highest score
         max_score = 0
@@ -342,7 +687,7 @@ class SentimentAnalyzer:
 class ConversationHealthAnalyzer:
     """Analyze conversation health and user satisfaction"""
     
-    def __init__(self):
+    def __init__(self, sentiment_analyzer=None):
         self.health_metrics = {
             "response_time": [],        # Response times in seconds
             "resolution_rate": 0,       # Percentage of conversations resolved
@@ -352,7 +697,8 @@ class ConversationHealthAnalyzer:
             "avg_message_length": 0,    # Average message length
             "sentiment_distribution": {} # Distribution of sentiments
         }
-        self.sentiment_analyzer = SentimentAnalyzer()
+        from model_registry import registry
+        self.sentiment_analyzer = sentiment_analyzer or registry.get("sentiment_analyzer")
         
     def analyze_conversation(self, conversation_history):
         """Analyze a conversation and return health metrics"""
@@ -457,10 +803,10 @@ class ConversationHealthAnalyzer:
 class AdvancedResolutionPredictor:
     """Advanced ML model for predicting resolutions with higher accuracy"""
     
-    def __init__(self):
-        from datetime import datetime
-        self.resolution_predictor = ResolutionPredictor()
-        self.sentiment_analyzer = SentimentAnalyzer()
+    def __init__(self, resolution_predictor=None, sentiment_analyzer=None):
+        from model_registry import registry
+        self.resolution_predictor = resolution_predictor or registry.get("resolution_predictor")
+        self.sentiment_analyzer = sentiment_analyzer or registry.get("sentiment_analyzer")
         self.knowledge_base = {}  # Will store resolved tickets by category for learning
         self.followup_templates = {
             "Network Connectivity Issue": [
@@ -0,0 +1,180 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Process-wide registry of heavy models and clients shared by the agents
+
+    Components are registered as factories and built lazily on first use.
+    Each component is built at most once per process, even when several
+    request threads ask for it at the same time.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, factory):
+        """Register a factory for a named component, replacing any built instance"""
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the shared instance of a component, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._registry_lock:
+            if name not in self._factories:
+                raise KeyError(f"No component registered under '{name}'")
+            lock = self._locks[name]
+
+        # Build outside the registry lock so that slow components do not block
+        # unrelated lookups
+        with lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                logger.info(f"Building shared component '{name}'")
+                instance = self._factories[name]()
+                self._instances[name] = instance
+        return instance
+
+    def set(self, name, instance):
+        """Install an already-built instance for a component"""
+        with self._registry_lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._instances[name] = instance
+
+    def is_built(self, name):
+        """Check whether a component has been built in this process"""
+        return name in self._instances
+
+    def reset(self, name=None):
+        """Drop built instances so they are rebuilt on next use"""
+        with self._registry_lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+class SharedComponent:
+    """Agent attribute that falls back to a registry component unless injected
+
+    Assigning a non-None value to the attribute injects it for that instance;
+    otherwise reading it returns the process-wide shared component.
+    """
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry
+
+    def __set_name__(self, owner, attr_name):
+        self.attr_name = f"_{attr_name}"
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.attr_name)
+        if value is not None:
+            return value
+        return (self.registry or registry).get(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attr_name] = value
+
+
+def _build_ticket_classifier():
+    from ml_models import TicketClassifier, OnlineTicketClassifier
+    # TICKET_CLASSIFIER_MODE=online learns from each ticket instead of batch refits
+    if os.environ.get("TICKET_CLASSIFIER_MODE", "batch") == "online":
+        return OnlineTicketClassifier()
+    return TicketClassifier()
+
+
+def _build_resolution_predictor():
+    from ml_models import ResolutionPredictor
+    return ResolutionPredictor()
+
+
+def _build_sentiment_analyzer():
+    from ml_models import SentimentAnalyzer
+    return SentimentAnalyzer()
+
+
+def _build_solution_index():
+    from solution_index import SolutionIndex
+    # Built empty; the index is filled on first search
+    return SolutionIndex()
+
+
+def _build_knowledge_base_index():
+    from knowledge_base_index import KnowledgeBaseIndex
+    # Loaded or built on first search
+    return KnowledgeBaseIndex()
+
+
+def _build_resolved_ticket_index():
+    from resolved_ticket_index import ResolvedTicketIndex
+    # Built from the embedding store on first search
+    return ResolvedTicketIndex()
+
+
+def _build_hybrid_retriever():
+    from hybrid_retrieval import HybridRetriever
+    return HybridRetriever()
+
+
+def _build_embedding_store():
+    from embedding_store import EmbeddingStore
+    return EmbeddingStore()
+
+
+def _build_llm_response_cache():
+    from llm_cache import ResponseCache
+    return ResponseCache()
+
+
+def _build_semantic_cache():
+    from semantic_cache import SemanticCache
+    return SemanticCache()
+
+
+def _build_llm_transport():
+    from llm_transport import HttpTransport
+    return HttpTransport()
+
+
+def _build_llm_scheduler():
+    from llm_scheduler import LLMScheduler
+    return LLMScheduler()
+
+
+def _build_ollama_client():
+    from agents import OllamaClient
+    return OllamaClient()
+
+
+# Shared registry for the current process
+registry = ModelRegistry()
+registry.register("ticket_classifier", _build_ticket_classifier)
+registry.register("resolution_predictor", _build_resolution_predictor)
+registry.register("sentiment_analyzer", _build_sentiment_analyzer)
+registry.register("solution_index", _build_solution_index)
+registry.register("knowledge_base_index", _build_knowledge_base_index)
+registry.register("resolved_ticket_index", _build_resolved_ticket_index)
+registry.register("hybrid_retriever", _build_hybrid_retriever)
+registry.register("embedding_store", _build_embedding_store)
+registry.register("llm_response_cache", _build_llm_response_cache)
+registry.register("semantic_cache", _build_semantic_cache)
+registry.register("llm_transport", _build_llm_transport)
+registry.register("llm_scheduler", _build_llm_scheduler)
+registry.register("ollama_client", _build_ollama_client)
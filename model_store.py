@@ -0,0 +1,143 @@
+import os
+import json
+import glob
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+
+import joblib
+import sklearn
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout of artifacts changes in an incompatible way
+ARTIFACT_FORMAT_VERSION = 1
+
+# Default location for trained model artifacts, next to the SQLite database
+DEFAULT_ARTIFACT_DIR = os.path.join(os.path.dirname(__file__), 'instance', 'models')
+
+
+def compute_fingerprint(*parts):
+    """Compute a stable fingerprint from a sequence of JSON-serializable values"""
+    payload = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ModelArtifactStore:
+    """Versioned on-disk store for trained model pipelines
+
+    Each artifact is saved as a joblib file together with a JSON metadata file
+    recording its version, the fingerprint of the data it was trained on and
+    when it was trained. The metadata file is replaced atomically after the
+    model file is written, so readers never see a half-written artifact.
+    """
+
+    def __init__(self, base_dir=None, keep_versions=3):
+        self.base_dir = base_dir or os.environ.get("MODEL_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR)
+        self.keep_versions = keep_versions
+
+    def _metadata_path(self, name):
+        return os.path.join(self.base_dir, f"{name}.json")
+
+    def _model_path(self, name, version):
+        return os.path.join(self.base_dir, f"{name}-v{version}.joblib")
+
+    def get_metadata(self, name):
+        """Return the metadata of the current artifact for a model, or None"""
+        try:
+            with open(self._metadata_path(name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading metadata for model artifact {name}: {str(e)}")
+            return None
+
+    def load(self, name, fingerprint=None):
+        """Load the current artifact for a model
+
+        Returns a (model, metadata) tuple, or (None, None) if there is no usable
+        artifact - it is missing, was written by an incompatible scikit-learn or
+        store format, or was trained on data with a different fingerprint.
+        """
+        metadata = self.get_metadata(name)
+        if not metadata:
+            return None, None
+
+        if metadata.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            logger.info(f"Model artifact {name} has an outdated format, ignoring it")
+            return None, None
+
+        if metadata.get("sklearn_version") != sklearn.__version__:
+            logger.info(f"Model artifact {name} was built with scikit-learn "
+                        f"{metadata.get('sklearn_version')}, ignoring it")
+            return None, None
+
+        if fingerprint is not None and metadata.get("fingerprint") != fingerprint:
+            logger.info(f"Model artifact {name} is stale (training data changed)")
+            return None, None
+
+        try:
+            model = joblib.load(self._model_path(name, metadata["version"]))
+            return model, metadata
+        except Exception as e:
+            logger.error(f"Error loading model artifact {name}: {str(e)}")
+            return None, None
+
+    def save(self, name, model, fingerprint, extra=None):
+        """Save a trained model as a new version and make it the current artifact"""
+        try:
+            os.makedirs(self.base_dir, exist_ok=True)
+
+            previous = self.get_metadata(name)
+            version = (previous or {}).get("version", 0) + 1
+
+            # Write the model under its versioned name first, then publish it
+            # by atomically replacing the metadata file
+            model_path = self._model_path(name, version)
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.tmp')
+            os.close(fd)
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, model_path)
+
+            metadata = {
+                "name": name,
+                "version": version,
+                "fingerprint": fingerprint,
+                "trained_at": datetime.utcnow().isoformat(),
+                "format_version": ARTIFACT_FORMAT_VERSION,
+                "sklearn_version": sklearn.__version__
+            }
+            if extra:
+                metadata.update(extra)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(tmp_path, self._metadata_path(name))
+
+            self._prune(name, version)
+            logger.info(f"Saved model artifact {name} version {version}")
+            return metadata
+        except Exception as e:
+            logger.error(f"Error saving model artifact {name}: {str(e)}")
+            return None
+
+    def _prune(self, name, current_version):
+        """Remove old versions of a model beyond the retention limit"""
+        oldest_kept = current_version - self.keep_versions + 1
+        for path in glob.glob(os.path.join(self.base_dir, f"{name}-v*.joblib")):
+            try:
+                version = int(os.path.basename(path)[len(name) + 2:-len('.joblib')])
+            except ValueError:
+                continue
+            if version < oldest_kept:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# Shared store used by the ML models unless one is injected
+artifact_store = ModelArtifactStore()
@@ -65,6 +65,8 @@ class Ticket(db.Model):
     extracted_actions = db.Column(db.Text)  # For action extraction
     estimated_resolution_time = db.Column(db.Float)  # In hours
     team_id = db.Column(db.String(50))  # For team assignment
+    # 'pending' while summary, actions and estimate are computed in the background, then 'complete' or 'failed'
+    enrichment_status = db.Column(db.String(20), default="complete")
     # User relationship
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
@@ -86,9 +88,21 @@ class Ticket(db.Model):
             'summary': self.summary,
             'extracted_actions': self.extracted_actions,
             'estimated_resolution_time': self.estimated_resolution_time,
-            'team_id': self.team_id
+            'team_id': self.team_id,
+            'enrichment_status': self.enrichment_status
         }
 
+class EnrichmentJob(db.Model):
+    """Queued background enrichment of a newly created ticket"""
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.String(20), db.ForeignKey('ticket.ticket_id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)  # 'pending', 'running', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Conversation(db.Model):
     """Model for conversations related to tickets"""
     id = db.Column(db.Integer, primary_key=True)
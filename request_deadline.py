@@ -0,0 +1,58 @@
+import os
+import math
+import time
+
+# End-to-end time budget of an interactive request, in seconds
+DEFAULT_REQUEST_BUDGET = float(os.environ.get("REQUEST_BUDGET_SECONDS", 8))
+
+# An LLM call is not started with less budget than this left; the fallback is used instead
+MIN_LLM_CALL_SECONDS = float(os.environ.get("LLM_MIN_CALL_SECONDS", 0.5))
+
+
+class Deadline:
+    """Time budget of one request, shared by every call made to serve it
+
+    Created once per request and passed down through the agents; each
+    downstream call caps its own timeouts with ``cap`` and checks ``allows``
+    before starting, so the request as a whole finishes within its budget
+    and switches to fallbacks once the budget is spent.
+    """
+
+    def __init__(self, budget_seconds=None):
+        self.budget = DEFAULT_REQUEST_BUDGET if budget_seconds is None else budget_seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget
+
+    @classmethod
+    def unbounded(cls):
+        """A deadline that never expires, for callers without a budget"""
+        return _UNBOUNDED
+
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def allows(self, seconds=MIN_LLM_CALL_SECONDS):
+        """Whether at least ``seconds`` of the budget are left"""
+        return self.remaining() >= seconds
+
+    def cap(self, seconds=None):
+        """A timeout of at most ``seconds`` that also ends with the budget"""
+        remaining = self.remaining()
+        return remaining if seconds is None else min(seconds, remaining)
+
+    def __repr__(self):
+        if math.isinf(self.budget):
+            return "Deadline(unbounded)"
+        return f"Deadline({self.remaining():.2f}s of {self.budget:.2f}s left)"
+
+
+_UNBOUNDED = Deadline(math.inf)
@@ -4,6 +4,7 @@ import logging
 from app import app, db
 from models import Ticket, Conversation, Solution, Feedback, Team, TeamMember, TicketMetrics, User
 from data_processing import load_initial_data
+from knowledge_base_search import setup_full_text_search
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -135,6 +136,8 @@ def reset_database():
     db.drop_all()
     logger.info("Creating all tables...")
     db.create_all()
+    # The triggers went with the dropped table; recreate them and reindex
+    setup_full_text_search(db.engine)
     logger.info("Database reset complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from models import Ticket
+from change_tracking import track_committed_changes
+from model_registry import SharedComponent
+from vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Embeddings looked up in the store per batch while building
+EMBEDDING_BATCH_SIZE = 1000
+
+
+def _resolved_criteria():
+    return (Ticket.status == "Resolved", Ticket.resolution.isnot(None))
+
+
+class ResolvedTicketIndex:
+    """Vector index over the embeddings of resolved tickets
+
+    Ticket descriptions are embedded with the Ollama client's model and the
+    vectors are read from the embedding store, so building the index makes no
+    model calls for tickets the backfill job or earlier lookups already
+    embedded; tickets without a stored embedding are left out until one
+    exists. Tickets resolved, reopened or edited after the build are applied
+    incrementally once their transaction commits; the ones without a stored
+    embedding are embedded on a background thread and indexed on a later
+    sync, so searches never wait on the model for them. The index is rebuilt
+    on every background retraining run.
+    """
+
+    ollama_client = SharedComponent("ollama_client")
+    embedding_store = SharedComponent("embedding_store")
+
+    def __init__(self, ollama_client=None, embedding_store=None, vector_index=None):
+        self.ollama_client = ollama_client
+        self.embedding_store = embedding_store
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._pending = set()
+        self._embedder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="resolved-ticket-embedding")
+        self.vectors = vector_index or VectorIndex()
+        self.missing_embeddings = 0
+        self.built_at = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def mark_changed(self, ticket_ids):
+        """Record tickets whose status, resolution or text changed since the last sync"""
+        with self._lock:
+            self._pending.update(ticket_ids)
+
+    def build(self):
+        """Index the stored embeddings of every resolved ticket"""
+        from training_data import iter_chunks
+
+        started = time.time()
+        with self._lock:
+            # Changes made while building are applied on the next sync
+            self._pending.clear()
+
+        model = self.ollama_client.model
+        store = self.embedding_store
+        ids, vectors, labels = [], [], []
+        missing = 0
+        columns = [Ticket.id, Ticket.issue_category, Ticket.description]
+        for rows in iter_chunks(columns, _resolved_criteria(), EMBEDDING_BATCH_SIZE):
+            embeddings = store.get_many(model, [description for _, _, description in rows])
+            for (ticket_id, category, _), embedding in zip(rows, embeddings):
+                if embedding is None:
+                    missing += 1
+                    continue
+                ids.append(ticket_id)
+                vectors.append(embedding)
+                labels.append(category)
+
+        self.vectors.build(ids, vectors, labels)
+        self.missing_embeddings = missing
+        self.built_at = time.time()
+        if missing:
+            logger.info(f"{missing} resolved tickets have no stored embedding; run backfill_embeddings.py to add them")
+        logger.info(f"Resolved ticket index built for {len(ids)} tickets in {time.time() - started:.2f}s")
+
+    def refit(self):
+        """Rebuild the index from the embedding store"""
+        self.build()
+        return {"status": "rebuilt", "tickets": len(self.vectors)}
+
+    def _embed_missing(self, rows):
+        """Embed tickets missing from the store and queue them for the next sync"""
+        client = self.ollama_client
+        embedded = []
+        for ticket_id, _, description in rows:
+            if not client.is_available:
+                break
+            if client.get_embeddings(description):
+                embedded.append(ticket_id)
+        if embedded:
+            self.mark_changed(embedded)
+        if len(embedded) < len(rows):
+            logger.info(f"{len(rows) - len(embedded)} resolved tickets left without an embedding for the backfill job")
+
+    def _sync(self):
+        """Apply pending ticket changes to the index"""
+        with self._lock:
+            if not self._pending:
+                return
+            changed = set(self._pending)
+            self._pending.clear()
+
+        rows = db.session.query(Ticket.id, Ticket.issue_category, Ticket.description) \
+            .filter(Ticket.id.in_(changed), *_resolved_criteria()).all()
+        self.vectors.remove(changed)
+        if not rows:
+            return
+
+        embeddings = self.embedding_store.get_many(self.ollama_client.model,
+                                                   [description for _, _, description in rows])
+        found = [(row, embedding) for row, embedding in zip(rows, embeddings) if embedding is not None]
+        missing = [tuple(row) for row, embedding in zip(rows, embeddings) if embedding is None]
+        if missing:
+            self._embedder.submit(self._embed_missing, missing)
+        if found:
+            try:
+                self.vectors.add([row[0] for row, _ in found], [embedding for _, embedding in found],
+                                 [row[1] for row, _ in found])
+            except ValueError as e:
+                # The embedding model changed; rebuild with its vectors
+                logger.warning(f"Rebuilding resolved ticket index: {str(e)}")
+                self.build()
+
+    def search(self, query, category=None, top_k=3, min_similarity=0.0):
+        """Return (ticket id, similarity) pairs for the resolved tickets most similar to a query embedding"""
+        if not self.is_built:
+            with self._build_lock:
+                if not self.is_built:
+                    self.build()
+        self._sync()
+
+        if not len(self.vectors) or query is None or len(query) == 0:
+            return []
+        try:
+            matches = self.vectors.search(query, top_k=top_k, label=category)
+        except ValueError as e:
+            logger.error(f"Error searching resolved ticket index: {str(e)}")
+            return []
+        return [(ticket_id, score) for ticket_id, score in matches if score > min_similarity]
+
+    def get_stats(self):
+        """Return the size and age of the index"""
+        return {
+            "is_built": self.is_built,
+            "built_at": self.built_at,
+            "missing_embeddings": self.missing_embeddings,
+            **self.vectors.get_stats(),
+            "pending_changes": len(self._pending)
+        }
+
+
+# Keep the index in sync with tickets being resolved, reopened or edited
+track_committed_changes(Ticket, "resolved_ticket_index", ["status", "resolution", "issue_category", "description"])
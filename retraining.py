@@ -0,0 +1,171 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+from model_registry import registry
+from training_data import streaming_accuracy
+
+logger = logging.getLogger(__name__)
+
+
+class RetrainingService:
+    """Retrains the shared ML models in the background and hot-swaps them
+
+    Retraining runs on a worker thread inside its own application context, so
+    request threads keep predicting with the current pipeline. A candidate is
+    fitted on a training split, validated on a hold-out split, refitted on all
+    data and only then swapped in. Retraining can be requested explicitly,
+    runs on a fixed schedule and is triggered after a number of newly resolved
+    tickets. Search indexes are rebuilt on the same runs to refresh their
+    vocabulary.
+    """
+
+    def __init__(self, app, model_names=None, interval_seconds=None,
+                 resolved_ticket_threshold=None, min_training_samples=10, index_names=None):
+        self.app = app
+        self.model_names = model_names or ["ticket_classifier", "resolution_predictor"]
+        self.index_names = index_names or ["solution_index", "knowledge_base_index", "resolved_ticket_index"]
+        self.interval_seconds = interval_seconds if interval_seconds is not None else \
+            int(os.environ.get("RETRAIN_INTERVAL_SECONDS", 6 * 3600))
+        self.resolved_ticket_threshold = resolved_ticket_threshold if resolved_ticket_threshold is not None else \
+            int(os.environ.get("RETRAIN_AFTER_RESOLVED_TICKETS", 50))
+        self.min_training_samples = min_training_samples
+
+        self._lock = threading.Lock()
+        self._worker = None
+        self._scheduler = None
+        self._stop_event = threading.Event()
+        self._resolved_since_retrain = 0
+        self.last_run = None
+
+    def start(self):
+        """Start the scheduler thread if a retraining interval is configured"""
+        if self.interval_seconds <= 0 or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(target=self._schedule_loop, name="model-retraining-scheduler", daemon=True)
+        self._scheduler.start()
+        logger.info(f"Model retraining scheduled every {self.interval_seconds} seconds")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop_event.set()
+
+    def _schedule_loop(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self.request_retrain("schedule")
+
+    def record_resolved_ticket(self):
+        """Count a newly resolved ticket, retraining once the threshold is reached"""
+        if self.resolved_ticket_threshold <= 0:
+            return False
+        with self._lock:
+            self._resolved_since_retrain += 1
+            threshold_reached = self._resolved_since_retrain >= self.resolved_ticket_threshold
+        if threshold_reached:
+            return self.request_retrain(f"{self.resolved_ticket_threshold} resolved tickets")
+        return False
+
+    def request_retrain(self, reason="manual", force=False):
+        """Start a background retraining run unless one is already in progress
+
+        With force=True the models are retrained even when their training data
+        has not changed since the artifact in use was trained.
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                logger.info(f"Retraining already in progress, ignoring request ({reason})")
+                return False
+            self._resolved_since_retrain = 0
+            self._worker = threading.Thread(target=self._run, args=(reason, force), name="model-retraining", daemon=True)
+            self._worker.start()
+        return True
+
+    def is_running(self):
+        """Check whether a retraining run is in progress"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def wait(self, timeout=None):
+        """Block until the current retraining run finishes"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _run(self, reason, force=False):
+        started = time.time()
+        logger.info(f"Starting background model retraining ({reason})")
+        results = {}
+        with self.app.app_context():
+            for name in self.model_names:
+                # Only retrain models this process actually uses
+                if not registry.is_built(name):
+                    continue
+                try:
+                    results[name] = self.retrain_model(registry.get(name), force)
+                except Exception as e:
+                    logger.error(f"Error retraining {name}: {str(e)}")
+                    results[name] = {"status": "failed", "error": str(e)}
+
+            for name in self.index_names:
+                if not registry.is_built(name):
+                    continue
+                try:
+                    results[name] = registry.get(name).refit()
+                except Exception as e:
+                    logger.error(f"Error rebuilding {name}: {str(e)}")
+                    results[name] = {"status": "failed", "error": str(e)}
+
+        self.last_run = {
+            "reason": reason,
+            "finished_at": datetime.utcnow().isoformat(),
+            "duration_seconds": round(time.time() - started, 2),
+            "results": results
+        }
+        logger.info(f"Background model retraining finished in {self.last_run['duration_seconds']}s")
+
+    def retrain_model(self, model, force=False):
+        """Train, validate and swap in a new pipeline for a single model
+
+        Unless forced, a model whose training data is unchanged is left alone
+        and one already trained on the same data by another worker is loaded.
+        """
+        fingerprint = model.current_fingerprint()
+        if not force:
+            current = model.artifact_metadata or {}
+            if current.get("fingerprint") == fingerprint:
+                return {"status": "unchanged"}
+
+            # Another worker may already have trained on the same data
+            stored_model, metadata = model.artifact_store.load(model.artifact_name, fingerprint)
+            if stored_model is not None:
+                model.swap_model(stored_model, metadata=metadata)
+                return {"status": "loaded", "version": metadata["version"]}
+
+        source = model.training_source()
+        if source.count() < self.min_training_samples:
+            return {"status": "skipped", "reason": "not enough training data"}
+
+        # Validate the candidate on data it has not seen; both splits are
+        # streamed from the database rather than loaded into memory
+        candidate = model.fit_source(source.with_split("train"))
+        accuracy = streaming_accuracy(candidate, source.with_split("holdout"))
+        if accuracy < model.min_validation_accuracy:
+            logger.warning(f"Rejected retrained {model.artifact_name}: hold-out accuracy "
+                           f"{accuracy:.2f} below {model.min_validation_accuracy:.2f}")
+            return {"status": "rejected", "accuracy": accuracy}
+
+        final_model = model.fit_source(source)
+        model.swap_model(final_model, fingerprint, extra={"validation_accuracy": round(accuracy, 4)})
+        logger.info(f"Swapped in retrained {model.artifact_name} (hold-out accuracy {accuracy:.2f})")
+        return {"status": "swapped", "accuracy": accuracy, "version": (model.artifact_metadata or {}).get("version")}
+
+    def get_status(self):
+        """Return the state of the retraining service"""
+        return {
+            "running": self.is_running(),
+            "interval_seconds": self.interval_seconds,
+            "resolved_ticket_threshold": self.resolved_ticket_threshold,
+            "resolved_since_retrain": self._resolved_since_retrain,
+            "last_run": self.last_run
+        }
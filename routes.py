@@ -1,24 +1,38 @@
+import os
 import logging
-from flask import render_template, request, jsonify, redirect, url_for, flash
+from flask import render_template, request, jsonify, redirect, url_for, flash, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from models import Ticket, Conversation, Solution, Feedback, Team, TeamMember, TicketMetrics, User, Badge, KnowledgeBaseEntry, EmojiReaction, CollaborationSession, CollaborationParticipant
 from agents import ClassifierAgent, ResolutionAgent, EscalationAgent, FeedbackAgent, ChatbotAgent
 from data_processing import load_initial_data
+from retraining import RetrainingService
+from ticket_enrichment import TicketEnrichmentService
 from forms import LoginForm, RegistrationForm, ProfileUpdateForm, UserPreferencesForm
 from datetime import datetime
 import uuid
+import queue
 import random
+import threading
 import utils
+import knowledge_base_search
+from model_registry import registry
+from request_deadline import Deadline
+from llm_streaming import streaming_to, sse_event, StreamTimer, chat_stream_metrics, llm_stream_metrics
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of tickets accepted by a single bulk request
+MAX_BULK_TICKETS = int(os.environ.get("MAX_BULK_TICKETS", 50000))
+
 # Initialize agent references
 classifier_agent = None
 resolution_agent = None
 escalation_agent = None
 feedback_agent = None
 chatbot_agent = None
+retraining_service = None
+enrichment_service = None
 
 def initialize_agents():
     """Initialize all agents - called within app context"""
@@ -29,16 +43,60 @@ def initialize_agents():
     resolution_agent = ResolutionAgent()
     escalation_agent = EscalationAgent()
     feedback_agent = FeedbackAgent()
-    chatbot_agent = ChatbotAgent()
+    chatbot_agent = ChatbotAgent(classifier_agent=classifier_agent)
     logger.info("Agents initialized successfully")
 
+def _insert_bulk_tickets(pending, errors):
+    """Add prepared tickets to the session, isolating the ones that fail
+
+    All tickets are flushed together first. If that fails, each ticket is
+    retried in its own savepoint so that one bad row does not abort the
+    rest of the transaction, and its error is reported by index.
+    """
+    try:
+        for _, ticket, conversation in pending:
+            db.session.add(ticket)
+            if conversation is not None:
+                db.session.add(conversation)
+        db.session.flush()
+        return [(index, ticket) for index, ticket, _ in pending]
+    except Exception as e:
+        logger.warning(f"Bulk ticket insert failed, retrying tickets individually: {str(e)}")
+        db.session.rollback()
+
+    created = []
+    for index, ticket, conversation in pending:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ticket)
+                if conversation is not None:
+                    db.session.add(conversation)
+            created.append((index, ticket))
+        except Exception as e:
+            errors.append({'index': index, 'message': f'Failed to create ticket: {e.__class__.__name__}'})
+    return created
+
 def register_routes(app):
     """Register all routes with the Flask app"""
     
+    global retraining_service, enrichment_service
+    
     # Set up data loading and initialize agents
     with app.app_context():
         load_initial_data()
         initialize_agents()
+    
+    # Probe the Ollama server in the background and drive its circuit breaker
+    registry.get("ollama_client").health_monitor.start()
+    
+    # Retrain models in the background on a schedule or after new resolutions
+    retraining_service = RetrainingService(app)
+    retraining_service.start()
+    
+    # Fill in the LLM-derived fields of new tickets after they are created
+    enrichment_service = TicketEnrichmentService(app, classifier_agent)
+    enrichment_service.start()
+    chatbot_agent.enrichment_service = enrichment_service
         
     @app.route('/load-initial-data')
     def load_initial_data_route():
@@ -260,8 +318,9 @@ def register_routes(app):
                     'message': 'Description is required'
                 }), 400
             
-            # Classify the ticket
-            classification = classifier_agent.classify_ticket(data['description'])
+            # Classify the ticket with the cheap fields, including the rule-based resolution
+            # time estimate; the summary and actions are filled in by the enrichment workers
+            classification = classifier_agent.triage_ticket(data['description'])
             
             # Generate ticket ID in TECH_XXX format to match the dataset
             next_id = random.randint(100, 999)
@@ -276,15 +335,13 @@ def register_routes(app):
                 description=data['description'],
                 status="Open",
                 resolution_status="Pending",
-                summary=classification.get("summary", ""),
-                extracted_actions=classification.get("extracted_actions", ""),
-                estimated_resolution_time=classification.get("estimated_resolution_time", 2.0),
+                estimated_resolution_time=classification["estimated_resolution_time"],
                 team_id=classification.get("team_id", "TECH_SUPPORT"),
                 user_id=current_user.id
             )
             
             db.session.add(new_ticket)
-            db.session.commit()
+            enrichment_service.enqueue(new_ticket)
             
             # Add the initial message if provided
             if 'initial_message' in data:
@@ -295,7 +352,14 @@ def register_routes(app):
                 )
                 
                 db.session.add(conversation)
-                db.session.commit()
+            
+            # The ticket, its enrichment job and the first message are stored together
+            db.session.commit()
+            enrichment_service.notify()
+            
+            # Let an online classifier learn from the new ticket right away
+            if not classifier_agent.learn_from_ticket(new_ticket.description, new_ticket.issue_category):
+                retraining_service.request_retrain("unknown ticket category")
             
             return jsonify({
                 'success': True,
@@ -309,6 +373,113 @@ def register_routes(app):
                 'message': 'Failed to create ticket'
             }), 500
     
+    @app.route('/api/tickets/bulk', methods=['POST'])
+    @login_required
+    def create_tickets_bulk():
+        """API endpoint to classify and create many tickets in a single transaction"""
+        try:
+            data = request.get_json()
+            items = data.get('tickets') if isinstance(data, dict) else data
+            
+            if not isinstance(items, list) or not items:
+                return jsonify({
+                    'success': False,
+                    'message': 'A non-empty list of tickets is required'
+                }), 400
+            
+            if len(items) > MAX_BULK_TICKETS:
+                return jsonify({
+                    'success': False,
+                    'message': f'At most {MAX_BULK_TICKETS} tickets can be created per request'
+                }), 413
+            
+            # Validate every item up front and report problems per item
+            errors = []
+            valid_items = []
+            for index, item in enumerate(items):
+                description = item.get('description') if isinstance(item, dict) else None
+                if not isinstance(description, str) or not description.strip():
+                    errors.append({'index': index, 'message': 'Description is required'})
+                else:
+                    valid_items.append((index, item))
+            
+            # Classify the whole batch with one classifier call
+            classifications = classifier_agent.classify_batch([item['description'] for _, item in valid_items])
+            ticket_ids = utils.generate_unique_ticket_ids(len(valid_items), prefix="TECH")
+            
+            pending = []
+            for (index, item), classification, ticket_id in zip(valid_items, classifications, ticket_ids):
+                ticket = Ticket(
+                    ticket_id=ticket_id,
+                    issue_category=classification["issue_category"],
+                    sentiment=classification["sentiment"],
+                    priority=classification["priority"],
+                    description=item['description'],
+                    status="Open",
+                    resolution_status="Pending",
+                    summary=classification.get("summary", ""),
+                    extracted_actions=classification.get("extracted_actions", ""),
+                    estimated_resolution_time=classification.get("estimated_resolution_time", 2.0),
+                    team_id=classification.get("team_id", "TECH_SUPPORT"),
+                    user_id=current_user.id
+                )
+                conversation = None
+                if item.get('initial_message'):
+                    conversation = Conversation(ticket_id=ticket_id, message=item['initial_message'], sender="user")
+                pending.append((index, ticket, conversation))
+            
+            created = _insert_bulk_tickets(pending, errors)
+            db.session.commit()
+            
+            # An online classifier has not seen the imported tickets yet
+            if created and classifier_agent.classifier.supports_online_learning:
+                retraining_service.request_retrain("bulk ticket import")
+            
+            return jsonify({
+                'success': True,
+                'created': len(created),
+                'failed': len(errors),
+                'tickets': [
+                    {
+                        'index': index,
+                        'ticket_id': ticket.ticket_id,
+                        'issue_category': ticket.issue_category,
+                        'priority': ticket.priority,
+                        'team_id': ticket.team_id
+                    }
+                    for index, ticket in created
+                ],
+                'errors': sorted(errors, key=lambda error: error['index'])
+            })
+        except Exception as e:
+            logger.error(f"Error creating tickets in bulk: {str(e)}")
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'Failed to create tickets'
+            }), 500
+    
+    @app.route('/api/tickets/<ticket_id>/enrichment', methods=['GET'])
+    @login_required
+    def get_ticket_enrichment(ticket_id):
+        """API endpoint to poll the background enrichment of a new ticket"""
+        ticket = Ticket.query.filter_by(ticket_id=ticket_id).first()
+        
+        if not ticket:
+            return jsonify({
+                'success': False,
+                'message': 'Ticket not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'ticket_id': ticket.ticket_id,
+            'enrichment_status': ticket.enrichment_status,
+            'summary': ticket.summary,
+            'extracted_actions': ticket.extracted_actions,
+            'estimated_resolution_time': ticket.estimated_resolution_time
+        })
+    
     @app.route('/api/tickets/<ticket_id>', methods=['PUT'])
     def update_ticket(ticket_id):
         """API endpoint to update a ticket"""
@@ -323,10 +494,23 @@ def register_routes(app):
                     'message': 'Ticket not found'
                 }), 404
             
+            was_resolved = ticket.resolution_status == 'Resolved'
+            previous_category = ticket.issue_category
+            
             # Update ticket fields
             if 'status' in data:
                 ticket.status = data['status']
             
+            if 'issue_category' in data:
+                # Unknown labels would only make the classifier retrain on a typo
+                if data['issue_category'] != previous_category and \
+                        not classifier_agent.is_known_category(data['issue_category']):
+                    return jsonify({
+                        'success': False,
+                        'message': f"Unknown issue category: {data['issue_category']}"
+                    }), 400
+                ticket.issue_category = data['issue_category']
+            
             if 'resolution_status' in data:
                 ticket.resolution_status = data['resolution_status']
             
@@ -337,6 +521,15 @@ def register_routes(app):
             
             db.session.commit()
             
+            # Newly resolved tickets count towards the next model retraining
+            if not was_resolved and ticket.resolution_status == 'Resolved':
+                retraining_service.record_resolved_ticket()
+            
+            # Re-labelled tickets are moved to their new category in an online classifier
+            if ticket.issue_category != previous_category:
+                if not classifier_agent.learn_from_ticket(ticket.description, ticket.issue_category, previous_category):
+                    retraining_service.request_retrain("unknown ticket category")
+            
             return jsonify({
                 'success': True,
                 'ticket': ticket.to_dict()
@@ -410,7 +603,7 @@ def register_routes(app):
                     })
                 else:
                     # Get resolution suggestions
-                    solutions = resolution_agent.suggest_solutions(ticket)
+                    solutions = resolution_agent.suggest_solutions(ticket, deadline=Deadline())
                     
                     if solutions:
                         # Use the first solution as a response
@@ -457,33 +650,51 @@ def register_routes(app):
                     'message': 'Ticket not found'
                 }), 404
             
-            # First check knowledge base for relevant entries
-            kb_entries = utils.find_knowledge_base_entries_for_issue(
-                ticket.description, 
+            # One bounded pipeline: lexical candidates from the knowledge base and
+            # solution indexes, reranked by embedding similarity and fused by rank
+            # with the most similar resolved tickets, all within the request's budget
+            deadline = Deadline()
+            results, timings = registry.get("hybrid_retriever").retrieve(
+                ticket.description,
                 category=ticket.issue_category,
-                limit=2
+                limit=5,
+                exclude_ticket_id=ticket.id,
+                deadline=deadline
             )
             
-            # Format knowledge base entries as solutions
-            kb_solutions = []
-            for entry in kb_entries:
-                kb_solutions.append({
-                    'solution_text': f"Based on our knowledge base: {entry.title}\n\n{entry.content[:300]}...\n\nYou can view the full solution in our knowledge base.",
-                    'success_rate': 0.9,  # Assume high success rate for KB entries
-                    'source': 'knowledge_base',
-                    'kb_entry_id': entry.id
-                })
-            
-            # Get solutions from the resolution agent
-            agent_solutions = resolution_agent.suggest_solutions(ticket)
+            solutions = []
+            kb_entries = []
+            for result in results:
+                item = result['item']
+                if result['source'] == 'knowledge_base':
+                    kb_entries.append(item)
+                    solution = {
+                        'solution_text': f"Based on our knowledge base: {item.title}\n\n{item.content[:300]}...\n\nYou can view the full solution in our knowledge base.",
+                        'success_rate': 0.9,  # Assume high success rate for KB entries
+                        'source': 'knowledge_base',
+                        'kb_entry_id': item.id
+                    }
+                elif result['source'] == 'resolved_ticket':
+                    solution = {
+                        'solution_text': f"Resolved in similar ticket #{item.ticket_id}: {item.resolution}",
+                        'source': 'resolved_ticket',
+                        'ticket_id': item.ticket_id
+                    }
+                else:
+                    solution = item.to_dict()
+                    solution['source'] = 'solution'
+                solution['retrieval'] = {key: result[key] for key in ('score', 'lexical_rank', 'semantic_rank', 'similarity')}
+                solutions.append(solution)
             
-            # Combine solutions, prioritizing knowledge base entries
-            solutions = kb_solutions + agent_solutions
+            if not solutions:
+                # Nothing related is stored yet; let the agent generate a solution
+                solutions = resolution_agent.suggest_solutions(ticket, deadline=deadline)
             
             return jsonify({
                 'success': True,
                 'solutions': solutions,
-                'kb_entries': [entry.to_dict() for entry in kb_entries]
+                'kb_entries': [entry.to_dict() for entry in kb_entries],
+                'timings': timings
             })
         except Exception as e:
             logger.error(f"Error suggesting solutions for ticket {ticket_id}: {str(e)}")
@@ -642,6 +853,8 @@ def register_routes(app):
     @app.route('/api/chat', methods=['POST'])
     def chat_message():
         """API endpoint to interact with the chatbot"""
+        # The LLM calls behind the reply share the request's time budget
+        deadline = Deadline()
         try:
             data = request.get_json()
             
@@ -661,7 +874,8 @@ def register_routes(app):
             response = chatbot_agent.respond_to_query(
                 data['message'], 
                 conversation_history, 
-                session_id
+                session_id,
+                deadline=deadline
             )
             
             # Return response with additional state information
@@ -679,6 +893,73 @@ def register_routes(app):
                 'message': 'Failed to process chat message'
             }), 500
     
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_message_stream():
+        """API endpoint to interact with the chatbot, streaming the reply as Server-Sent Events
+        
+        The reply is sent as "token" events while the LLM produces it, followed
+        by one "done" event with the complete reply, the conversation state and
+        the time to first token; an "error" event is sent instead on failure.
+        The complete reply in "done" supersedes the streamed tokens.
+        """
+        deadline = Deadline()
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({
+                'success': False,
+                'message': 'Message is required'
+            }), 400
+        
+        message = data['message']
+        conversation_history = data.get('conversation_history', [])
+        session_id = data.get('session_id', 'default')
+        events = queue.Queue()
+        timer = StreamTimer()
+        
+        def on_token(text):
+            timer.mark()
+            events.put(sse_event('token', {'text': text}))
+        
+        def respond():
+            # The chatbot runs in its own thread so tokens reach the client while it works
+            try:
+                with app.app_context(), streaming_to(on_token):
+                    response = chatbot_agent.respond_to_query(message, conversation_history, session_id,
+                                                              deadline=deadline)
+                first_token = timer.first_token_seconds
+                chat_stream_metrics.record(first_token, timer.elapsed_seconds)
+                events.put(sse_event('done', {
+                    'success': True,
+                    'response': response['response'],
+                    'create_ticket': response.get('create_ticket', False),
+                    'ticket_id': response.get('ticket_id'),
+                    'current_state': response.get('current_state', 'unknown'),
+                    'time_to_first_token_ms': round(first_token * 1000, 1) if first_token is not None else None,
+                    'total_ms': round(timer.elapsed_seconds * 1000, 1)
+                }))
+            except Exception as e:
+                logger.error(f"Error streaming chat message: {str(e)}")
+                chat_stream_metrics.record_failure()
+                events.put(sse_event('error', {
+                    'success': False,
+                    'message': 'Failed to process chat message'
+                }))
+            finally:
+                events.put(None)
+        
+        def generate():
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                yield event
+        
+        threading.Thread(target=respond, name="chat-stream", daemon=True).start()
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+        })
+    
     @app.route('/api/teams', methods=['GET'])
     def get_teams():
         """API endpoint to get all teams"""
@@ -889,9 +1170,88 @@ def register_routes(app):
                 'message': 'Failed to get dashboard statistics'
             }), 500
             
+    @app.route('/api/admin/models', methods=['GET'])
+    @login_required
+    def get_model_artifacts():
+        """API endpoint to inspect the trained model artifacts in use"""
+        if not current_user.is_admin():
+            return jsonify({
+                'success': False,
+                'message': 'You do not have permission to view model artifacts'
+            }), 403
+
+        return jsonify({
+            'success': True,
+            'models': [
+                classifier_agent.classifier.get_artifact_info(),
+                resolution_agent.predictor.get_artifact_info()
+            ],
+            'retraining': retraining_service.get_status(),
+            'ticket_enrichment': enrichment_service.get_status()
+        })
+
+    @app.route('/api/admin/llm', methods=['GET'])
+    @login_required
+    def get_llm_stats():
+        """API endpoint to inspect the LLM client and its caches"""
+        if not current_user.is_admin():
+            return jsonify({
+                'success': False,
+                'message': 'You do not have permission to view LLM statistics'
+            }), 403
+
+        client = registry.get("ollama_client")
+        return jsonify({
+            'success': True,
+            'available': client.is_available,
+            'model': client.model,
+            'circuit': client.circuit.get_stats(),
+            'health': client.health_monitor.get_stats(),
+            'scheduler': client.scheduler.get_stats(),
+            'deadline_fallbacks': client.deadline_fallbacks,
+            'transport': client.transport.get_stats(),
+            'response_cache': client.response_cache.get_stats(),
+            'streaming': {
+                'chat': chat_stream_metrics.get_stats(),
+                'llm': llm_stream_metrics.get_stats()
+            },
+            'semantic_cache': registry.get("semantic_cache").get_stats(),
+            'embedding_store': client.embedding_store.get_stats()
+        })
+
+    @app.route('/api/admin/models/retrain', methods=['POST'])
+    @login_required
+    def retrain_models():
+        """API endpoint to request background retraining of the ML models"""
+        try:
+            if not current_user.is_admin():
+                return jsonify({
+                    'success': False,
+                    'message': 'You do not have permission to retrain models'
+                }), 403
+
+            # An admin request retrains even if the training data is unchanged
+            started = retraining_service.request_retrain("admin request", force=True)
+
+            return jsonify({
+                'success': True,
+                'started': started,
+                'retraining': retraining_service.get_status()
+            }), 202
+        except Exception as e:
+            logger.error(f"Error retraining models: {str(e)}")
+            return jsonify({
+                'success': False,
+                'message': 'Failed to retrain models'
+            }), 500
+
     @app.route('/api/knowledge-base', methods=['GET'])
     def get_knowledge_base():
         """API endpoint to get the knowledge base of resolved tickets"""
+        # This rule is matched before the entries endpoint of the same URL, so
+        # searches and category filters are handed over to it
+        if request.args.get('query') or request.args.get('category'):
+            return get_knowledge_base_entries()
         try:
             # Get resolved tickets
             resolved_tickets = db.session.query(Ticket).filter(
@@ -1165,23 +1525,35 @@ def register_routes(app):
         try:
             category = request.args.get('category', None)
             search_query = request.args.get('query', None)
+            limit = request.args.get('limit', None, type=int)
+            
+            if search_query:
+                # Ranked full-text search, with pattern matching on databases without FTS5
+                search_mode, results = knowledge_base_search.search_knowledge_base(
+                    search_query, category=category, limit=limit
+                )
+                entries = []
+                for entry, score, snippet in results:
+                    entry_data = entry.to_dict()
+                    entry_data['score'] = score
+                    entry_data['snippet'] = snippet
+                    entries.append(entry_data)
+                
+                return jsonify({
+                    'success': True,
+                    'search_mode': search_mode,
+                    'entries': entries
+                })
             
             query = KnowledgeBaseEntry.query
             
             if category:
                 query = query.filter_by(category=category)
                 
-            if search_query:
-                search_pattern = f"%{search_query}%"
-                query = query.filter(
-                    db.or_(
-                        KnowledgeBaseEntry.title.ilike(search_pattern),
-                        KnowledgeBaseEntry.content.ilike(search_pattern),
-                        KnowledgeBaseEntry.tags.ilike(search_pattern)
-                    )
-                )
-                
-            entries = query.order_by(KnowledgeBaseEntry.created_at.desc()).all()
+            query = query.order_by(KnowledgeBaseEntry.created_at.desc())
+            if limit:
+                query = query.limit(limit)
+            entries = query.all()
             
             return jsonify({
                 'success': True,
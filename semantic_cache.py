@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from model_registry import SharedComponent
+from vector_index import VectorIndex
+from llm_streaming import emit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.92))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+DEFAULT_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Width of the buckets of the best-match similarity histogram
+SIMILARITY_BUCKET = 0.05
+
+
+class SemanticCache:
+    """Cache of LLM answers matched by meaning rather than exact text
+
+    Each question (e.g. a ticket description) is embedded and compared with
+    the cached questions of the same kind and category; when the nearest one
+    is at least ``threshold`` similar, its answer is returned without calling
+    the LLM, so "my wifi keeps dropping" and "wifi keeps disconnecting" share
+    one answer. Entries expire after ``ttl_seconds`` and the oldest are
+    evicted beyond ``max_entries``. The distribution of best-match
+    similarities, the hit rate and the LLM time saved are recorded, so the
+    threshold can be tuned against the latency it saves.
+    """
+
+    ollama_client = SharedComponent("ollama_client")
+
+    def __init__(self, ollama_client=None, threshold=None, max_entries=None, ttl_seconds=None):
+        self.ollama_client = ollama_client
+        self.threshold = threshold if threshold is not None else DEFAULT_THRESHOLD
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else DEFAULT_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._indexes = {}  # kind -> VectorIndex of cached questions, labelled by category
+        self._entries = OrderedDict()  # entry id -> (kind, answer, llm_seconds, expires_at)
+        self._next_id = 1
+        self.hits = 0
+        self.misses = 0
+        self.saved_llm_seconds = 0.0
+        self.similarity_histogram = [0] * int(round(1 / SIMILARITY_BUCKET))
+
+    def _index(self, kind):
+        index = self._indexes.get(kind)
+        if index is None:
+            index = self._indexes.setdefault(kind, VectorIndex(mode="exact"))
+        return index
+
+    def _record_similarity(self, similarity):
+        bucket = min(max(int(similarity / SIMILARITY_BUCKET), 0), len(self.similarity_histogram) - 1)
+        self.similarity_histogram[bucket] += 1
+
+    def lookup(self, kind, category, embedding):
+        """Return the cached answer of the nearest question above the threshold, or None"""
+        matches = self._index(kind).search(embedding, top_k=1, label=category)
+        if not matches:
+            self.misses += 1
+            return None
+
+        entry_id, similarity = matches[0]
+        self._record_similarity(similarity)
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is not None and entry[3] <= time.time():
+                self._remove(entry_id)
+                entry = None
+            if entry is None or similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_llm_seconds += entry[2]
+            return entry[1]
+
+    def store(self, kind, category, embedding, answer, llm_seconds):
+        """Cache the answer to a question, evicting the oldest entries beyond the limit"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            index = self._index(kind)
+            try:
+                index.add([entry_id], [embedding], [category])
+            except ValueError as e:
+                # The embedding model changed; start this kind over with the new vectors
+                logger.warning(f"Resetting semantic cache for {kind}: {str(e)}")
+                for stale_id in [key for key, entry in self._entries.items() if entry[0] == kind]:
+                    del self._entries[stale_id]
+                index = self._indexes[kind] = VectorIndex(mode="exact")
+                index.add([entry_id], [embedding], [category])
+            self._entries[entry_id] = (kind, answer, llm_seconds, time.time() + self.ttl_seconds)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            # Evicted rows are only masked; drop them once they outnumber live ones
+            if index.removed > max(len(index), 256):
+                index.compact()
+
+    def _remove(self, entry_id):
+        kind = self._entries.pop(entry_id)[0]
+        self._index(kind).remove([entry_id])
+
+    def generate(self, kind, category, question, prompt, system_prompt=None, stream=False, caller="unknown",
+                 ticket_priority=None, deadline=None):
+        """Answer a question from the cache or with the LLM
+
+        Returns None when the LLM is unavailable or fails, so callers can use
+        their own fallback; fallback answers are never cached. With
+        stream=True the answer is also forwarded to the current token sink. The
+        caller type and ticket priority are passed on to the LLM scheduler, and
+        both the embedding and the generation stay within ``deadline``.
+        """
+        client = self.ollama_client
+        if not client.is_available:
+            return None
+
+        # Questions are not corpus texts, so their embeddings are not stored
+        embedding = client.get_embeddings(question, deadline=deadline, persist=False)
+        if embedding:
+            try:
+                answer = self.lookup(kind, category, embedding)
+                if answer is not None:
+                    if stream:
+                        emit(answer)
+                    return answer
+            except ValueError as e:
+                logger.warning(f"Semantic cache lookup failed: {str(e)}")
+
+        started = time.time()
+        answer = client.generate(prompt, system_prompt, fallback=False, stream=stream, caller=caller,
+                                 ticket_priority=ticket_priority, deadline=deadline)
+        if answer and embedding:
+            self.store(kind, category, embedding, answer, time.time() - started)
+        return answer
+
+    def get_stats(self):
+        """Return hit rate, saved LLM time and the best-match similarity distribution"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_llm_seconds": round(self.saved_llm_seconds, 2),
+            "similarity_histogram": {
+                f"{i * SIMILARITY_BUCKET:.2f}-{(i + 1) * SIMILARITY_BUCKET:.2f}": count
+                for i, count in enumerate(self.similarity_histogram) if count
+            }
+        }
@@ -0,0 +1,229 @@
+import time
+import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app import db
+from models import Solution
+from change_tracking import track_committed_changes
+from bm25 import BM25FIndex
+
+logger = logging.getLogger(__name__)
+
+# BM25 candidates checked against the TF-IDF similarity gate per requested result
+CANDIDATE_MULTIPLIER = 4
+
+
+class _CategoryMatrix:
+    """Solution ids of one category and their L2-normalized TF-IDF rows"""
+
+    def __init__(self, ids, matrix):
+        self.ids = ids
+        self.matrix = matrix
+        self.rows = {int(solution_id): row for row, solution_id in enumerate(ids)}
+
+    def without(self, solution_ids):
+        """Return a copy without the rows of the given solutions"""
+        keep = ~np.isin(self.ids, list(solution_ids))
+        return _CategoryMatrix(self.ids[keep], self.matrix[keep])
+
+    def with_rows(self, ids, matrix):
+        """Return a copy with extra rows appended"""
+        return _CategoryMatrix(
+            np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)]),
+            sparse.vstack([self.matrix, matrix]).tocsr()
+        )
+
+
+class SolutionIndex:
+    """Per-category BM25 and TF-IDF index of solution texts for similarity search
+
+    BM25 over an inverted index selects the candidates, so a query only
+    touches solutions sharing a word with the ticket text, and the candidates
+    are then ranked by TF-IDF cosine similarity, as before BM25 was added,
+    and must pass a similarity threshold; when too few do, the whole
+    category is scanned as before. Solution
+    texts are transformed once and kept as sparse, L2-normalized matrices per
+    category, so the threshold costs one transform of the ticket text and a
+    dot product with the candidate rows only. Added or edited solutions
+    are folded in incrementally with the current vocabulary; a full refit,
+    which also picks up new vocabulary, runs with the scheduled retraining.
+    Readers always see a consistent snapshot, since updates replace the
+    per-category matrices instead of modifying them in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._pending = set()
+        self.vectorizer = None
+        self.categories = {}
+        self.bm25 = self._new_bm25()
+        self.built_at = None
+
+    @staticmethod
+    def _new_bm25():
+        return BM25FIndex({"text": 1.0})
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def mark_changed(self, solution_ids):
+        """Record solutions whose text or category changed since the last sync"""
+        with self._lock:
+            self._pending.update(solution_ids)
+
+    def build(self):
+        """Fit the vocabulary on all solutions and transform them per category"""
+        from training_data import iter_chunks, fit_tfidf_vectorizer
+
+        started = time.time()
+        with self._lock:
+            # Changes made while building are applied on the next sync
+            self._pending.clear()
+
+        texts = (row[0] for rows in iter_chunks([Solution.solution_text]) for row in rows)
+        vectorizer = TfidfVectorizer()
+        try:
+            fit_tfidf_vectorizer(vectorizer, texts)
+        except ValueError:
+            # No solutions yet; keep an empty index until one is added
+            vectorizer = None
+
+        categories = {}
+        bm25 = self._new_bm25()
+        if vectorizer is not None:
+            rows_by_category = {}
+            for rows in iter_chunks([Solution.id, Solution.issue_category, Solution.solution_text]):
+                for solution_id, category, text in rows:
+                    ids, texts = rows_by_category.setdefault(category, ([], []))
+                    ids.append(solution_id)
+                    texts.append(text)
+                    bm25.add(solution_id, {"text": text}, {"category": category})
+            for category, (ids, texts) in rows_by_category.items():
+                categories[category] = _CategoryMatrix(
+                    np.asarray(ids, dtype=np.int64), vectorizer.transform(texts).tocsr()
+                )
+
+        with self._lock:
+            self.vectorizer = vectorizer
+            self.categories = categories
+            self.bm25 = bm25
+            self.built_at = time.time()
+        logger.info(f"Solution index built for {len(categories)} categories in {time.time() - started:.2f}s")
+
+    def refit(self):
+        """Rebuild the index from scratch, refreshing the vocabulary"""
+        self.build()
+        return {"status": "rebuilt", "categories": len(self.categories)}
+
+    def _sync(self):
+        """Fold pending solution changes into the per-category matrices"""
+        with self._lock:
+            if not self._pending:
+                return
+            changed = set(self._pending)
+            self._pending.clear()
+
+        rows = db.session.query(Solution.id, Solution.issue_category, Solution.solution_text) \
+            .filter(Solution.id.in_(changed)).all()
+        if self.vectorizer is None:
+            if rows:
+                self.build()
+            return
+
+        with self._lock:
+            categories = {
+                category: matrix.without(changed) if np.isin(matrix.ids, list(changed)).any() else matrix
+                for category, matrix in self.categories.items()
+            }
+            for solution_id in changed:
+                self.bm25.remove(solution_id)
+            by_category = {}
+            for solution_id, category, text in rows:
+                ids, texts = by_category.setdefault(category, ([], []))
+                ids.append(solution_id)
+                texts.append(text)
+                self.bm25.add(solution_id, {"text": text}, {"category": category})
+            for category, (ids, texts) in by_category.items():
+                vectors = self.vectorizer.transform(texts).tocsr()
+                if category in categories:
+                    categories[category] = categories[category].with_rows(ids, vectors)
+                else:
+                    categories[category] = _CategoryMatrix(np.asarray(ids, dtype=np.int64), vectors)
+            self.categories = categories
+
+    def _ensure_current(self):
+        if not self.is_built:
+            with self._build_lock:
+                if not self.is_built:
+                    self.build()
+        self._sync()
+
+    def lexical_search(self, category, text, top_k=10):
+        """Return (solution_id, BM25 score) pairs for the best lexical matches in a category"""
+        self._ensure_current()
+        with self._lock:
+            return self.bm25.search(text, top_k=top_k, category=category)
+
+    def search(self, category, text, top_k=3, min_similarity=0.0):
+        """Return (solution_id, similarity) pairs for the most similar solutions
+
+        When fewer than top_k BM25 candidates pass the similarity gate, the
+        whole category is scanned instead: TF-IDF also matches terms BM25
+        does not index, such as two-letter words, so a solution can be
+        similar enough without being a candidate.
+        """
+        self._ensure_current()
+
+        with self._lock:
+            entry = self.categories.get(category)
+            vectorizer = self.vectorizer
+            if entry is None or not entry.ids.size or vectorizer is None:
+                return []
+            candidates = self.bm25.search(text, top_k=top_k * CANDIDATE_MULTIPLIER, category=category)
+
+        query = vectorizer.transform([text])
+        candidate_ids = [solution_id for solution_id, _ in candidates if solution_id in entry.rows]
+        if candidate_ids:
+            # Cosine similarity of the candidate rows only; ties keep the BM25 order
+            rows = entry.matrix[[entry.rows[solution_id] for solution_id in candidate_ids]]
+            similarities = (rows @ query.T).toarray().ravel()
+            matches = [
+                (solution_id, float(similarity))
+                for solution_id, similarity in zip(candidate_ids, similarities)
+                if similarity > min_similarity
+            ]
+            if len(matches) >= top_k:
+                matches.sort(key=lambda match: match[1], reverse=True)
+                return matches[:top_k]
+        return self._scan(entry, query, top_k, min_similarity)
+
+    @staticmethod
+    def _scan(entry, query, top_k, min_similarity):
+        """Cosine similarity search over every solution of a category"""
+        similarities = (entry.matrix @ query.T).toarray().ravel()
+
+        # Select the top k without sorting every candidate
+        k = min(top_k, similarities.size)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(int(entry.ids[i]), float(similarities[i])) for i in top if similarities[i] > min_similarity]
+
+    def get_stats(self):
+        """Return the size and age of the index"""
+        return {
+            "is_built": self.is_built,
+            "built_at": self.built_at,
+            "vocabulary_size": len(self.vectorizer.vocabulary_) if self.vectorizer is not None else 0,
+            "categories": {category: int(entry.ids.size) for category, entry in self.categories.items()},
+            "bm25": self.bm25.get_stats(),
+            "pending_changes": len(self._pending)
+        }
+
+
+# Keep the index in sync with solution writes made through the ORM
+track_committed_changes(Solution, "solution_index", ["solution_text", "issue_category"])
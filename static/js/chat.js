@@ -80,17 +80,37 @@ document.addEventListener('DOMContentLoaded', function() {
         chatContainer.appendChild(loadingMessage);
         scrollToBottom();
         
+        const payload = {
+            message: message,
+            conversation_history: chatHistory.slice(),
+            session_id: sessionId
+        };
+        
+        // Stream the reply token by token where the browser supports reading response bodies
+        if (window.ReadableStream && window.TextDecoder) {
+            streamMessage(payload).catch(error => {
+                if (error.partial) {
+                    // Part of the reply was shown already; retrying would repeat the turn
+                    handleChatError(error);
+                } else {
+                    console.warn('Streaming chat failed, retrying without streaming:', error);
+                    sendBufferedMessage(payload);
+                }
+            });
+        } else {
+            sendBufferedMessage(payload);
+        }
+    }
+    
+    // Send a message and wait for the complete reply
+    function sendBufferedMessage(payload) {
         // Send message to the API with session ID for conversation state tracking
         fetch('/api/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                message: message,
-                conversation_history: chatHistory,
-                session_id: sessionId
-            })
+            body: JSON.stringify(payload)
         })
         .then(response => response.json())
         .then(data => {
@@ -98,40 +118,124 @@ document.addEventListener('DOMContentLoaded', function() {
             const loadingMessage = document.getElementById('loading-message');
             if (loadingMessage) loadingMessage.remove();
             
-            if (data.success) {
-                // Add agent response to chat
-                addMessage(data.response, 'agent');
-                
-                // If a ticket was created through the conversation flow
-                if (data.create_ticket && data.ticket_id) {
-                    // Get the ticket details to display
-                    fetch(`/api/tickets/${data.ticket_id}`)
-                        .then(response => response.json())
-                        .then(ticketData => {
-                            if (ticketData.success) {
-                                addTicketCreationMessage(ticketData.ticket);
-                            }
-                        })
-                        .catch(error => {
-                            console.error('Error fetching ticket:', error);
-                        });
-                }
-                // If a ticket was created immediately (legacy method)
-                else if (data.create_ticket && data.ticket) {
-                    addTicketCreationMessage(data.ticket);
+            handleChatResponse(data);
+        })
+        .catch(handleChatError);
+    }
+    
+    // Send a message and render the reply as Server-Sent Events arrive
+    async function streamMessage(payload) {
+        const started = performance.now();
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(payload)
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`Streaming request failed with status ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let streamedText = '';
+        let messageDiv = null;
+        
+        const handleEvent = (event, data) => {
+            if (event === 'token') {
+                if (!messageDiv) {
+                    // The first token replaces the loading indicator
+                    const loadingMessage = document.getElementById('loading-message');
+                    if (loadingMessage) loadingMessage.remove();
+                    messageDiv = document.createElement('div');
+                    messageDiv.className = 'message agent-message';
+                    chatContainer.appendChild(messageDiv);
+                    console.debug(`Chat time to first token: ${Math.round(performance.now() - started)} ms`);
                 }
-            } else {
-                addMessage('Sorry, I encountered an error processing your request.', 'agent');
+                streamedText += data.text;
+                messageDiv.textContent = streamedText;
+                scrollToBottom();
+            } else if (event === 'done') {
+                const loadingMessage = document.getElementById('loading-message');
+                if (loadingMessage) loadingMessage.remove();
+                // The complete reply supersedes the streamed tokens
+                if (messageDiv) messageDiv.remove();
+                handleChatResponse(data);
+            } else if (event === 'error') {
+                if (messageDiv) messageDiv.remove();
+                const error = new Error(data.message || 'Streaming chat failed');
+                error.partial = true;
+                throw error;
             }
-        })
-        .catch(error => {
-            // Remove loading indicator
-            const loadingMessage = document.getElementById('loading-message');
-            if (loadingMessage) loadingMessage.remove();
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
             
-            console.error('Error:', error);
-            addMessage('Sorry, I experienced a technical issue. Please try again.', 'agent');
-        });
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) handleEvent(event, JSON.parse(data));
+                if (event === 'done') return;
+            }
+        }
+        
+        // The connection closed before the reply was complete
+        if (messageDiv) messageDiv.remove();
+        const error = new Error('Chat stream ended unexpectedly');
+        error.partial = streamedText.length > 0;
+        throw error;
+    }
+    
+    // Show the chatbot's reply and any ticket it created
+    function handleChatResponse(data) {
+        if (data.success) {
+            // Add agent response to chat
+            addMessage(data.response, 'agent');
+            
+            // If a ticket was created through the conversation flow
+            if (data.create_ticket && data.ticket_id) {
+                // Get the ticket details to display
+                fetch(`/api/tickets/${data.ticket_id}`)
+                    .then(response => response.json())
+                    .then(ticketData => {
+                        if (ticketData.success) {
+                            addTicketCreationMessage(ticketData.ticket);
+                        }
+                    })
+                    .catch(error => {
+                        console.error('Error fetching ticket:', error);
+                    });
+            }
+            // If a ticket was created immediately (legacy method)
+            else if (data.create_ticket && data.ticket) {
+                addTicketCreationMessage(data.ticket);
+            }
+        } else {
+            addMessage('Sorry, I encountered an error processing your request.', 'agent');
+        }
+    }
+    
+    function handleChatError(error) {
+        // Remove loading indicator
+        const loadingMessage = document.getElementById('loading-message');
+        if (loadingMessage) loadingMessage.remove();
+        
+        console.error('Error:', error);
+        addMessage('Sorry, I experienced a technical issue. Please try again.', 'agent');
     }
     
     // Add a message to the chat
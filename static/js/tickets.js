@@ -377,7 +377,9 @@ function getSuggestedSolutions(ticketId) {
                                 <h6 class="mb-1">Solution ${index + 1}</h6>
                                 ${solution.success_rate ? 
                                     `<small class="text-success">${Math.round(solution.success_rate * 100)}% success rate</small>` : 
-                                    `<small class="text-muted">New solution</small>`
+                                    solution.source === 'resolved_ticket' ?
+                                        `<small class="text-muted">Similar resolved ticket</small>` :
+                                        `<small class="text-muted">New solution</small>`
                                 }
                             </div>
                             <p class="mb-1">${truncateText(solution.solution_text, 150)}</p>
@@ -531,6 +533,11 @@ function createNewTicket(event) {
             
             // Reload tickets
             loadTickets(null);
+            
+            // The summary and actions are added in the background
+            if (data.ticket.enrichment_status === 'pending') {
+                pollTicketEnrichment(data.ticket.ticket_id);
+            }
         } else {
             alert('Failed to create ticket: ' + data.message);
         }
@@ -549,6 +556,28 @@ function createNewTicket(event) {
     });
 }
 
+// Poll a new ticket until its background enrichment is done, then refresh the list
+function pollTicketEnrichment(ticketId, attempt = 0) {
+    const maxAttempts = 30;
+    const intervalMs = 2000;
+    
+    setTimeout(() => {
+        fetch(`/api/tickets/${ticketId}/enrichment`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) return;
+                if (data.enrichment_status === 'pending') {
+                    if (attempt + 1 < maxAttempts) pollTicketEnrichment(ticketId, attempt + 1);
+                } else {
+                    loadTickets(null);
+                }
+            })
+            .catch(error => {
+                console.error('Error polling ticket enrichment:', error);
+            });
+    }, intervalMs);
+}
+
 // Helper Functions
 
 // Truncate text to specified length
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Point the application at a throwaway database before app.py is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import pytest
+
+from app import app, db
+from models import Solution
+from solution_index import SolutionIndex
+
+CATEGORY = "Device Compatibility Error"
+
+
+@pytest.fixture
+def solutions():
+    """Store solutions of one category, one of them only matching a query by a two-letter word"""
+    texts = [
+        "Reinstall the printer driver from the vendor site",
+        "Update the tablet firmware and restart",
+        "Roll back the os to the previous build",
+    ]
+    with app.app_context():
+        db.session.query(Solution).delete()
+        rows = [Solution(issue_category=CATEGORY, solution_text=text) for text in texts]
+        db.session.add_all(rows)
+        db.session.commit()
+        yield {text: row.id for text, row in zip(texts, rows)}
+        db.session.query(Solution).delete()
+        db.session.commit()
+
+
+def test_gated_search_finds_solutions_bm25_does_not_index(solutions):
+    index = SolutionIndex()
+
+    matches = index.search(CATEGORY, "os", top_k=3, min_similarity=0.1)
+
+    assert [solution_id for solution_id, _ in matches] == [solutions["Roll back the os to the previous build"]]
+
+
+def test_gated_search_ranks_candidates_by_similarity(solutions):
+    index = SolutionIndex()
+
+    matches = index.search(CATEGORY, "update the tablet firmware", top_k=1)
+
+    assert matches[0][0] == solutions["Update the tablet firmware and restart"]
@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+from app import app, db
+from models import Ticket
+from training_data import TrainingDataSource, fit_tfidf_vectorizer, streaming_accuracy
+
+WORDS = ["router", "wifi", "install", "crash", "login", "password", "payment", "refund", "driver", "update",
+         "screen", "sync", "tablet", "laptop", "error", "timeout", "card", "invoice", "account", "network"]
+CATEGORIES = ["Network Connectivity Issue", "Software Installation Failure", "Payment Gateway Integration Failure"]
+
+
+@pytest.fixture
+def tickets():
+    """Store a random corpus with many equally frequent terms and yield it in id order"""
+    rng = random.Random(8)
+    rows = [(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))), rng.choice(CATEGORIES))
+            for _ in range(40)]
+    with app.app_context():
+        db.session.query(Ticket).delete()
+        for number, (description, category) in enumerate(rows):
+            db.session.add(Ticket(ticket_id=f"TEST_{number}", description=description,
+                                  issue_category=category, priority="Medium"))
+        db.session.commit()
+        yield rows
+        db.session.query(Ticket).delete()
+        db.session.commit()
+
+
+def _source(chunk_size=7):
+    return TrainingDataSource([Ticket.id, Ticket.description, Ticket.issue_category], chunk_size=chunk_size)
+
+
+def test_source_streams_every_row_in_bounded_chunks(tickets):
+    chunks = list(_source())
+
+    assert all(len(features) <= 7 for features, _ in chunks)
+    assert [pair for features, labels in chunks for pair in zip(features, labels)] == tickets
+    assert _source().count() == len(tickets)
+
+
+def test_splits_partition_the_source(tickets):
+    train_features, _ = _source().with_split("train").materialize()
+    holdout_features, _ = _source().with_split("holdout").materialize()
+
+    assert holdout_features
+    assert sorted(train_features + holdout_features) == sorted(description for description, _ in tickets)
+
+
+@pytest.mark.parametrize("max_features", [None, 5, 12])
+def test_streamed_tfidf_matches_fit_on_materialized_list(tickets, max_features):
+    descriptions = [description for description, _ in tickets]
+
+    streamed = fit_tfidf_vectorizer(TfidfVectorizer(max_features=max_features), _source().documents())
+    expected = TfidfVectorizer(max_features=max_features).fit(descriptions)
+
+    # The cut-off at max_features falls among equally frequent terms
+    assert streamed.vocabulary_ == expected.vocabulary_
+    np.testing.assert_allclose(streamed.idf_, expected.idf_)
+    np.testing.assert_allclose(streamed.transform(descriptions).toarray(), expected.transform(descriptions).toarray())
+
+
+def test_streaming_accuracy_matches_accuracy_score(tickets):
+    descriptions, categories = _source().materialize()
+    model = Pipeline([("vectorizer", TfidfVectorizer()), ("classifier", MultinomialNB())])
+    model.fit(descriptions[:25], categories[:25])
+
+    assert streaming_accuracy(model, _source()) == pytest.approx(
+        accuracy_score(categories, model.predict(descriptions)))
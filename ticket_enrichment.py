@@ -0,0 +1,197 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text, func
+
+from app import db
+from models import Ticket, EnrichmentJob
+
+logger = logging.getLogger(__name__)
+
+# Worker threads, seconds between polls of an idle queue, and attempts per job
+DEFAULT_WORKERS = int(os.environ.get("TICKET_ENRICHMENT_WORKERS", 2))
+DEFAULT_POLL_SECONDS = float(os.environ.get("TICKET_ENRICHMENT_POLL_SECONDS", 5))
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("TICKET_ENRICHMENT_MAX_ATTEMPTS", 3))
+
+# Seconds each LLM step of a job may take; no user waits on the worker, so
+# this is well above the request path's LLM_ENRICHMENT_STEP_TIMEOUT
+STEP_TIMEOUT = float(os.environ.get("TICKET_ENRICHMENT_STEP_TIMEOUT", 120))
+
+# A failed attempt is retried after this many seconds times the attempt number
+RETRY_BACKOFF_SECONDS = 10
+
+
+def setup_enrichment_status(engine=None):
+    """Add the enrichment_status column to a ticket table created before it existed
+
+    ``db.create_all`` does not alter existing tables; tickets from before the
+    column are complete, which is its default.
+    """
+    engine = engine or db.engine
+    table = Ticket.__tablename__
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "enrichment_status" in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN enrichment_status VARCHAR(20) DEFAULT 'complete'"))
+    logger.info(f"Added enrichment_status column to {table}")
+
+
+class TicketEnrichmentService:
+    """Fills in the expensive fields of new tickets in the background
+
+    Ticket creation only runs the cheap classification and queues an
+    EnrichmentJob in the same transaction as the ticket. Worker threads
+    claim queued jobs, compute the summary, extracted actions and resolution
+    time estimate with the classifier agent, and mark the ticket's
+    enrichment_status 'complete'. The queue lives in the database, so jobs
+    survive restarts; jobs left running by a stopped process are queued
+    again on start. An attempt fails when the LLM is unavailable or does not
+    answer within ``STEP_TIMEOUT``; a job that keeps failing gets the
+    rule-based values after ``max_attempts``, or right away while the LLM's
+    circuit is open, and its ticket is marked 'failed'.
+    """
+
+    def __init__(self, app, classifier_agent, workers=None, poll_seconds=None, max_attempts=None):
+        self.app = app
+        self.classifier_agent = classifier_agent
+        self.workers = workers or DEFAULT_WORKERS
+        self.poll_seconds = poll_seconds if poll_seconds is not None else DEFAULT_POLL_SECONDS
+        self.max_attempts = max_attempts or DEFAULT_MAX_ATTEMPTS
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.completed = 0
+
+    def enqueue(self, ticket):
+        """Mark a new ticket pending and queue its enrichment in the current session
+
+        The caller commits, so the ticket and its job are stored together,
+        and then calls notify() to wake a worker.
+        """
+        ticket.enrichment_status = "pending"
+        db.session.add(EnrichmentJob(ticket_id=ticket.ticket_id))
+
+    def notify(self):
+        """Wake an idle worker after jobs were committed"""
+        self._wake.set()
+
+    def start(self):
+        """Re-queue interrupted jobs and start the worker threads"""
+        if self._threads:
+            return
+        with self.app.app_context():
+            requeued = EnrichmentJob.query.filter_by(status="running").update(
+                {"status": "pending"}, synchronize_session=False)
+            db.session.commit()
+            if requeued:
+                logger.info(f"Re-queued {requeued} interrupted ticket enrichment jobs")
+
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ticket-enrichment-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Ticket enrichment started with {self.workers} workers")
+
+    def stop(self):
+        """Stop the worker threads after their current job"""
+        self._stop_event.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.process_next()
+            except Exception as e:
+                logger.error(f"Error in ticket enrichment worker: {str(e)}")
+                processed = False
+            if not processed:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def process_next(self):
+        """Claim and process one due job; returns False when none is due"""
+        job = self._claim()
+        if job is None:
+            return False
+        self._process(job)
+        return True
+
+    def _claim(self):
+        """Atomically move the oldest due job from pending to running"""
+        now = datetime.utcnow()
+        candidates = EnrichmentJob.query.filter(
+            EnrichmentJob.status == "pending",
+            EnrichmentJob.run_after <= now
+        ).order_by(EnrichmentJob.id).limit(self.workers + 1).all()
+
+        for job in candidates:
+            # Another worker may have claimed the job since it was read
+            claimed = EnrichmentJob.query.filter_by(id=job.id, status="pending").update(
+                {"status": "running", "attempts": EnrichmentJob.attempts + 1, "updated_at": now},
+                synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                db.session.refresh(job)
+                return job
+        return None
+
+    def _process(self, job):
+        ticket = Ticket.query.filter_by(ticket_id=job.ticket_id).first()
+        if ticket is None:
+            db.session.delete(job)
+            db.session.commit()
+            return
+
+        try:
+            # A step the LLM cannot answer fails the attempt instead of
+            # completing the ticket with rule-based values
+            enrichment = self.classifier_agent.enrich_ticket(ticket.description, ticket.issue_category,
+                                                             ticket.priority, require_llm=True,
+                                                             step_timeout=STEP_TIMEOUT)
+        except Exception as e:
+            db.session.rollback()
+            self._retry_or_fail(job, ticket, e)
+            return
+
+        self._apply(ticket, enrichment, "complete")
+        db.session.delete(job)
+        db.session.commit()
+        self.completed += 1
+
+    def _retry_or_fail(self, job, ticket, error):
+        logger.error(f"Error enriching ticket {ticket.ticket_id} (attempt {job.attempts}): {str(error)}")
+        job.last_error = str(error)
+        # While the LLM's circuit is open a retry would fail the same way, so the
+        # rule-based values are kept at once instead of after the whole backoff
+        if job.attempts < self.max_attempts and self.classifier_agent.ollama_client.is_available:
+            job.status = "pending"
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF_SECONDS * job.attempts)
+        else:
+            # Give up on the LLM and keep the rule-based values
+            job.status = "failed"
+            self._apply(ticket, self.classifier_agent.enrich_ticket(
+                ticket.description, ticket.issue_category, ticket.priority, use_llm=False), "failed")
+        db.session.commit()
+
+    @staticmethod
+    def _apply(ticket, enrichment, status):
+        ticket.summary = enrichment["summary"]
+        ticket.extracted_actions = enrichment["extracted_actions"]
+        ticket.estimated_resolution_time = enrichment["estimated_resolution_time"]
+        ticket.enrichment_status = status
+
+    def get_status(self):
+        """Return the queue depth by job status and the worker state"""
+        counts = dict(db.session.query(EnrichmentJob.status, func.count(EnrichmentJob.id))
+                      .group_by(EnrichmentJob.status).all())
+        return {
+            "workers": sum(1 for thread in self._threads if thread.is_alive()),
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0),
+            "completed": self.completed
+        }
@@ -0,0 +1,160 @@
+"""Streaming training-data pipeline for the ML models
+
+Training data is read with Core selects of only the needed columns and
+fetched in fixed-size chunks (``yield_per``), so no ORM objects are hydrated
+and the table is never materialized as a whole.
+
+Memory bound: at any time the loader holds one chunk of ``chunk_size`` rows
+(``TRAINING_CHUNK_SIZE``, default 1000) of the selected columns. On top of
+that, fitting a TF-IDF vectorizer keeps term and document counts for every
+distinct term (proportional to the vocabulary, not the number of rows), and
+an incremental learner keeps its own fixed-size state (classes x features).
+Learners that cannot be trained incrementally, such as the RandomForest in
+ResolutionPredictor, additionally hold the sparse feature matrix and labels.
+"""
+import os
+import logging
+from collections import Counter
+
+import numpy as np
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get("TRAINING_CHUNK_SIZE", 1000))
+
+# One in this many rows (by primary key) is held out for validation
+HOLDOUT_EVERY = 5
+
+
+def iter_chunks(columns, criteria=(), chunk_size=None):
+    """Stream rows of the given columns in lists of at most chunk_size rows"""
+    statement = db.select(*columns)
+    if criteria:
+        statement = statement.where(*criteria)
+
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size or DEFAULT_CHUNK_SIZE))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+class TrainingDataSource:
+    """Re-iterable source of (features, labels) chunks streamed from the database
+
+    The first column must be the primary key, used for deterministic
+    train/hold-out splits, and the last column is the label. The columns in
+    between are turned into one feature per row by ``to_features``.
+    """
+
+    def __init__(self, columns, criteria=(), to_features=None, chunk_size=None, split=None):
+        self.columns = list(columns)
+        self.criteria = tuple(criteria)
+        self.to_features = to_features or (lambda *values: values[0])
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self.split = split
+
+    def with_split(self, split):
+        """Return the 'train' or 'holdout' part of this source"""
+        return TrainingDataSource(self.columns, self.criteria, self.to_features, self.chunk_size, split)
+
+    def _keep(self, row_id):
+        if self.split is None:
+            return True
+        is_holdout = row_id % HOLDOUT_EVERY == 0
+        return is_holdout if self.split == "holdout" else not is_holdout
+
+    def __iter__(self):
+        for rows in iter_chunks(self.columns, self.criteria, self.chunk_size):
+            features = []
+            labels = []
+            for row in rows:
+                if not self._keep(row[0]):
+                    continue
+                features.append(self.to_features(*row[1:-1]))
+                labels.append(row[-1])
+            if features:
+                yield features, labels
+
+    def documents(self):
+        """Iterate over the features of every row, one at a time"""
+        for features, _ in self:
+            yield from features
+
+    def count(self):
+        """Count the rows in the source without loading them"""
+        statement = db.select(db.func.count()).select_from(self.columns[0].table)
+        if self.criteria:
+            statement = statement.where(*self.criteria)
+        return db.session.execute(statement).scalar()
+
+    def distinct_labels(self):
+        """Return the sorted set of labels in the source"""
+        statement = db.select(self.columns[-1]).distinct()
+        if self.criteria:
+            statement = statement.where(*self.criteria)
+        return sorted(label for label in db.session.execute(statement).scalars() if label is not None)
+
+    def materialize(self):
+        """Load every row into memory; only for small data sets"""
+        features = []
+        labels = []
+        for chunk_features, chunk_labels in self:
+            features.extend(chunk_features)
+            labels.extend(chunk_labels)
+        return features, labels
+
+
+def fit_tfidf_vectorizer(vectorizer, documents):
+    """Fit a TfidfVectorizer's vocabulary and IDF in a single streaming pass
+
+    Equivalent to ``vectorizer.fit(documents)`` for the default min_df/max_df,
+    including which terms ``max_features`` keeps among equally frequent ones,
+    but only keeps per-term counts instead of the full document-term matrix.
+    """
+    analyzer = vectorizer.build_analyzer()
+    term_counts = Counter()
+    document_counts = Counter()
+    n_documents = 0
+
+    for document in documents:
+        terms = analyzer(document)
+        term_counts.update(terms)
+        document_counts.update(set(terms))
+        n_documents += 1
+
+    terms = sorted(term_counts)
+    if vectorizer.max_features and len(terms) > vectorizer.max_features:
+        # Select the most frequent terms exactly as CountVectorizer._limit_features
+        # does, over the sorted vocabulary, so ties are broken the same way
+        frequencies = np.array([term_counts[term] for term in terms], dtype=vectorizer.dtype)
+        keep = np.sort((-frequencies).argsort()[:vectorizer.max_features])
+        terms = [terms[index] for index in keep]
+
+    # With a fixed vocabulary, fitting on a placeholder document only sets up
+    # the fitted state; the IDF weights are overwritten from the counts below
+    vectorizer.set_params(vocabulary={term: index for index, term in enumerate(terms)})
+    vectorizer.fit([""])
+
+    if vectorizer.use_idf:
+        df = np.array([document_counts[term] for term in terms], dtype=np.float64)
+        if vectorizer.smooth_idf:
+            vectorizer.idf_ = np.log((1 + n_documents) / (1 + df)) + 1
+        else:
+            vectorizer.idf_ = np.log(n_documents / df) + 1
+
+    return vectorizer
+
+
+def streaming_accuracy(model, source):
+    """Compute a model's accuracy over a source without materializing it"""
+    correct = 0
+    total = 0
+    for features, labels in source:
+        predictions = model.predict(features)
+        correct += int(np.sum(predictions == np.asarray(labels, dtype=object)))
+        total += len(labels)
+    return correct / total if total else 0.0
@@ -16,6 +16,27 @@ def generate_ticket_id(prefix="TICKET"):
     random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
     return f"{prefix}_{timestamp}_{random_suffix}"
 
+def generate_unique_ticket_ids(count, prefix="TICKET"):
+    """Generate ticket IDs that are unique within the batch and the database"""
+    ticket_ids = set()
+    while len(ticket_ids) < count:
+        candidates = set()
+        while len(candidates) < count - len(ticket_ids):
+            candidate = generate_ticket_id(prefix)
+            if candidate not in ticket_ids:
+                candidates.add(candidate)
+        
+        # Drop candidates that already exist, checking them in chunks to keep
+        # the IN clause small
+        candidate_list = list(candidates)
+        for start in range(0, len(candidate_list), 500):
+            chunk = candidate_list[start:start + 500]
+            existing = db.session.query(Ticket.ticket_id).filter(Ticket.ticket_id.in_(chunk)).all()
+            candidates.difference_update(row[0] for row in existing)
+        ticket_ids.update(candidates)
+    
+    return list(ticket_ids)
+
 def extract_error_code(text):
     """Extract error codes from text using regex"""
     # Match common error code formats
@@ -187,51 +208,16 @@ def create_knowledge_base_entry_from_ticket(ticket_id, admin_id=1):
 def find_knowledge_base_entries_for_issue(description, category=None, limit=3):
     """Find relevant knowledge base entries for a given issue description"""
     try:
-        query = KnowledgeBaseEntry.query
+        from model_registry import registry
         
-        # Filter by category if provided
-        if category:
-            query = query.filter_by(category=category)
-            
-        # Get all entries
-        entries = query.all()
-        
-        # If no entries found, return empty list
-        if not entries:
+        # The BM25F index only scores entries sharing a word with the description
+        matches = registry.get("knowledge_base_index").search(description, category=category, limit=limit)
+        if not matches:
             return []
-            
-        # Simple keyword matching for now
-        # In a production system, this would use embeddings/cosine similarity
-        scored_entries = []
-        words = set(re.findall(r'\b[a-zA-Z]{3,}\b', description.lower()))
-        
-        for entry in entries:
-            # Count matching words in title and content
-            title_words = set(re.findall(r'\b[a-zA-Z]{3,}\b', entry.title.lower()))
-            content_words = set(re.findall(r'\b[a-zA-Z]{3,}\b', entry.content.lower()))
-            
-            # Try to parse tags
-            try:
-                tags = set(json.loads(entry.tags))
-            except:
-                tags = set()
-                
-            # Calculate score based on matches
-            title_matches = len(words.intersection(title_words))
-            content_matches = len(words.intersection(content_words))
-            tag_matches = sum(1 for tag in tags if tag.lower() in description.lower())
-            
-            # Weight title matches more heavily
-            score = (title_matches * 3) + content_matches + (tag_matches * 2)
-            
-            # Boost by helpful count
-            score += min(5, entry.helpful_count)  # Cap at +5 boost
-            
-            scored_entries.append((entry, score))
         
-        # Sort by score (descending) and return top entries
-        scored_entries.sort(key=lambda x: x[1], reverse=True)
-        return [entry for entry, score in scored_entries[:limit]]
+        entries = KnowledgeBaseEntry.query.filter(KnowledgeBaseEntry.id.in_([entry_id for entry_id, _ in matches])).all()
+        entries_by_id = {entry.id: entry for entry in entries}
+        return [entries_by_id[entry_id] for entry_id, _ in matches if entry_id in entries_by_id]
         
     except Exception as e:
         logger.error(f"Error finding knowledge base entries: {str(e)}")
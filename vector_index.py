@@ -0,0 +1,258 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "exact", "ivf", or "auto" to switch to IVF above IVF_MIN_VECTORS
+DEFAULT_MODE = os.environ.get("VECTOR_INDEX_MODE", "auto")
+IVF_MIN_VECTORS = int(os.environ.get("VECTOR_INDEX_IVF_MIN_VECTORS", 100000))
+DEFAULT_NPROBE = int(os.environ.get("VECTOR_INDEX_NPROBE", 8))
+
+# Clustering is trained on a sample; the rest is only assigned to centroids
+KMEANS_SAMPLE_SIZE = 50000
+KMEANS_ITERATIONS = 10
+ASSIGN_BATCH_SIZE = 65536
+
+
+def normalize(vectors):
+    """L2-normalize the rows of a matrix, leaving zero rows as they are"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """Indexes of the k highest scores, best first, without a full sort"""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _assign(vectors, centroids):
+    """Nearest centroid of each vector by cosine similarity, in batches"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+        batch = vectors[start:start + ASSIGN_BATCH_SIZE]
+        assignments[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means over a sample of L2-normalized vectors"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+    nlist = max(1, min(nlist, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Re-seed empty clusters with random vectors
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """In-memory cosine-similarity index over labelled vectors
+
+    Vectors are L2-normalized into one float32 matrix, so exact search is a
+    single matrix-vector product followed by an argpartition top-k. In IVF
+    mode the vectors are also clustered with spherical k-means and a query
+    only scores the rows of its ``nprobe`` nearest clusters, which keeps
+    latency flat for millions of vectors at a small cost in recall. The
+    matrix grows by doubling and removed rows are masked out, so updates do
+    not copy the index, and searches read a consistent prefix of it.
+    """
+
+    def __init__(self, mode=None, nprobe=None, nlist=None):
+        self.mode = mode or DEFAULT_MODE
+        self.nprobe = nprobe or DEFAULT_NPROBE
+        self.nlist = nlist
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self, dim=None, capacity=0):
+        self.dim = dim
+        self.size = 0
+        self.matrix = np.zeros((capacity, dim or 0), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.labels = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.rows = {}
+        self.label_codes = {}
+        self.centroids = None
+        self.assignments = np.zeros(capacity, dtype=np.int32)
+        self.lists = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def uses_ivf(self):
+        return self.centroids is not None
+
+    def _label_code(self, label):
+        code = self.label_codes.get(label)
+        if code is None:
+            code = len(self.label_codes)
+            self.label_codes[label] = code
+        return code
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        # Replace rather than resize, so readers holding the old arrays are unaffected
+        for name in ("matrix", "ids", "labels", "alive", "assignments"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def build(self, ids, vectors, labels):
+        """Replace the contents of the index, training IVF clusters if enabled"""
+        started = time.time()
+        vectors = normalize(vectors) if len(ids) else np.zeros((0, self.dim or 0), dtype=np.float32)
+        with self._lock:
+            self._clear(vectors.shape[1] if len(ids) else None, len(ids))
+            self._append(np.asarray(ids, dtype=np.int64), vectors, labels)
+            use_ivf = self.mode == "ivf" or (self.mode == "auto" and len(ids) >= IVF_MIN_VECTORS)
+            if use_ivf and len(ids):
+                self._train_ivf()
+        logger.info(f"Vector index built for {len(ids)} vectors ({'ivf' if self.uses_ivf else 'exact'}) "
+                    f"in {time.time() - started:.2f}s")
+
+    def _train_ivf(self):
+        matrix = self.matrix[:self.size]
+        nlist = self.nlist or int(4 * np.sqrt(self.size))
+        self.centroids = train_centroids(matrix, nlist)
+        self.assignments[:self.size] = _assign(matrix, self.centroids)
+        order = np.argsort(self.assignments[:self.size], kind="stable")
+        bounds = np.searchsorted(self.assignments[:self.size][order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def _append(self, ids, vectors, labels):
+        count = len(ids)
+        if not count:
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+        self._grow(self.size + count)
+
+        start, end = self.size, self.size + count
+        self.matrix[start:end] = vectors
+        self.ids[start:end] = ids
+        self.labels[start:end] = [self._label_code(label) for label in labels]
+        self.alive[start:end] = True
+        for row, item_id in enumerate(ids, start):
+            previous = self.rows.get(int(item_id))
+            if previous is not None:
+                self.alive[previous] = False
+            self.rows[int(item_id)] = row
+
+        if self.centroids is not None:
+            assignments = _assign(vectors, self.centroids)
+            self.assignments[start:end] = assignments
+            for cluster in np.unique(assignments):
+                new_rows = np.arange(start, end)[assignments == cluster]
+                self.lists[cluster] = np.concatenate([self.lists[cluster], new_rows])
+        # Publish the rows only once they are fully written
+        self.size = end
+
+    def add(self, ids, vectors, labels):
+        """Add or replace vectors"""
+        with self._lock:
+            self._append(np.asarray(ids, dtype=np.int64), normalize(vectors), labels)
+
+    def remove(self, ids):
+        """Remove vectors by id if present"""
+        with self._lock:
+            for item_id in ids:
+                row = self.rows.pop(int(item_id), None)
+                if row is not None:
+                    self.alive[row] = False
+
+    @property
+    def removed(self):
+        """Number of rows still held for removed or replaced vectors"""
+        return self.size - len(self.rows)
+
+    def compact(self):
+        """Rebuild the index without the rows of removed vectors"""
+        with self._lock:
+            keep = np.flatnonzero(self.alive[:self.size])
+            ids = self.ids[keep].copy()
+            vectors = self.matrix[keep].copy()
+            names = {code: label for label, code in self.label_codes.items()}
+            labels = [names[code] for code in self.labels[keep]]
+        self.build(ids, vectors, labels)
+
+    def search(self, query, top_k=10, label=None):
+        """Return the top_k (id, cosine similarity) pairs for a query vector"""
+        with self._lock:
+            size = self.size
+            if not size or self.dim is None:
+                return []
+            matrix, ids, labels, alive = self.matrix, self.ids, self.labels, self.alive
+            centroids, lists = self.centroids, self.lists
+            code = self.label_codes.get(label) if label is not None else None
+            if label is not None and code is None:
+                return []
+
+        query = normalize(query)[0]
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}")
+
+        if centroids is not None:
+            probes = _top_k(centroids @ query, self.nprobe)
+            rows = np.concatenate([lists[cluster] for cluster in probes])
+            rows = rows[rows < size]
+        else:
+            rows = None
+
+        if rows is None:
+            keep = alive[:size] if code is None else alive[:size] & (labels[:size] == code)
+            rows = np.flatnonzero(keep)
+            # Scoring every row is cheaper than gathering when few are filtered out
+            if rows.size > size // 2:
+                scores = matrix[:size] @ query
+                scores = scores[rows]
+            else:
+                scores = matrix[rows] @ query
+        else:
+            keep = alive[rows] if code is None else alive[rows] & (labels[rows] == code)
+            rows = rows[keep]
+            scores = matrix[rows] @ query
+
+        top = _top_k(scores, top_k)
+        return [(int(ids[rows[i]]), float(scores[i])) for i in top]
+
+    def get_stats(self):
+        """Return the size and layout of the index"""
+        return {
+            "vectors": len(self.rows),
+            "dim": self.dim,
+            "mode": "ivf" if self.uses_ivf else "exact",
+            "clusters": len(self.centroids) if self.centroids is not None else 0,
+            "nprobe": self.nprobe if self.uses_ivf else None,
+            "labels": len(self.label_codes)
+        }